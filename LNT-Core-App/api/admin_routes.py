@@ -0,0 +1,118 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from api.metrics_routes import _route_template
+from api.responses import dumps
+from core import request_timing
+from core.profiler import PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS, profiler
+from core.request_timing import slow_requests
+
+router = APIRouter()
+
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+
+# Profiling a live worker:
+#   1) POST /admin/profile?seconds=30          -> {"id": ..., "running": true}
+#   2) GET  /admin/profile/{id}?format=speedscope once it finished (409 until then)
+# ?wait=true holds the POST open until the profile is done instead.
+@router.post("/profile")
+async def start_profile(seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+                        interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1, le=1000),
+                        include_idle: bool = False, wait: bool = False):
+    try:
+        prof = profiler.start(seconds, interval_ms, include_idle=include_idle)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # sleep on the event loop rather than parking a threadpool worker on prof.done
+    while wait and not prof.done.is_set():
+        await asyncio.sleep(min(0.25, prof.seconds))
+    return prof.summary()
+
+
+@router.get("/profiles")
+def list_profiles():
+    return profiler.list()
+
+
+@router.get("/profile/{profile_id}")
+def get_profile(profile_id: str, format: str = "collapsed"):
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(PROFILE_FORMATS)}")
+    prof = profiler.get(profile_id)
+    if prof is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if not prof.done.is_set():
+        raise HTTPException(status_code=409, detail="Profile is still running")
+    if format == "speedscope":
+        body, media_type, filename = dumps(prof.speedscope()), "application/json", f"lnt-{prof.id}.speedscope.json"
+    else:
+        body, media_type, filename = prof.collapsed(), "text/plain; charset=utf-8", f"lnt-{prof.id}.folded"
+    return Response(content=body, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# slow requests, newest first; route filters on the template (/device/refresh/{hostname})
+@router.get("/slow-requests")
+def get_slow_requests(limit: int = Query(50, ge=1, le=1000), route: str | None = None):
+    return {**slow_requests.stats(), "requests": slow_requests.entries(limit=limit, route=route)}
+
+
+@router.put("/slow-requests/threshold")
+def set_slow_request_threshold(ms: float = Query(..., ge=0)):
+    slow_requests.threshold_ms = ms
+    return slow_requests.stats()
+
+
+@router.delete("/slow-requests")
+def clear_slow_requests():
+    slow_requests.clear()
+    return slow_requests.stats()
+
+
+# where this worker's startup time went (imports, inventory load, each manager)
+@router.get("/startup")
+def get_startup(request: Request):
+    return {**request.app.state.startup.stats(),
+            "inventory_cache": request.app.state.dm.inventory_cache.stats()}
+
+
+class RequestTimingMiddleware:
+    """
+    Gives every HTTP request a RequestTiming that the auth, YAML, agent,
+    inventory and serialization code adds its phases to, and hands requests
+    over the slow-request threshold to the recorder once their response
+    starts. Sync endpoints run in worker threads with a copy of this context,
+    so their phases land on the same timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = request_timing.begin()
+        timing = request_timing.current()
+        observed = False
+
+        def observe(status):
+            slow_requests.observe(timing, scope["method"], scope["path"], _route_template(scope), status)
+
+        async def send_timed(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception:
+            if not observed:
+                observe(500)
+            raise
+        finally:
+            request_timing.end(token)
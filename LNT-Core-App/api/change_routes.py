@@ -0,0 +1,38 @@
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from api.responses import dumps
+from core.leader import LEADER_LEASE
+
+# the ChangeFeed is built in main's lifespan (app.state.changes)
+router = APIRouter()
+
+CHANGE_KINDS = ("host", "test", "test_log")
+
+# Incremental sync for GUIs and automation:
+#   1) GET /changes            -> {"next": N}; then fetch /device/list and /test/status once
+#   2) GET /changes?since=N&wait_s=30 -> only the deltas after N (waits until there are some)
+#   3) on "resync": true, refetch the full lists and continue from the returned next
+@router.get("")
+async def get_changes(request: Request, since: int | None = None, limit: int = Query(1000, ge=1, le=10000),
+                      wait_s: float = Query(0, ge=0, le=60), kinds: str | None = None):
+    kind_list = [k for k in kinds.split(",") if k] if kinds else None
+    unknown = set(kind_list or ()) - set(CHANGE_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown change kinds: {sorted(unknown)}")
+    change_feed = request.app.state.changes
+    out = change_feed.read(since, limit=limit, kinds=kind_list)
+    # long-poll: only while the cursor is current and nothing (of the requested kinds) came in
+    deadline = time.monotonic() + wait_s
+    while since is not None and not out["changes"] and not out["resync"]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not await change_feed.wait(out["next"], remaining):
+            break
+        out = change_feed.read(out["next"], limit=limit, kinds=kind_list)
+    return Response(content=dumps(out), media_type="application/json")
+
+
+@router.get("/stats")
+def get_change_stats(request: Request):
+    change_feed = request.app.state.changes
+    return {**change_feed.stats(), "leader": change_feed.backend.lease_holder(LEADER_LEASE)}
@@ -1,38 +1,183 @@
 #define device endpoints
 # LNT-Core-App/api/device_routes.py
 
-from fastapi import APIRouter
-from core.device_manage import DeviceManager
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List
+from core.device_manage import HostValidationError, REFRESH_DEADLINE_S
+from core.status_poller import POLL_INTERVAL_S
+from api.responses import VersionedResponder, parse_fields, project
 
+# the DeviceManager and StatusPoller are built in main's lifespan (app.state.dm / app.state.poller)
 router = APIRouter()
-device_manage = DeviceManager()
 
+# The list has no time-relative fields, so body and ETag only change with the inventory
+# snapshot. Clients work out a host's age from last_seen_epoch and the Date header.
+list_responder = VersionedResponder("hosts")
+
+# a job only exists on the worker whose ProvisionQueue runs it
+JOB_NOT_FOUND = "Job not found (provisioning jobs are only known to the worker that started them)"
+
+# ?fields=status,duts.count trims each host record; If-None-Match gets a 304
+# while the inventory hasn't changed
 @router.get("/list")
-def list_devices():
-    return {"hosts": device_manage.get_hosts()}
+def list_devices(request: Request, fields: str | None = None):
+    device_manage = request.app.state.dm
+    tree = parse_fields(fields)
+    def build():
+        hosts = dict(device_manage.get_hosts())
+        if tree is not None:
+            hosts = {name: project(rec, tree) for name, rec in hosts.items()}
+        return {"hosts": hosts}
+    return list_responder.respond(request, device_manage.version, build, fields=fields)
 
+# returns right away; follow provisioning through /device/jobs/{job_id}
 @router.post("/add")
-def add_device(hostname: str, ip_address: str):
-    host = device_manage.add_host(hostname, ip_address)
-    return {"message": f"Device host '{hostname}' added successfully.", "host": host}
+def add_device(request: Request, hostname: str, ip_address: str):
+    device_manage = request.app.state.dm
+    host, job = device_manage.add_host(hostname, ip_address)
+    return {"message": f"Device host '{hostname}' added; provisioning queued.",
+            "host": host, "job_id": job.job_id}
 
 @router.post("/remove")
-def remove_device(hostname: str):
+def remove_device(request: Request, hostname: str):
+    device_manage = request.app.state.dm
     result = device_manage.remove_host(hostname)
     if result:
         return {"message": f"Device host '{hostname}' removed successfully."}
     return {"error": f"Device host '{hostname}' not found."}
 
+class HostEntry(BaseModel):
+    hostname: str
+    ip_address: str
+
+class BulkAddBody(BaseModel):
+    hosts: List[HostEntry]
+
+class BulkRemoveBody(BaseModel):
+    hostnames: List[str]
+
+# all-or-nothing: 400 lists every problem; otherwise one inventory write and
+# one provisioning job (one playbook run) for the whole batch
+@router.post("/bulk-add")
+def bulk_add_devices(request: Request, body: BulkAddBody):
+    device_manage = request.app.state.dm
+    try:
+        hosts, job = device_manage.bulk_add_hosts([h.model_dump() for h in body.hosts])
+    except HostValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    return {"message": f"{len(hosts)} device hosts added; provisioning queued.",
+            "hosts": hosts, "job_id": job.job_id}
+
+@router.post("/bulk-remove")
+def bulk_remove_devices(request: Request, body: BulkRemoveBody):
+    device_manage = request.app.state.dm
+    try:
+        removed = device_manage.bulk_remove_hosts(body.hostnames)
+    except HostValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    return {"message": f"{len(removed)} device hosts removed.", "removed": removed}
+
+# Serves the cached record and lets the poller revalidate it in the background
+# once it is older than max_age_s. wait=true refreshes inside the request instead.
 @router.get("/refresh/{hostname}")
-def refresh_host(hostname: str):
-    host = device_manage.refresh_host_status(hostname)
-    return {"host": host}
+def refresh_host(request: Request, hostname: str, wait: bool = False, max_age_s: float = POLL_INTERVAL_S):
+    device_manage = request.app.state.dm
+    status_poller = request.app.state.poller
+    not_found = {"error": f"Device host '{hostname}' not found."}
+    age = device_manage.host_age(hostname)
+    if age is None:
+        return not_found
+    stale = False
+    if wait or not status_poller.available:
+        device_manage.refresh_host_status(hostname)
+    elif age > max_age_s:
+        stale = True
+        status_poller.request_refresh(hostname)
+    # the host may have been removed in the meantime
+    host = device_manage.get_hosts_view().get(hostname)
+    if host is None:
+        return not_found
+    return {"host": host, "stale": stale}
 
 @router.get("/refresh-all")
-def refresh_all_hosts():
-    hosts = device_manage.refresh_all_statuses()
-    return {"hosts": hosts}
+def refresh_all_hosts(request: Request, wait: bool = False, max_age_s: float = POLL_INTERVAL_S,
+                      deadline_s: float = REFRESH_DEADLINE_S):
+    device_manage = request.app.state.dm
+    status_poller = request.app.state.poller
+    if wait or not status_poller.available:
+        _, timed_out = device_manage.refresh_hosts(device_manage.list_hosts(), deadline_s=deadline_s)
+        return {"hosts": device_manage.get_hosts_view(), "timed_out": timed_out, "stale": []}
+    hosts = device_manage.get_hosts_view()
+    stale = [h for h, rec in hosts.items() if rec["age_s"] > max_age_s]
+    if stale:
+        status_poller.request_refresh_many(stale)
+    return {"hosts": hosts, "timed_out": [], "stale": stale}
 
+# fleet totals; group_by=rack (comma-separated host variables) adds per-group breakdowns
 @router.get("/stats")
-def get_stats():
-    return device_manage.inventory_stats()
+def get_stats(request: Request, group_by: str | None = None):
+    device_manage = request.app.state.dm
+    groups = [g for g in group_by.split(",") if g] if group_by else None
+    try:
+        return device_manage.inventory_stats(group_by=groups)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# per-host agent latency, failure and circuit breaker counters
+@router.get("/agent-stats")
+def get_agent_stats(request: Request):
+    device_manage = request.app.state.dm
+    return {"agents": device_manage.host_client.stats()}
+
+# DUT totals per type: how many are free and how many are reserved by tests
+@router.get("/duts")
+def get_dut_stats(request: Request):
+    device_manage = request.app.state.dm
+    return device_manage.duts.stats()
+
+@router.get("/jobs")
+def list_jobs(request: Request):
+    device_manage = request.app.state.dm
+    return {"jobs": device_manage.provisioner.list()}
+
+# Job status plus captured Ansible output after line `after`; wait_s long-polls
+# for new output so clients can follow a playbook without hammering the API.
+# Jobs are kept by the worker that started them (see ProvisionQueue).
+@router.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, after: int = Query(0, ge=0),
+                  wait_s: float = Query(0, ge=0, le=30)):
+    device_manage = request.app.state.dm
+    if wait_s:
+        await device_manage.provisioner.wait(job_id, after, wait_s)
+    job = device_manage.provisioner.read(job_id, after=after)
+    if job is None:
+        raise HTTPException(status_code=404, detail=JOB_NOT_FOUND)
+    return job
+
+# Server-Sent Events version of the same: one event per output batch, ends when the job does
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(request: Request, job_id: str, after: int = Query(0, ge=0)):
+    device_manage = request.app.state.dm
+    if device_manage.provisioner.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=JOB_NOT_FOUND)
+
+    async def events():
+        cursor = after
+        while True:
+            await device_manage.provisioner.wait(job_id, cursor, 15)
+            job = device_manage.provisioner.read(job_id, cursor)
+            if job is None:
+                return
+            if job["output"] or job["state"] in ("succeeded", "failed"):
+                yield f"data: {json.dumps(job)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+            cursor = job["next"]
+            if job["state"] in ("succeeded", "failed"):
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,62 @@
+import time
+from fastapi import APIRouter
+from fastapi.responses import Response
+from core import metrics
+
+router = APIRouter()
+
+REQUEST_LATENCY = metrics.histogram("http_request_duration_seconds",
+                                    "API request latency (to response start)", ["method", "route", "status"])
+
+# Prometheus scrape target
+@router.get("")
+def get_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # routes of an included router may carry only their own part of the path
+    # ("/{test_id}/logs"); the leading request segments are the router prefix
+    depth = template.count("/")
+    prefix = scope["path"].rsplit("/", depth)[0] if depth else scope["path"]
+    return prefix + template
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request up to the start of its response, labelled by
+    route template (so /test/{test_id}/logs is one series however many tests
+    exist). Streams (SSE) are timed to their first byte, not their lifetime.
+    Plain ASGI rather than BaseHTTPMiddleware: no extra task or body buffering.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            REQUEST_LATENCY.labels(scope["method"], _route_template(scope), status).observe(
+                time.perf_counter() - start)
+
+        async def send_timed(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
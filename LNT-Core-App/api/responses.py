@@ -0,0 +1,136 @@
+# response helpers for polled list endpoints: fast JSON, field projection, ETag/304
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from core import request_timing
+from core.leader import process_id
+
+try:
+    import orjson
+
+    def dumps(data: Any) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:   # orjson is optional; the stdlib encoder gives identical output, just slower
+    import json
+
+    def dumps(data: Any) -> bytes:
+        return json.dumps(data, separators=(",", ":"), default=str).encode()
+
+RESPONSE_CACHE_SIZE = 64   # serialized bodies kept per endpoint
+# versions are counted per process, so ETags name the process that issued them;
+# behind a load balancer a revalidation on another worker is a plain 200, never a wrong 304
+_INSTANCE = hashlib.blake2s(process_id().encode(), digest_size=3).hexdigest()
+
+
+class TimedJSONResponse(JSONResponse):
+    """The default JSON response, with encoding counted as the request's serialization phase."""
+
+    def render(self, content: Any) -> bytes:
+        with request_timing.phase(request_timing.SERIALIZATION):
+            return super().render(content)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """'status,duts.count' -> {"status": None, "duts": {"count": None}} (None = whole value)."""
+    if not fields:
+        return None
+    tree: Dict[str, Any] = {}
+    for path in fields.split(","):
+        node = tree
+        parts = [p for p in path.strip().split(".") if p]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = None
+            else:
+                child = node.get(part)
+                if child is None:
+                    if part in node:
+                        break   # a parent was already requested whole
+                    child = node[part] = {}
+                node = child
+    return tree or None
+
+
+def project(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the fields in ``tree``; lists are projected element-wise."""
+    if tree is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [project(v, tree) for v in value]
+    if not isinstance(value, dict):
+        return value
+    return {k: project(value[k], sub) for k, sub in tree.items() if k in value}
+
+
+class VersionedResponder:
+    """
+    Serves a JSON view of some versioned state (the inventory snapshot
+    version, the test store version, ...).
+
+    The ETag is weak and derived from (version, query), so a poll with a
+    matching If-None-Match is answered 304 without building or encoding
+    anything. Otherwise the encoded body is cached per (version, query) and
+    reused until the version moves on. Views must not carry time-relative
+    values (ages, countdowns): those would change the body without changing
+    the version.
+    """
+
+    def __init__(self, name: str, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.name = name
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[Any, Hashable], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def etag(self, version: Any, query: Hashable) -> str:
+        digest = hashlib.blake2s(repr(query).encode(), digest_size=6).hexdigest()
+        return f'W/"{self.name}-{_INSTANCE}-{version}-{digest}"'
+
+    def respond(self, request: Request, version: Any, build: Callable[[], Any],
+                query: Hashable = (), fields: Optional[str] = None) -> Response:
+        """
+        Args:
+            version: Monotonic version of the state ``build`` reads
+            build: Returns the JSON-able payload (only called on a cache miss)
+            query: Anything else the payload depends on (filters, paging)
+            fields: Comma-separated dotted paths to keep, applied by ``build`` via project()
+        """
+        query = (query, fields)
+        etag = self.etag(version, query)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        key = (version, query)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return Response(content=body, media_type="application/json", headers=headers)
+
+        with request_timing.phase(request_timing.SERIALIZATION):
+            body = dumps(build())
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = body
+            # older versions are never asked for again
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses,
+                    "not_modified": self.not_modified}
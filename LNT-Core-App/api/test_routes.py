@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-import yaml
-import os
+import asyncio
+import json
+from datetime import datetime
+from core.test_log import format_entry
+from core.dut_allocator import ReservationError
+from core.test_spec import SpecError, load_spec
+from api.responses import VersionedResponder, parse_fields, project
 
 router = APIRouter()
 
+SSE_KEEPALIVE_S = 15
+
+status_responder = VersionedResponder("tests")
+
 class StartTestBody(BaseModel):
     name: str
     config_path: str | None = None
@@ -14,14 +24,20 @@ class StartTestBody(BaseModel):
 def start_test(body: StartTestBody, request: Request):
     tm = request.app.state.tm
 
-    # 1) Start the test record
-    test_id = tm.start_test(body.name)
-
-    # 2) Read YAML if config_path is provided and accessible
+    # 1) Load the compiled spec (cached by path+mtime / content hash) if a config_path is given
     spec = None
-    if body.config_path and os.path.exists(body.config_path):
-        with open(body.config_path, "r") as f:
-            spec = yaml.safe_load(f)
+    if body.config_path:
+        try:
+            spec = load_spec(body.config_path)
+        except SpecError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid test spec: {e}")
+
+    # 2) Start the test record
+    try:
+        test_id = tm.start_test(body.name, test_yaml_path=body.config_path, spec=spec)
+    except ReservationError as e:
+        raise HTTPException(status_code=409, detail=f"DUTs unavailable: {e}")
+    if spec is not None:
         tm.update_test(test_id, log=f"Loaded YAML spec from {body.config_path}")
     else:
         tm.update_test(test_id, log=f"cli started test with config={body.config_path}, images={body.image_paths}")
@@ -31,6 +47,20 @@ def start_test(body: StartTestBody, request: Request):
 
     return {"message": f"Started test '{body.name}'", "test_id": test_id}
 
+# Ranked full-text search over test event logs and serial logs
+@router.get("/search")
+def search_logs(request: Request, q: str, test_id: int | None = None, host: str | None = None,
+                port: str | None = None, since: str | None = None, until: str | None = None,
+                limit: int = Query(50, ge=1, le=500), context: int = Query(0, ge=0, le=20),
+                raw: bool = False):
+    tm = request.app.state.tm
+    try:
+        hits = tm.search_logs(q, test_id=test_id, host=host, port=port, since=since, until=until,
+                              limit=limit, context=context, raw_query=raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    return {"hits": hits}
+
 @router.post("/{test_id}/stop")
 def stop_test(test_id: int, request: Request):
     tm = request.app.state.tm
@@ -39,15 +69,156 @@ def stop_test(test_id: int, request: Request):
         raise HTTPException(status_code=404, detail="Test not found")
     return {"message": "Test stopped", "record": updated}
 
+# ?fields=status,duts.host trims each record; If-None-Match gets a 304 while no test changed
 @router.get("/status")
-def get_status(request: Request):
+def get_status(request: Request, status: str | None = None, host: str | None = None,
+               cursor: int | None = None, limit: int = Query(50, ge=1, le=500),
+               summary: bool = False, fields: str | None = None):
     tm = request.app.state.tm
-    return {"tests": tm.get_tests()}
+    tree = parse_fields(fields)
+    def build():
+        tests, next_cursor = tm.list_tests(status=status, host=host, cursor=cursor,
+                                           limit=limit, summary=summary)
+        return {"tests": {t.pop("test_id"): project(t, tree) for t in tests}, "next_cursor": next_cursor}
+    return status_responder.respond(request, tm.version, build,
+                                    query=(status, host, cursor, limit, summary), fields=fields)
 
+@router.get("/{test_id}")
+def get_test(test_id: int, request: Request, fields: str | None = None):
+    test = request.app.state.tm.get_test(test_id)
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return project(test, parse_fields(fields))
+
+# Tail with ?after=<next_cursor from the previous call>; each poll only returns new entries.
 @router.get("/{test_id}/logs")
-def get_logs(test_id: int, request: Request):
+def get_logs(test_id: int, request: Request, after: int = Query(0, ge=0),
+             limit: int = Query(500, ge=1, le=5000)):
     tm = request.app.state.tm
     test = tm.get_test(test_id)
     if not test:
         raise HTTPException(status_code=404, detail="Test not found")
-    return {"logs": test.get("logs", [])}
+    entries, next_cursor = tm.get_log_entries(test_id, after=after, limit=limit)
+    return {"logs": [format_entry(e) for e in entries], "entries": entries, "next_cursor": next_cursor}
+
+def _serial_log(request: Request, test_id: int, host: str, port: str):
+    reader = request.app.state.tm.get_serial_log(test_id, host, port)
+    if reader is None:
+        raise HTTPException(status_code=404, detail="Serial log not found")
+    return reader
+
+def _parse_iso(value: str | None, name: str):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO-8601 timestamp")
+
+# Serial log files are read through a memory-mapped, incrementally indexed
+# reader, so each page costs the same no matter how large the file has grown.
+@router.get("/{test_id}/serial-logs/{host}/{port}")
+def serial_log_info(test_id: int, host: str, port: str, request: Request):
+    return _serial_log(request, test_id, host, port).stats()
+
+@router.get("/{test_id}/serial-logs/{host}/{port}/lines")
+def serial_log_lines(test_id: int, host: str, port: str, request: Request,
+                     start: int = Query(0, ge=0), count: int = Query(200, ge=1, le=10000)):
+    lines, total = _serial_log(request, test_id, host, port).lines(start, count)
+    return {"start": start, "lines": lines, "total_lines": total}
+
+@router.get("/{test_id}/serial-logs/{host}/{port}/bytes")
+def serial_log_bytes(test_id: int, host: str, port: str, request: Request,
+                     offset: int = Query(0, ge=0), length: int = Query(65536, ge=1)):
+    data = _serial_log(request, test_id, host, port).byte_range(offset, length)
+    headers = {"Content-Range": f"bytes {offset}-{offset + len(data) - 1}/*"} if data else {}
+    return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+@router.get("/{test_id}/serial-logs/{host}/{port}/tail")
+def serial_log_tail(test_id: int, host: str, port: str, request: Request,
+                    n: int = Query(100, ge=1, le=10000)):
+    return {"lines": _serial_log(request, test_id, host, port).tail(n)}
+
+@router.get("/{test_id}/serial-logs/{host}/{port}/window")
+def serial_log_window(test_id: int, host: str, port: str, request: Request,
+                      since: str | None = None, until: str | None = None,
+                      limit: int = Query(1000, ge=1, le=10000)):
+    reader = _serial_log(request, test_id, host, port)
+    lines = reader.time_window(_parse_iso(since, "since"), _parse_iso(until, "until"), limit)
+    return {"lines": lines}
+
+class StreamChunkBody(BaseModel):
+    data: str
+
+# device hosts push serial output here; it fans out to every viewer of the port
+@router.post("/{test_id}/stream/{host}/{port}")
+def ingest_stream(test_id: int, host: str, port: str, body: StreamChunkBody, request: Request):
+    tm = request.app.state.tm
+    if not tm.get_test(test_id):
+        raise HTTPException(status_code=404, detail="Test not found")
+    chunk = tm.ingest_stream(test_id, host, port, body.data)
+    return {"seq": chunk["seq"]}
+
+# Server-Sent Events view of one serial port. A viewer that falls more than
+# SUBSCRIBER_QUEUE_SIZE chunks behind either loses the oldest chunks
+# (policy=drop_oldest, visible as gaps in seq) or is cut off (policy=disconnect).
+@router.get("/{test_id}/stream/{host}/{port}")
+async def watch_stream(test_id: int, host: str, port: str, request: Request,
+                       policy: str = "drop_oldest"):
+    tm = request.app.state.tm
+    if not tm.get_test(test_id):
+        raise HTTPException(status_code=404, detail="Test not found")
+    sub = tm.hub.subscribe(test_id, host, port, policy=policy)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    chunk = await sub.get(timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if chunk is None:
+                    yield "event: end\ndata: {}\n\n"
+                    return
+                yield f"id: {chunk['seq']}\ndata: {json.dumps(chunk)}\n\n"
+        finally:
+            tm.hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+# WebSocket flavour of the same stream; one JSON message per chunk
+@router.websocket("/{test_id}/ws/{host}/{port}")
+async def watch_stream_ws(websocket: WebSocket, test_id: int, host: str, port: str,
+                          policy: str = "drop_oldest"):
+    tm = websocket.app.state.tm
+    if not tm.get_test(test_id):
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    sub = tm.hub.subscribe(test_id, host, port, policy=policy)
+    # watch the socket too, so a viewer that leaves is noticed even when the port is quiet
+    receiver = asyncio.create_task(websocket.receive())
+    try:
+        while True:
+            getter = asyncio.create_task(sub.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.result()["type"] == "websocket.disconnect":
+                    return
+                receiver = asyncio.create_task(websocket.receive())
+                continue
+            chunk = getter.result()
+            if chunk is None:
+                await websocket.close()
+                return
+            await websocket.send_json(chunk)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        tm.hub.unsubscribe(sub)
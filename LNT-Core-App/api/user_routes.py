@@ -1,17 +1,50 @@
 #define user endpoints
 
-from fastapi import APIRouter
-from core.user_manage import UserManager
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from auth.deps import get_current_claims, require_auth, token_cache
+from auth.jwt import create_access_token
+from config.settings import settings
 
+# the UserManager is built in main's lifespan (app.state.um), which also reloads
+# tokens revoked before a restart into the token cache and subscribes it to
+# logouts on other workers (see TOKEN_REVOKED)
 router = APIRouter()
-user_manage = UserManager()
 
+# change kind a logout publishes so every worker's token cache drops the jti
+TOKEN_REVOKED = "_token_revoked"
+
+def _issue_token(user_manage, username: str, password: str):
+    user = user_manage.authenticate(username, password)
+    if not user:
+        return None
+    return create_access_token({"sub": user.username, "roles": user.roles})
+
+# Standard OAuth2 password flow: credentials come as a form body (never in the URL,
+# where proxies and access logs would keep them). async so the bcrypt verify and the
+# token signing (first use may read the signing key from the state backend) wait on
+# the auth pool instead of the event loop or a request worker.
 @router.post("/login")
-def login(username: str, password: str):
-    if user_manage.authenticate(username, password):
-        return {"message": "Login successful!"}
-    return {"error": "Invalid credentials"}
+async def login(request: Request, form: OAuth2PasswordRequestForm = Depends()):
+    um = request.app.state.um
+    token = await um.run_auth(_issue_token, um, form.username, form.password)
+    if not token:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return {
+        "message": "Login successful!",
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_in": settings.JWT_EXPIRE_MINUTES * 60,
+    }
+
+# revokes the presented token (until it would have expired anyway)
+@router.post("/logout")
+def logout(request: Request, claims: dict = Depends(get_current_claims)):
+    request.app.state.um.revoke_token(claims["jti"], claims["exp"])
+    token_cache.revoke(claims["jti"], claims["exp"])
+    request.app.state.changes.publish(TOKEN_REVOKED, claims["jti"], "revoke", {"exp": claims["exp"]})
+    return {"message": "Logged out"}
 
-@router.get("/list")
-def list_users():
-    return {"users": user_manage.get_users()}
\ No newline at end of file
+@router.get("/list", dependencies=[Depends(require_auth)])
+def list_users(request: Request):
+    return {"users": request.app.state.um.get_users()}
@@ -1,16 +1,64 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
-from auth.jwt import decode_token
+from auth.jwt import TokenError, decode_token
+from auth.token_cache import TokenCache
+from config.settings import settings
+from core import request_timing
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# verified claims by token, so repeat requests skip the JWT decode
+token_cache = TokenCache(decode_token, ttl_s=settings.TOKEN_CACHE_TTL_S, max_size=settings.TOKEN_CACHE_SIZE)
+
+def _verify(token: str) -> dict:
     try:
-        payload = decode_token(token)
-        return payload.get("sub")
-    except JWTError:
+        with request_timing.phase(request_timing.AUTH):
+            return token_cache.verify(token)
+    except TokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def get_current_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    return _verify(token)
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    return get_current_claims(token).get("sub")
+
+def _bearer_token(conn: HTTPConnection) -> Optional[str]:
+    # Authorization header, or ?access_token= for EventSource/WebSocket clients that can't set headers
+    scheme, _, token = conn.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return conn.query_params.get("access_token")
+
+def require_auth(conn: HTTPConnection) -> Optional[dict]:
+    """Router-level guard: claims of the caller, or None when LNT_AUTH_REQUIRED is off."""
+    if not settings.AUTH_REQUIRED:
+        return None
+    token = _bearer_token(conn)
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return _verify(token)
+
+def require_admin(conn: HTTPConnection) -> dict:
+    """Guard for /admin: a valid token with the "admin" role, whatever LNT_AUTH_REQUIRED says."""
+    token = _bearer_token(conn)
+    if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
         )
+    claims = _verify(token)
+    if "admin" not in (claims.get("roles") or []):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return claims
@@ -1,21 +1,64 @@
+import secrets
+import uuid
 from datetime import datetime, timedelta
-from jose import jwt
-from passlib.context import CryptContext
 from config.settings import settings
+from core.state_backend import StateBackend
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# jose.jwt (via cryptography) and passlib are imported on first use; they are a
+# good part of a worker's import time and nothing needs them before the first
+# login. main warms them up in the background once the worker is serving.
+DEFERRED_IMPORTS = ("jose.jwt", "passlib.context")
+
+
+class TokenError(Exception):
+    """A token that failed verification (bad signature, expired, malformed or revoked)."""
+
+
+_pwd_context = None
+_generated_secret = None
+_state_backend: StateBackend | None = None
+
+def use_state_backend(backend: StateBackend):
+    """Where a generated signing key is shared between workers (main's lifespan sets this)."""
+    global _state_backend
+    _state_backend = backend
+
+def _passwords():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def _secret() -> str:
+    # first worker to need a key generates it; the others read the same one back
+    global _generated_secret
+    if settings.JWT_SECRET:
+        return settings.JWT_SECRET
+    if _generated_secret is None:
+        key = secrets.token_urlsafe(32)
+        # without a backend (scripts, tests) the key only lives as long as this process
+        _generated_secret = _state_backend.set_meta("jwt_secret", key, only_if_missing=True) if _state_backend else key
+    return _generated_secret
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _passwords().hash(password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return _passwords().verify(plain, hashed)
 
-def create_access_token(data: dict, expires_minutes: int = 60):
+def create_access_token(data: dict, expires_minutes: int = settings.JWT_EXPIRE_MINUTES):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.JWT_SECRET, algorithm="HS256")
+    # jti lets a single token be revoked (logout) before it expires
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    from jose import jwt
+    return jwt.encode(to_encode, _secret(), algorithm="HS256")
 
 def decode_token(token: str):
-    return jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    """Verified claims of ``token``; raises TokenError, so callers never need to import jose."""
+    from jose import JWTError, jwt
+    try:
+        return jwt.decode(token, _secret(), algorithms=["HS256"])
+    except JWTError as e:
+        raise TokenError(str(e)) from e
@@ -0,0 +1,72 @@
+# short-lived cache of verified JWT claims, with revocation
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from auth.jwt import TokenError
+
+
+class TokenCache:
+    """
+    Remembers the claims of tokens that already passed signature and expiry
+    checks, so a request carrying a known token costs a dict lookup instead of
+    a JWT decode. Entries live for at most ``ttl_s`` and never past the
+    token's own exp; the least recently used are dropped beyond ``max_size``.
+
+    Revoked token ids (jti) are checked on every lookup, cached or not.
+    """
+
+    def __init__(self, decode: Callable[[str], Dict[str, Any]], ttl_s: float = 60, max_size: int = 10000):
+        self._decode = decode
+        self.ttl_s = ttl_s
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}   # jti -> token exp (epoch); forgotten after that
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Claims of a valid token.
+
+        Raises:
+            TokenError: bad signature, expired or revoked
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                if entry[0].get("jti") in self._revoked:
+                    del self._entries[token]
+                    raise TokenError("Token has been revoked")
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+
+        claims = self._decode(token)
+        if claims.get("jti") in self._revoked:
+            raise TokenError("Token has been revoked")
+        valid_until = min(now + self.ttl_s, float(claims.get("exp", now + self.ttl_s)))
+        with self._lock:
+            self.misses += 1
+            self._entries[token] = (claims, valid_until)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return claims
+
+    def revoke(self, jti: str, exp: float):
+        with self._lock:
+            self._revoked[jti] = exp
+            # drop revocations of tokens that have expired anyway
+            if len(self._revoked) > 1024:
+                now = time.time()
+                self._revoked = {j: e for j, e in self._revoked.items() if e > now}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cached": len(self._entries), "revoked": len(self._revoked),
+                    "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,184 @@
+# simulated device host agents on loopback addresses, for load tests
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from ipaddress import IPv4Address
+from typing import Dict, List, Optional
+
+import yaml
+
+DUT_TYPES = ("CC26x2", "CC13x2", "CC3235", "LS3489DW")
+DUT_STATUSES = ("running", "idle", "offline")
+
+
+@dataclass
+class FleetConfig:
+    hosts: int = 200
+    base_ip: str = "127.1.0.1"     # hosts get consecutive addresses from here (all of 127/8 is loopback)
+    port: int = 18001              # core must use the same port (LNT_HOST_API_PORT)
+    duts_per_host: int = 4
+    legacy_ratio: float = 0.25     # share of hosts answering /api/duts with {"count", "types"}
+    latency_ms: float = 5.0        # per-response delay
+    jitter_ms: float = 5.0         # + uniform(0, jitter_ms)
+    timeout_ratio: float = 0.0     # share of hosts that never answer (the core hits its read timeout)
+    flap_ratio: float = 0.0        # share of hosts that go down and come back
+    flap_period_s: float = 10.0    # a flapping host is down for the second half of each period
+    churn: float = 0.05            # chance a DUT changes status between two /api/duts calls
+    busy_ratio: float = 0.2        # chance /api/health reports "busy"
+    seed: int = 1
+
+
+class _Host:
+    __slots__ = ("index", "name", "ip", "legacy", "hangs", "flaps", "phase", "duts", "requests")
+
+    def __init__(self, index: int, ip: str, cfg: FleetConfig, rng: random.Random):
+        self.index = index
+        self.name = f"BENCH_HOST_{index + 1:05d}"
+        self.ip = ip
+        self.legacy = rng.random() < cfg.legacy_ratio
+        self.hangs = rng.random() < cfg.timeout_ratio
+        self.flaps = rng.random() < cfg.flap_ratio
+        self.phase = rng.random() * cfg.flap_period_s
+        self.duts = [{"id": f"{self.name}-DUT{j + 1}", "type": rng.choice(DUT_TYPES),
+                      "status": rng.choice(DUT_STATUSES)} for j in range(cfg.duts_per_host)]
+        self.requests = 0
+
+
+class FakeAgentFleet:
+    """
+    Serves /api/health and /api/duts for ``cfg.hosts`` virtual device hosts,
+    one listening socket per loopback address, all on one asyncio loop in a
+    background thread. HTTP/1.1 keep-alive, so the core's pooled sessions
+    behave as they would against real agents.
+    """
+
+    def __init__(self, cfg: FleetConfig):
+        self.cfg = cfg
+        rng = random.Random(cfg.seed)
+        first = int(IPv4Address(cfg.base_ip))
+        self.hosts: List[_Host] = [_Host(i, str(IPv4Address(first + i)), cfg, rng) for i in range(cfg.hosts)]
+        self._by_ip: Dict[str, _Host] = {h.ip: h for h in self.hosts}
+        self._rng = rng
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._servers: list = []
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self.started_at = 0.0
+
+    # --- lifecycle ---
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-fleet", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        self.started_at = time.monotonic()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._listen())
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            for s in self._servers:
+                s.close()
+            # hanging/keep-alive handlers are still parked; let them unwind before closing
+            tasks = asyncio.all_tasks(self._loop)
+            for t in tasks:
+                t.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+    async def _listen(self):
+        for h in self.hosts:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((h.ip, self.cfg.port))
+            self._servers.append(await asyncio.start_server(self._serve, sock=sock, backlog=64))
+
+    # --- behaviour ---
+    def _down(self, h: _Host) -> bool:
+        if not h.flaps:
+            return False
+        period = self.cfg.flap_period_s
+        return ((time.monotonic() - self.started_at + h.phase) % period) >= period / 2
+
+    def _health(self, h: _Host) -> dict:
+        return {"status": "busy" if self._rng.random() < self.cfg.busy_ratio else "idle"}
+
+    def _duts(self, h: _Host) -> dict:
+        for d in h.duts:
+            if self._rng.random() < self.cfg.churn:
+                d["status"] = self._rng.choice(DUT_STATUSES)
+        if h.legacy:
+            # the original agent shape: no per-DUT ids or statuses
+            return {"count": len(h.duts), "types": [d["type"] for d in h.duts]}
+        return {"items": [dict(d) for d in h.duts]}
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        h = self._by_ip.get(writer.get_extra_info("sockname")[0])
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                line, _, rest = head.decode("latin-1").partition("\r\n")
+                parts = line.split(" ")
+                path = parts[1] if len(parts) > 1 else ""
+                close = "connection: close" in rest.lower()
+                if h is None or self._down(h):
+                    break   # drop the connection: looks like an unreachable agent
+                h.requests += 1
+                if h.hangs:
+                    await asyncio.sleep(3600)
+                await asyncio.sleep((self.cfg.latency_ms + self._rng.random() * self.cfg.jitter_ms) / 1000)
+                if path == "/api/health":
+                    status, body = "200 OK", self._health(h)
+                elif path == "/api/duts":
+                    status, body = "200 OK", self._duts(h)
+                else:
+                    status, body = "404 Not Found", {"detail": "Not Found"}
+                data = json.dumps(body).encode()
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- inventory ---
+    def write_inventory(self, path: str):
+        """inventory.yml listing every virtual host, in the layout DeviceManager loads."""
+        hosts = {h.name: {"ansible_host": h.ip, "ansible_user": "lnt", "rack": f"rack-{h.index // 40 + 1}"}
+                 for h in self.hosts}
+        with open(path, "w") as f:
+            yaml.safe_dump({"all": {"hosts": hosts}}, f, sort_keys=False)
+
+    def stats(self) -> dict:
+        return {
+            "hosts": len(self.hosts),
+            "legacy": sum(h.legacy for h in self.hosts),
+            "hanging": sum(h.hangs for h in self.hosts),
+            "flapping": sum(h.flaps for h in self.hosts),
+            "requests": sum(h.requests for h in self.hosts),
+        }
@@ -0,0 +1,421 @@
+# load-test driver: fake agent fleet + core service + scenarios -> JSON results
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, fields
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bench.fake_fleet import FakeAgentFleet, FleetConfig
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(APP_DIR, "bench", "results")
+CORE_START_TIMEOUT_S = 60
+SCENARIO_NAMES = ("refresh_all", "list_poll", "list_poll_etag", "stats_poll", "test_start", "log_tail",
+                  "changes_poll")
+# the numbers compare mode checks: (key, higher_is_better)
+COMPARED = (("throughput_rps", True), ("p50_ms", False), ("p99_ms", False), ("error_rate", False))
+
+
+def percentile(sorted_ms: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_ms:
+        return None
+    k = max(0, min(len(sorted_ms) - 1, int(round(p / 100 * len(sorted_ms) + 0.5)) - 1))
+    return round(sorted_ms[k], 2)
+
+
+class Recorder:
+    """Latencies and errors of one scenario (thread-safe)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies_ms: List[float] = []
+        self.errors = 0
+        self.extra: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._t0 = 0.0
+        self._t1 = 0.0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._t1 = time.perf_counter()
+
+    def add(self, ms: float, ok: bool = True):
+        with self._lock:
+            self.latencies_ms.append(ms)
+            if not ok:
+                self.errors += 1
+
+    def count(self, key: str, n: float = 1):
+        with self._lock:
+            self.extra[key] = self.extra.get(key, 0) + n
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies_ms)
+        n = len(lat)
+        elapsed = self._t1 - self._t0
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "error_rate": round(self.errors / n, 4) if n else 0.0,
+            "duration_s": round(elapsed, 3),
+            "throughput_rps": round(n / elapsed, 1) if elapsed else 0.0,
+            "mean_ms": round(sum(lat) / n, 2) if n else None,
+            "p50_ms": percentile(lat, 50),
+            "p90_ms": percentile(lat, 90),
+            "p99_ms": percentile(lat, 99),
+            "max_ms": round(lat[-1], 2) if lat else None,
+            **{k: round(v, 3) for k, v in self.extra.items()},
+        }
+
+
+class Bench:
+    def __init__(self, base_url: str, args):
+        self.base = base_url.rstrip("/")
+        self.args = args
+        self._local = threading.local()
+        self.test_ids: List[int] = []
+
+    def session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+            s.mount("http://", HTTPAdapter(pool_maxsize=4))
+        return s
+
+    def timed(self, rec: Recorder, method: str, path: str, ok_codes=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            r = self.session().request(method, self.base + path, timeout=self.args.request_timeout, **kwargs)
+        except requests.RequestException:
+            rec.add((time.perf_counter() - start) * 1000, ok=False)
+            return None
+        rec.add((time.perf_counter() - start) * 1000, ok=r.status_code in ok_codes)
+        return r
+
+    def for_duration(self, rec: Recorder, clients: int, fn: Callable[[int], None]):
+        """Run fn(client_no) in a loop on ``clients`` threads for --duration seconds."""
+        deadline = time.monotonic() + self.args.duration
+
+        def client(i):
+            while time.monotonic() < deadline:
+                fn(i)
+
+        with rec, ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(client, range(clients)))
+
+
+# --- scenarios ---
+def scenario_refresh_all(b: Bench) -> Recorder:
+    rec = Recorder("refresh_all")
+    with rec:
+        for _ in range(b.args.refresh_rounds):
+            r = b.timed(rec, "GET", "/device/refresh-all", params={"wait": True})
+            if r is not None and r.ok:
+                body = r.json()
+                rec.count("hosts_refreshed", len(body["hosts"]) - len(body["timed_out"]))
+                rec.count("timed_out", len(body["timed_out"]))
+    s = rec.extra
+    if rec.latencies_ms:
+        s["hosts_per_s"] = s.get("hosts_refreshed", 0) / (sum(rec.latencies_ms) / 1000)
+    return rec
+
+def scenario_list_poll(b: Bench) -> Recorder:
+    rec = Recorder("list_poll")
+    b.for_duration(rec, b.args.clients, lambda i: b.timed(rec, "GET", "/device/list"))
+    return rec
+
+def scenario_list_poll_etag(b: Bench) -> Recorder:
+    # GUI-style polling: revalidate with the last ETag, mostly answered 304
+    rec = Recorder("list_poll_etag")
+    etags: Dict[int, str] = {}
+
+    def poll(i):
+        headers = {"If-None-Match": etags[i]} if i in etags else {}
+        r = b.timed(rec, "GET", "/device/list", ok_codes=(200, 304), headers=headers)
+        if r is not None:
+            if r.status_code == 304:
+                rec.count("not_modified")
+            elif "etag" in r.headers:
+                etags[i] = r.headers["etag"]
+
+    b.for_duration(rec, b.args.clients, poll)
+    return rec
+
+def scenario_stats_poll(b: Bench) -> Recorder:
+    rec = Recorder("stats_poll")
+    b.for_duration(rec, b.args.clients, lambda i: b.timed(rec, "GET", "/device/stats", params={"group_by": "rack"}))
+    return rec
+
+def scenario_test_start(b: Bench) -> Recorder:
+    rec = Recorder("test_start")
+    lock = threading.Lock()
+
+    def start(n):
+        r = b.timed(rec, "POST", "/test/start", json={"name": f"bench-{n}"})
+        if r is not None and r.ok:
+            with lock:
+                b.test_ids.append(r.json()["test_id"])
+
+    with rec, ThreadPoolExecutor(max_workers=b.args.clients) as pool:
+        list(pool.map(start, range(b.args.test_starts)))
+    return rec
+
+def scenario_log_tail(b: Bench) -> Recorder:
+    rec = Recorder("log_tail")
+    if not b.test_ids:
+        scenario_test_start(b)
+    ids = b.test_ids
+    cursors: Dict[int, int] = {}
+
+    def tail(i):
+        test_id = ids[i % len(ids)]
+        r = b.timed(rec, "GET", f"/test/{test_id}/logs", params={"after": cursors.get(i, 0)})
+        if r is not None and r.ok:
+            cursors[i] = r.json()["next_cursor"]
+
+    b.for_duration(rec, b.args.clients, tail)
+    return rec
+
+def scenario_changes_poll(b: Bench) -> Recorder:
+    # incremental sync: each client only asks for what changed since its cursor,
+    # while single-host refreshes keep a steady trickle of host changes coming
+    rec = Recorder("changes_poll")
+    head = b.session().get(b.base + "/changes", timeout=b.args.request_timeout).json()["next"]
+    hosts = list(b.session().get(b.base + "/device/list", params={"fields": "status"},
+                                 timeout=b.args.request_timeout).json()["hosts"])
+    cursors: Dict[int, int] = {}
+    stop = threading.Event()
+
+    def refresher():
+        s = requests.Session()
+        n = 0
+        while not stop.is_set() and hosts:
+            try:
+                s.get(f"{b.base}/device/refresh/{hosts[n % len(hosts)]}", params={"wait": True},
+                      timeout=b.args.request_timeout)
+            except requests.RequestException:
+                time.sleep(0.5)
+            n += 1
+
+    def poll(i):
+        r = b.timed(rec, "GET", "/changes", params={"since": cursors.get(i, head), "wait_s": 1})
+        if r is not None and r.ok:
+            body = r.json()
+            cursors[i] = body["next"]
+            rec.count("changes", len(body["changes"]))
+
+    bg = threading.Thread(target=refresher, daemon=True)
+    bg.start()
+    try:
+        b.for_duration(rec, b.args.clients, poll)
+    finally:
+        stop.set()
+    return rec
+
+SCENARIOS: Dict[str, Callable[[Bench], Recorder]] = {
+    "refresh_all": scenario_refresh_all,
+    "list_poll": scenario_list_poll,
+    "list_poll_etag": scenario_list_poll_etag,
+    "stats_poll": scenario_stats_poll,
+    "test_start": scenario_test_start,
+    "log_tail": scenario_log_tail,
+    "changes_poll": scenario_changes_poll,
+}
+
+
+# --- core service ---
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_core(workdir: str, fleet: FakeAgentFleet, args):
+    """Run the core service from APP_DIR with its state (inventory, data/) in ``workdir``."""
+    inventory = os.path.join(workdir, "inventory.yml")
+    fleet.write_inventory(inventory)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": APP_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "LNT_INVENTORY": inventory,
+        "LNT_HOST_API_PORT": str(fleet.cfg.port),
+        "LNT_POLLER_ENABLED": "1" if args.poller else "0",
+        "LNT_AUTH_REQUIRED": "0",
+    }
+    log = open(os.path.join(workdir, "core.log"), "w")
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                             "--port", str(port), "--log-level", "warning", "--no-access-log"],
+                            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + CORE_START_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"core service exited during startup; see {log.name}")
+        try:
+            if requests.get(base + "/", timeout=1).ok:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"core service did not come up within {CORE_START_TIMEOUT_S}s; see {log.name}")
+
+def _raise_fd_limit():
+    # a socket per virtual host on each side, plus pooled connections
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(args) -> dict:
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))} (have: {', '.join(SCENARIOS)})")
+    _raise_fd_limit()
+
+    cfg = FleetConfig(**{f.name: getattr(args, f.name) for f in fields(FleetConfig)})
+    fleet = FakeAgentFleet(cfg)
+    fleet.start()
+    workdir = tempfile.mkdtemp(prefix="lnt-bench-")
+    proc = None
+    try:
+        if args.url:
+            base = args.url
+        else:
+            proc, base = start_core(workdir, fleet, args)
+        b = Bench(base, args)
+        results = {}
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr, flush=True)
+            results[name] = SCENARIOS[name](b).summary()
+            print(f"  {_line(name, results[name])}", file=sys.stderr, flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        fleet.stop()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "label": args.label,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "duration_s": args.duration,
+            "clients": args.clients,
+            "workdir": workdir,
+        },
+        "fleet": {**asdict(cfg), **fleet.stats()},
+        "scenarios": results,
+    }
+
+def _line(name: str, s: dict) -> str:
+    return (f"{name:<15} {s['requests']:>7} req  {s['throughput_rps']:>9} req/s  "
+            f"p50 {s['p50_ms']} ms  p99 {s['p99_ms']} ms  errors {s['errors']}")
+
+
+# --- compare ---
+def compare(base: dict, new: dict, threshold_pct: float) -> List[str]:
+    """Print a side-by-side table; returns the regressions beyond ``threshold_pct``."""
+    regressions = []
+    print(f"{'scenario':<15} {'metric':<15} {'base':>10} {'new':>10} {'change':>8}")
+    for name, new_s in new["scenarios"].items():
+        base_s = base["scenarios"].get(name)
+        if base_s is None:
+            continue
+        for key, higher_is_better in COMPARED:
+            a, b = base_s.get(key), new_s.get(key)
+            if a is None or b is None:
+                continue
+            if a:
+                change = (b - a) / a * 100
+            else:
+                change = 0.0 if not b else float("inf")
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > threshold_pct and not (key == "error_rate" and b < 0.001):
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{key}")
+            print(f"{name:<15} {key:<15} {a:>10} {b:>10} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="LNT core load tests")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("run", help="start a fake fleet and the core service, run scenarios, save JSON")
+    r.add_argument("--scenarios", default=",".join(SCENARIO_NAMES), help="comma-separated (default: all)")
+    r.add_argument("--duration", type=float, default=10, help="seconds per polling scenario")
+    r.add_argument("--clients", type=int, default=16, help="concurrent API clients")
+    r.add_argument("--refresh-rounds", type=int, default=5, help="refresh-all sweeps to time")
+    r.add_argument("--test-starts", type=int, default=200, help="tests started by test_start")
+    r.add_argument("--request-timeout", type=float, default=60)
+    r.add_argument("--poller", action="store_true", help="leave the core's background poller on")
+    r.add_argument("--url", help="use an already running core instead of starting one")
+    r.add_argument("--label", help="free-form tag stored with the results")
+    r.add_argument("--out", help="results file (default: bench/results/<time>-<commit>.json)")
+    defaults = FleetConfig()
+    for f in fields(FleetConfig):
+        r.add_argument("--" + f.name.replace("_", "-"), type=type(getattr(defaults, f.name)),
+                       default=getattr(defaults, f.name), help=f"fleet: default %(default)s")
+
+    c = sub.add_parser("compare", help="compare two results files")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=10, help="allowed change in %% before flagging")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        return 0
+
+    results = run(args)
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, s in results["scenarios"].items():
+        print(_line(name, s))
+    print(f"results: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
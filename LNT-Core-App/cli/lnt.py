@@ -1,35 +1,363 @@
 import argparse
-import requests
+import contextlib
+import csv
+import getpass
+import io
+import json
+import os
+import shlex
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+
+API_BASE = os.environ.get("LNT_API_BASE", "http://127.0.0.1:8000")
+# saved login tokens, one per API base
+TOKEN_FILE = os.environ.get("LNT_TOKEN_FILE", os.path.expanduser("~/.config/lnt/tokens.json"))
+PARALLEL = int(os.environ.get("LNT_CLI_PARALLEL", "8"))   # concurrent requests for multi-host commands
+HTTP_TIMEOUT_S = 30
+LONG_POLL_S = 25   # server-side wait per long-poll request (watch / --follow)
+
+
+class CliError(Exception):
+    pass
+
+
+class TokenCache:
+    """Access tokens saved by `lnt user login`, keyed by API base, reused until they expire."""
+
+    def __init__(self, path=TOKEN_FILE):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+
+    def get(self, base):
+        entry = self._load().get(base)
+        # a little slack so a token doesn't expire mid-request
+        if entry and entry.get("expires_at", 0) > time.time() + 5:
+            return entry["access_token"]
+        return None
+
+    def put(self, base, username, token, expires_in):
+        data = self._load()
+        data[base] = {"username": username, "access_token": token, "expires_at": time.time() + expires_in}
+        self._store(data)
+
+    def drop(self, base):
+        data = self._load()
+        if data.pop(base, None) is not None:
+            self._store(data)
+
 
-API_BASE = "http://127.0.0.1:8000"
+class Client:
+    """
+    One pooled HTTP session for every command in this process (a batch file,
+    a watch loop, parallel host operations), so connections are reused instead
+    of paying a TCP handshake per call.
+    """
 
-def list_devices(args):
-    r = requests.get(f"{API_BASE}/device/list")
-    print(r.json())
+    def __init__(self, base=API_BASE, parallel=PARALLEL, tokens=None):
+        self.base = base.rstrip("/")
+        self.parallel = max(1, parallel)
+        self.tokens = tokens or TokenCache()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.parallel)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        token = self.tokens.get(self.base)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def call(self, method, path, timeout=HTTP_TIMEOUT_S, **kwargs):
+        """
+        JSON body of the response.
+
+        Raises:
+            CliError: the service is unreachable or answered with an error status
+        """
+        try:
+            r = self.session.request(method, self.base + path, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            raise CliError(f"cannot reach {self.base}: {e}")
+        if r.status_code == 401:
+            raise CliError("not authenticated (or token expired); run `lnt user login USER`")
+        if r.status_code >= 400:
+            try:
+                detail = r.json().get("detail", r.text)
+            except ValueError:
+                detail = r.text
+            raise CliError(f"{method} {path} -> {r.status_code}: {detail}")
+        return r.json()
+
+    def get(self, path, **kwargs):
+        return self.call("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.call("POST", path, **kwargs)
+
+    def map(self, fn, items):
+        """fn(item) for every item, up to `parallel` at a time -> {item: result or {"error": ...}}."""
+        def one(item):
+            try:
+                return fn(item)
+            except CliError as e:
+                return {"error": str(e)}
+        if len(items) <= 1 or self.parallel == 1:
+            return {item: one(item) for item in items}
+        with ThreadPoolExecutor(max_workers=min(self.parallel, len(items))) as pool:
+            return dict(zip(items, pool.map(one, items)))
+
+    def close(self):
+        self.session.close()
+
+
+def _read_host_file(path, fmt=None):
+    """
+    Read a host list from YAML or CSV ("-" for stdin).
+
+    YAML: a list of {hostname, ip_address} entries, or a mapping of
+    hostname -> ip_address (or hostname -> {ansible_host: ...}, as in inventory.yml).
+    CSV: hostname,ip_address columns, with or without a header row.
+    """
+    text = sys.stdin.read() if path == "-" else open(path).read()
+    if fmt is None:
+        fmt = "csv" if path.lower().endswith(".csv") else "yaml"
+
+    hosts = []
+    if fmt == "csv":
+        rows = [r for r in csv.reader(io.StringIO(text)) if r and not r[0].startswith("#")]
+        if rows and rows[0][0].strip().lower() == "hostname":
+            header = [c.strip().lower() for c in rows[0]]
+            ip_col = "ip_address" if "ip_address" in header else "ansible_host"
+            for r in rows[1:]:
+                rec = dict(zip(header, (c.strip() for c in r)))
+                hosts.append({"hostname": rec.get("hostname", ""), "ip_address": rec.get(ip_col, "")})
+        else:
+            for r in rows:
+                hosts.append({"hostname": r[0].strip(), "ip_address": r[1].strip() if len(r) > 1 else ""})
+        return hosts
+
+    data = yaml.safe_load(text) or []
+    if isinstance(data, dict):
+        data = data.get("hosts", data)
+    if isinstance(data, dict):
+        for name, val in data.items():
+            ip = val.get("ansible_host", val.get("ip_address", "")) if isinstance(val, dict) else val
+            hosts.append({"hostname": str(name), "ip_address": str(ip or "")})
+    else:
+        for item in data:
+            if isinstance(item, str):
+                hosts.append({"hostname": item, "ip_address": ""})
+            else:
+                hosts.append({"hostname": str(item.get("hostname", "")),
+                              "ip_address": str(item.get("ip_address", item.get("ansible_host", "")))})
+    return hosts
+
+def _emit(args, data):
+    # --json: one compact JSON document per result (JSON lines when streaming/batching)
+    if args.json:
+        print(json.dumps(data, separators=(",", ":"), default=str), flush=True)
+    else:
+        print(json.dumps(data, indent=2, default=str), flush=True)
 
-def add_device(args):
-    r = requests.post(f"{API_BASE}/device/add", params={"hostname": args.hostname})
-    print(r.json())
+# --- device commands ---
+def list_devices(client, args):
+    params = {"fields": args.fields} if args.fields else None
+    return client.get("/device/list", params=params)
 
-def start_test(args):
-    r = requests.post(f"{API_BASE}/test/start", params={"test_name": args.name})
-    print(r.json())
+def add_device(client, args):
+    return client.post("/device/add", params={"hostname": args.hostname, "ip_address": args.ip_address})
 
-def test_status(args):
-    r = requests.get(f"{API_BASE}/test/status")
-    print(r.json())
+def remove_devices(client, args):
+    return client.map(lambda h: client.post("/device/remove", params={"hostname": h}), args.hostnames)
 
-def user_login(args):
-    r = requests.post(f"{API_BASE}/user/login", params={"username": args.username, "password": args.password})
-    print(r.json())
+def bulk_add_devices(client, args):
+    hosts = _read_host_file(args.file, args.format)
+    return client.post("/device/bulk-add", json={"hosts": hosts})
 
-def list_users(args):
-    r = requests.get(f"{API_BASE}/user/list")
-    print(r.json())
+def bulk_remove_devices(client, args):
+    hostnames = [h["hostname"] for h in _read_host_file(args.file, args.format)]
+    return client.post("/device/bulk-remove", json={"hostnames": hostnames})
 
-def main():
+def refresh_devices(client, args):
+    params = {"wait": args.wait}
+    return client.map(lambda h: client.get(f"/device/refresh/{h}", params=params), args.hostnames)
+
+def refresh_all_devices(client, args):
+    return client.get("/device/refresh-all", params={"wait": args.wait})
+
+def device_stats(client, args):
+    params = {"group_by": args.group_by} if args.group_by else None
+    return client.get("/device/stats", params=params)
+
+def device_job(client, args):
+    if not args.follow:
+        return client.get(f"/device/jobs/{args.job_id}")
+    # long-poll the job's output until it finishes
+    after = 0
+    while True:
+        job = client.get(f"/device/jobs/{args.job_id}", params={"after": after, "wait_s": LONG_POLL_S},
+                         timeout=LONG_POLL_S + HTTP_TIMEOUT_S)
+        for line in job.pop("output", []):
+            if args.json:
+                _emit(args, {"job_id": args.job_id, "line": line})
+            else:
+                print(line, flush=True)
+        after = job.get("next", after)
+        if job.get("state") in ("succeeded", "failed"):
+            return job
+
+# --- test commands ---
+def start_test(client, args):
+    body = {"name": args.name, "config_path": args.config, "image_paths": args.image or None}
+    return client.post("/test/start", json=body)
+
+def test_status(client, args):
+    params = {k: v for k, v in (("status", args.status), ("host", args.host), ("fields", args.fields),
+                                ("limit", args.limit)) if v is not None}
+    if args.summary:
+        params["summary"] = True
+    return client.get("/test/status", params=params)
+
+def stop_tests(client, args):
+    return client.map(lambda t: client.post(f"/test/{t}/stop"), args.test_ids)
+
+def test_logs(client, args):
+    # with --follow, take the change cursor first so nothing logged in between is missed
+    since = client.get("/changes")["next"] if args.follow else None
+    after = 0
+    while True:
+        page = client.get(f"/test/{args.test_id}/logs", params={"after": after})
+        for entry, line in zip(page["entries"], page["logs"]):
+            if args.json:
+                _emit(args, entry)
+            else:
+                print(line, flush=True)
+        after = page["next_cursor"]
+        if not args.follow:
+            return None
+        if client.get(f"/test/{args.test_id}", params={"fields": "status"})["status"] not in ("running", "pending"):
+            return None
+        # sleep until this test logs something (or changes status)
+        while True:
+            changes = client.get("/changes", params={"since": since, "kinds": "test,test_log", "wait_s": LONG_POLL_S},
+                                 timeout=LONG_POLL_S + HTTP_TIMEOUT_S)
+            since = changes["next"]
+            if changes["resync"] or any(c["key"] == args.test_id for c in changes["changes"]):
+                break
+
+# --- watch ---
+def watch(client, args):
+    """Stream device/test changes from /changes (long-poll) until interrupted."""
+    since = args.since if args.since is not None else client.get("/changes")["next"]
+    params = {"kinds": args.kinds} if args.kinds else {}
+    try:
+        while True:
+            page = client.get("/changes", params={**params, "since": since, "wait_s": LONG_POLL_S},
+                              timeout=LONG_POLL_S + HTTP_TIMEOUT_S)
+            if page["resync"]:
+                if args.json:
+                    _emit(args, {"resync": True, "next": page["next"]})
+                else:
+                    print(f"-- missed changes; resyncing from {page['next']}", flush=True)
+            for c in page["changes"]:
+                if args.json:
+                    _emit(args, c)
+                else:
+                    detail = "" if c["data"] is None else c["data"].get("status", c["data"].get("message", ""))
+                    print(f"{c['seq']:>8} {c['kind']:<8} {c['op']:<7} {c['key']} {detail}", flush=True)
+            since = page["next"]
+    except KeyboardInterrupt:
+        return None
+
+# --- user commands ---
+def user_login(client, args):
+    # prompted (or LNT_PASSWORD for scripts), never an argument: argv shows up in ps
+    password = os.environ.get("LNT_PASSWORD")
+    if password is None:
+        password = getpass.getpass(f"Password for {args.username}: ")
+    r = client.post("/user/login", data={"username": args.username, "password": password})
+    client.tokens.put(client.base, args.username, r["access_token"], r.get("expires_in", 3600))
+    client.session.headers["Authorization"] = f"Bearer {r['access_token']}"
+    return {"message": r.get("message", "Login successful!"), "expires_in": r.get("expires_in")}
+
+def user_logout(client, args):
+    try:
+        r = client.post("/user/logout")
+    finally:
+        client.tokens.drop(client.base)
+        client.session.headers.pop("Authorization", None)
+    return r
+
+def list_users(client, args):
+    return client.get("/user/list")
+
+# --- batch ---
+def run_batch(client, args):
+    """
+    Run one command per line from a file or stdin over this process's session.
+    Blank lines and # comments are skipped; -j N runs up to N lines at once
+    (only for independent lines: there's no ordering between them then).
+    """
+    src = sys.stdin if args.file == "-" else open(args.file)
+    lines = [(n, l.strip()) for n, l in enumerate(src, 1) if l.strip() and not l.lstrip().startswith("#")]
+    parser = build_parser()
+
+    def one(item):
+        n, line = item
+        err = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(err):
+                sub = parser.parse_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            msg = err.getvalue().strip().splitlines()
+            return {"line": n, "command": line, "error": msg[-1] if msg else "invalid command"}
+        if not hasattr(sub, "func") or sub.func in (run_batch, watch):
+            return {"line": n, "command": line, "error": "not allowed in a batch"}
+        sub.json = args.json
+        try:
+            return {"line": n, "command": line, "result": sub.func(client, sub)}
+        except CliError as e:
+            return {"line": n, "command": line, "error": str(e)}
+
+    failed = 0
+    if args.jobs > 1:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            results = pool.map(one, lines)
+            for res in results:
+                failed += "error" in res
+                _emit(args, res)
+    else:
+        for item in lines:
+            res = one(item)
+            failed += "error" in res
+            _emit(args, res)
+            if "error" in res and args.stop_on_error:
+                break
+    if failed:
+        raise CliError(f"{failed} of {len(lines)} batch commands failed")
+    return None
+
+def build_parser():
     parser = argparse.ArgumentParser(prog="lnt", description="LNT CLI for interacting with LNT-Core API")
+    parser.add_argument("--api", default=API_BASE, help="API base URL (default: $LNT_API_BASE or %(default)s)")
+    parser.add_argument("--json", action="store_true", help="compact machine-readable JSON output")
+    parser.add_argument("--parallel", type=int, default=PARALLEL,
+                        help="concurrent requests for multi-host commands (default: %(default)s)")
     sub = parser.add_subparsers(dest="command")
 
     # device commands
@@ -37,43 +365,125 @@ def main():
     dev_sub = dev.add_subparsers(dest="action")
 
     l = dev_sub.add_parser("list", help="list connected devices")
+    l.add_argument("--fields", help="only these record fields, e.g. status,duts.count")
     l.set_defaults(func=list_devices)
 
     a = dev_sub.add_parser("add", help="add a new device host")
     a.add_argument("hostname", help="hostname to add")
+    a.add_argument("ip_address", help="address Ansible and the agent are reached at")
     a.set_defaults(func=add_device)
 
+    rm = dev_sub.add_parser("remove", help="remove device hosts (in parallel)")
+    rm.add_argument("hostnames", nargs="+")
+    rm.set_defaults(func=remove_devices)
+
+    ba = dev_sub.add_parser("bulk-add", help="add many device hosts from a YAML or CSV file")
+    ba.add_argument("file", help="host list file, or - for stdin")
+    ba.add_argument("--format", choices=["yaml", "csv"], help="file format (default: from extension)")
+    ba.set_defaults(func=bulk_add_devices)
+
+    br = dev_sub.add_parser("bulk-remove", help="remove many device hosts listed in a YAML or CSV file")
+    br.add_argument("file", help="host list file, or - for stdin")
+    br.add_argument("--format", choices=["yaml", "csv"], help="file format (default: from extension)")
+    br.set_defaults(func=bulk_remove_devices)
+
+    rf = dev_sub.add_parser("refresh", help="refresh device hosts from their agents (in parallel)")
+    rf.add_argument("hostnames", nargs="+")
+    rf.add_argument("--wait", action="store_true", help="wait for fresh state instead of serving cached")
+    rf.set_defaults(func=refresh_devices)
+
+    ra = dev_sub.add_parser("refresh-all", help="refresh every device host")
+    ra.add_argument("--wait", action="store_true", help="wait for the sweep to finish")
+    ra.set_defaults(func=refresh_all_devices)
+
+    st = dev_sub.add_parser("stats", help="fleet totals")
+    st.add_argument("--group-by", help="host variables to break down by, e.g. rack")
+    st.set_defaults(func=device_stats)
+
+    jb = dev_sub.add_parser("job", help="show a provisioning job")
+    jb.add_argument("job_id")
+    jb.add_argument("-f", "--follow", action="store_true", help="stream output until the job finishes")
+    jb.set_defaults(func=device_job)
+
     # test commands
     test = sub.add_parser("test", help="test management")
     test_sub = test.add_subparsers(dest="action")
     s = test_sub.add_parser("start", help="start a test")
     s.add_argument("name", help="test name")
+    s.add_argument("--config", help="test spec YAML path (on the server)")
+    s.add_argument("--image", action="append", help="firmware image path (repeatable)")
     s.set_defaults(func=start_test)
 
     g = test_sub.add_parser("status", help="get test status")
+    g.add_argument("--status")
+    g.add_argument("--host")
+    g.add_argument("--limit", type=int)
+    g.add_argument("--summary", action="store_true", help="leave out test configs")
+    g.add_argument("--fields", help="only these record fields, e.g. status,duts")
     g.set_defaults(func=test_status)
 
+    sp = test_sub.add_parser("stop", help="stop tests (in parallel)")
+    sp.add_argument("test_ids", nargs="+", type=int)
+    sp.set_defaults(func=stop_tests)
+
+    lg = test_sub.add_parser("logs", help="print a test's event log")
+    lg.add_argument("test_id", type=int)
+    lg.add_argument("-f", "--follow", action="store_true", help="keep printing new lines while the test runs")
+    lg.set_defaults(func=test_logs)
+
+    # change stream
+    w = sub.add_parser("watch", help="print device/test changes as they happen")
+    w.add_argument("--kinds", help="comma-separated: host,test,test_log (default: all)")
+    w.add_argument("--since", type=int, help="resume from this change seq")
+    w.set_defaults(func=watch)
 
+    # batch
+    b = sub.add_parser("batch", help="run commands from a file or stdin over one session")
+    b.add_argument("file", help="command file, one command per line, or - for stdin")
+    b.add_argument("-j", "--jobs", type=int, default=1, help="lines run at once (default: 1, in order)")
+    b.add_argument("--stop-on-error", action="store_true", help="stop at the first failing line (with -j 1)")
+    b.set_defaults(func=run_batch)
 
     # user commands
     usr = sub.add_parser("user", help="user management")
     usr_sub = usr.add_subparsers(dest="action")
 
-    lg = usr_sub.add_parser("login", help="login user")
-    lg.add_argument("username")
-    lg.add_argument("password")
-    lg.set_defaults(func=user_login)
+    li = usr_sub.add_parser("login", help="login user (prompts for the password, or reads LNT_PASSWORD; "
+                                          "the token is cached for later commands)")
+    li.add_argument("username")
+    li.set_defaults(func=user_login)
+
+    lo = usr_sub.add_parser("logout", help="revoke and forget the cached token")
+    lo.set_defaults(func=user_logout)
 
     lu = usr_sub.add_parser("list", help="list users")
     lu.set_defaults(func=list_users)
 
-    args = parser.parse_args()
-    if hasattr(args, "func"):
-        args.func(args)
-    else:
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not hasattr(args, "func"):
         parser.print_help()
+        return 2
+    client = Client(args.api, args.parallel)
+    try:
+        result = args.func(client, args)
+        if result is not None:
+            _emit(args, result)
+        return 0
+    except CliError as e:
+        print(f"lnt: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # output piped into head & co.
+        sys.stderr.close()
+        return 0
+    finally:
+        client.close()
 
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,28 @@
+# service settings, overridable through LNT_* environment variables
+
+import os
+
+
+def _flag(name: str, default: str = "0") -> bool:
+    return os.environ.get(name, default).lower() in ("1", "true", "yes", "on")
+
+
+class Settings:
+    # HS256 signing key. Without LNT_JWT_SECRET a random key is generated once and
+    # kept in the state backend (see auth.jwt), so every worker signs with the same
+    # key; set it in any real deployment, and always when running several nodes.
+    JWT_SECRET = os.environ.get("LNT_JWT_SECRET")
+    JWT_EXPIRE_MINUTES = int(os.environ.get("LNT_JWT_EXPIRE_MINUTES", "60"))
+
+    # require a bearer token on /device and /test endpoints (login always stays open)
+    AUTH_REQUIRED = _flag("LNT_AUTH_REQUIRED")
+
+    USER_DB_PATH = os.environ.get("LNT_USER_DB", "data/users.db")
+    # bcrypt runs on its own small pool so a burst of logins can't tie up request workers
+    AUTH_HASH_WORKERS = int(os.environ.get("LNT_AUTH_HASH_WORKERS", "2"))
+    # verified token claims are cached this long (always capped by the token's own exp)
+    TOKEN_CACHE_TTL_S = float(os.environ.get("LNT_TOKEN_CACHE_TTL_S", "60"))
+    TOKEN_CACHE_SIZE = int(os.environ.get("LNT_TOKEN_CACHE_SIZE", "10000"))
+
+
+settings = Settings()
@@ -0,0 +1,223 @@
+# in-memory, sequence-numbered log of device/test mutations for /changes
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from core.leader import process_id
+from core.state_backend import StateBackend, Write
+
+log = logging.getLogger(__name__)
+
+CHANGE_RETENTION = int(os.environ.get("LNT_CHANGE_RETENTION", "10000"))   # changes kept for catch-up
+CHANGE_TAIL_WAIT_S = 1.0   # longest the tailer blocks in backend.wait() before re-checking for shutdown
+
+
+class ChangeFeed:
+    """
+    Every mutation in DeviceManager and TestManager is appended here as
+    {seq, ts, kind, key, op, data}. Clients keep the last seq they saw and ask
+    for what came after it, so a poll costs O(changes since then) rather than
+    O(fleet size).
+
+    Only the newest ``retention`` changes are kept. A cursor older than that
+    gets ``resync: True``: the client refetches the full lists and carries on
+    from the returned ``next``.
+
+    Seqs come from the StateBackend, so with a shared backend every worker
+    hands out the same cursor space. publish() commits to the backend and
+    then pulls the log up to its own change, which keeps read-your-writes;
+    a tailer thread (start()) pulls what other workers commit and passes
+    those changes to subscribe()rs. Kinds starting with "_" are coordination
+    messages between workers and never returned by read().
+
+    Writers are any thread; async readers park on a future that the pull
+    resolves through call_soon_threadsafe, so waiting costs no thread.
+    """
+
+    def __init__(self, backend: StateBackend, retention: int = CHANGE_RETENTION,
+                 origin: Optional[str] = None):
+        self.backend = backend
+        self.origin = origin or process_id()
+        self.retention = retention
+        self._log: deque = deque(maxlen=retention)
+        self._lock = threading.Lock()        # guards _log, _seq and _waiters
+        self._pull_lock = threading.Lock()   # one thread copies from the backend at a time
+        self._waiters: set = set()   # (loop, future)
+        self._listeners: List[Tuple[Optional[frozenset], Callable[[Dict[str, Any]], Any]]] = []
+        self._pending: deque = deque()   # other workers' changes not yet handed to listeners
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # start from the backend's recent history so cursors from other workers stay valid
+        head = self.backend.head()
+        self._seq = self._trimmed_at = max(0, head - retention)
+        self._pull(notify=False)
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def publish(self, kind: str, key: Any, op: str, data: Any = None) -> int:
+        """
+        Append one change and wake waiting readers.
+
+        Args:
+            kind: "host", "test" or "test_log" ("_"-prefixed kinds are internal)
+            key: hostname or test_id
+            op: e.g. "upsert", "remove", "start", "update", "append"
+            data: New record / entry (None for removals); must not be mutated afterwards
+
+        Returns:
+            The change's sequence number
+        """
+        return self.publish_batch([(kind, key, op, data)])[0]
+
+    def publish_batch(self, changes: Iterable[Tuple[str, Any, str, Any]], writes: Iterable[Write] = ()) -> List[int]:
+        """
+        Commit several changes, and the backend documents they describe, in one
+        backend transaction.
+
+        Returns:
+            The changes' sequence numbers, in order
+        """
+        seqs = self.backend.commit(writes, changes, origin=self.origin)
+        if seqs:
+            self._pull(upto=seqs[-1])
+            # keep twice our own retention in the backend so late joiners can fill their log
+            if seqs[-1] - self._trimmed_at > self.retention:
+                self._trimmed_at = seqs[-1]
+                self.backend.trim(2 * self.retention)
+        return seqs
+
+    def _pull(self, upto: Optional[int] = None, notify: bool = True):
+        """Copy backend changes past our head into the local log (until ``upto`` is in, if given)."""
+        with self._pull_lock:
+            while upto is None or self._seq < upto:
+                batch = self.backend.changes_after(self._seq, limit=1000)
+                if not batch:
+                    break
+                with self._lock:
+                    for c in batch:
+                        c = dict(c)   # the memory backend hands out its own dicts
+                        origin = c.pop("origin", None)
+                        self._log.append(c)
+                        if notify and origin != self.origin and self._listeners:
+                            self._pending.append(c)
+                    self._seq = batch[-1]["seq"]
+                    waiters, self._waiters = self._waiters, set()
+                for loop, fut in waiters:
+                    try:
+                        loop.call_soon_threadsafe(_wake, fut)
+                    except RuntimeError:
+                        pass   # loop already closed
+                if upto is None and len(batch) < 1000:
+                    break
+
+    def subscribe(self, fn: Callable[[Dict[str, Any]], Any], kinds: Optional[Iterable[str]] = None):
+        """
+        Call ``fn(change)`` for every change committed by another process
+        (optionally only these kinds), in seq order, on the tailer thread.
+        """
+        self._listeners.append((frozenset(kinds) if kinds else None, fn))
+
+    def start(self):
+        """Start following changes committed by other processes."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lnt-change-tail", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(CHANGE_TAIL_WAIT_S + 5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.backend.wait(self._seq, CHANGE_TAIL_WAIT_S)
+                self._pull()
+                self._dispatch()
+            except Exception:
+                log.exception("Change feed tail error")
+                self._stop.wait(CHANGE_TAIL_WAIT_S)
+
+    def _dispatch(self):
+        while self._pending:
+            change = self._pending.popleft()
+            for kinds, fn in self._listeners:
+                if kinds is None or change["kind"] in kinds:
+                    try:
+                        fn(change)
+                    except Exception:
+                        log.exception("Change listener failed for %s %r", change["kind"], change["key"])
+
+    def read(self, since: Optional[int] = None, limit: int = 1000,
+             kinds: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Changes with seq > ``since``, oldest first.
+
+        Args:
+            since: Last seq the client has seen; None just returns the current head
+            limit: Max changes returned; page on with ``next``
+            kinds: Only return these kinds (``next`` still advances past the others)
+
+        Returns:
+            {"changes": [...], "next": seq to pass as since, "resync": bool}
+        """
+        kinds = set(kinds) if kinds else None
+        with self._lock:
+            head = self._seq
+            if since is None or since == head:
+                return {"changes": [], "next": head, "resync": False}
+            oldest = self._log[0]["seq"] if self._log else head + 1
+            # fell off retention, or a cursor from before a restart
+            if since < oldest - 1 or since < 0 or since > head:
+                return {"changes": [], "next": head, "resync": True}
+            # seqs are contiguous, so the start index is plain arithmetic
+            start = since - oldest + 1
+            out: List[Dict[str, Any]] = []
+            nxt = since
+            for i in range(start, len(self._log)):
+                c = self._log[i]
+                if len(out) >= limit:
+                    break
+                nxt = c["seq"]
+                if c["kind"][0] != "_" and (kinds is None or c["kind"] in kinds):
+                    out.append(c)
+            return {"changes": out, "next": nxt, "resync": False}
+
+    async def wait(self, since: int, timeout: float) -> bool:
+        """Wait on the running loop until seq > ``since``; False on timeout."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self._seq > since:
+                return True
+            entry = (loop, fut)
+            self._waiters.add(entry)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"seq": self._seq, "retained": len(self._log),
+                    "oldest": self._log[0]["seq"] if self._log else self._seq + 1,
+                    "waiters": len(self._waiters), "pending_dispatch": len(self._pending),
+                    "origin": self.origin, "shared": self.backend.shared}
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
@@ -3,12 +3,38 @@
 import yaml
 import os
 import time
-import requests
-from utils.ansible_runner import provision_host
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait
+from core import metrics, request_timing
+from core.change_feed import ChangeFeed
+from core.dut_allocator import DutAllocator
+from core.fleet_stats import FleetStats
+from core.host_client import AGENT_ERRORS, DeviceHostClient
+from core.inventory_cache import InventoryCache
+from core.inventory_snapshot import InventorySnapshot, thaw
+from core.inventory_store import InventoryStore
+from core.provision_jobs import ProvisionQueue
+from core.state_backend import MemoryStateBackend
+from utils.ansible_runner import run_playbook, parse_play_recap
 
-INVENTORY_PATH = "ansible/inventory.yml"
-HOST_API_PORT = 8001
-HTTP_TIMEOUT_S = 5         # simple timeout for REST calls
+INVENTORY_PATH = os.environ.get("LNT_INVENTORY", "ansible/inventory.yml")
+HOST_API_PORT = int(os.environ.get("LNT_HOST_API_PORT", "8001"))   # device host agent port
+HTTP_CONNECT_TIMEOUT_S = 2 # TCP connect timeout for agent calls
+HTTP_TIMEOUT_S = 5         # read timeout for agent calls
+REFRESH_MAX_WORKERS = 32   # concurrent agent calls during a refresh sweep
+REFRESH_DEADLINE_S = 15    # overall budget for one refresh-all sweep
+BULK_MAX_HOSTS = 500       # hosts accepted by one bulk add/remove
+# bumped by every refresh; not worth a change-feed entry on its own
+VOLATILE_HOST_FIELDS = ("last_seen_epoch",)
+HOSTS_NS = "hosts"                       # host records in the state backend
+INVENTORY_MTIME_META = "inventory_mtime"  # inventory.yml mtime the backend's hosts correspond to
+PROVISION_GROUP = "lnt_device_hosts"      # inventory group ansible/provision_host.yml targets
+
+PUBLISH_DURATION = metrics.histogram("inventory_publish_duration_seconds",
+                                     "save_inventory(): publishing a new snapshot and queueing the write")
+PROVISION_DURATION = metrics.histogram("provision_duration_seconds", "ansible-playbook provisioning runs",
+                                       buckets=metrics.DURATION_BUCKETS)
+PROVISION_RUNS = metrics.counter("provision_runs", "ansible-playbook runs by exit code", ["exit_code"])
 
 # Map DUT status -> color for GUI
 DUT_STATUS_COLOR = {
@@ -17,16 +43,183 @@ DUT_STATUS_COLOR = {
     "offline": "red",
 }
 
+
+class HostValidationError(ValueError):
+    """A bulk host change was rejected; ``errors`` lists every problem found."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _differs(old, new) -> bool:
+    """True if a host record changed in more than its VOLATILE_HOST_FIELDS."""
+    if old is None or old is new:
+        return old is None
+    keys = (old.keys() | new.keys()).difference(VOLATILE_HOST_FIELDS)
+    return any(old.get(k) != new.get(k) for k in keys)
+
+
+def _relay(source, target):
+    """Complete the running future ``target`` with ``source``'s outcome."""
+    error = CancelledError() if source.cancelled() else source.exception()
+    if error is None:
+        target.set_result(source.result())
+    else:
+        target.set_exception(error)
+
+
+def _link_group(inventory):
+    """
+    Point all.children.<PROVISION_GROUP>.hosts at all.hosts, so every host
+    (including ones added since the file was read) is in the group the
+    provisioning playbook runs against, and removed ones leave it.
+    """
+    top = inventory["all"]
+    children = top.get("children") or {}
+    group = children.get(PROVISION_GROUP) or {}
+    group["hosts"] = top["hosts"]
+    children[PROVISION_GROUP] = group
+    top["children"] = children
+
+
 class DeviceManager:
-    def __init__(self):
+    """
+    Concurrency model: `self.inventory` is the live, mutable copy and is only
+    touched by writers holding `_lock` (refresh sweeps, add/remove,
+    provisioning). Every mutation ends in save_inventory(), which publishes a
+    new InventorySnapshot by swapping a single attribute. Readers (list, view,
+    stats, the poller) only ever look at `self._snapshot`, so they never take
+    the lock and never wait on a refresh or an inventory flush.
+
+    Host records are shared through the change feed's StateBackend: each
+    publish commits the changed records together with their change entries,
+    and records committed by other workers are applied from the feed. The
+    backend is the source of truth; inventory.yml is an export for Ansible,
+    written behind by the leader (and on demand before a playbook runs), and
+    re-imported at startup if it was edited since the backend last saw it.
+    """
+
+    def __init__(self, changes: ChangeFeed | None = None):
+        # host upserts/removals for /changes; also how records reach other workers.
+        # main passes the feed over the shared backend; built standalone, state stays in this process
+        self.changes = changes or ChangeFeed(MemoryStateBackend())
+        self.state = self.changes.backend
+        # parsed inventory.yml kept across restarts; see InventoryCache
+        self.inventory_cache = InventoryCache()
+        self._cache_entry = b""   # cache entry for the inventory being written; see _render_inventory
         self.inventory = self.load_inventory()
+        # serializes writers; readers use the published snapshot instead
+        self._lock = threading.RLock()
+        self._changed = set()   # hosts modified since the last publish
+        # seq of the change that last set each host, so a late-arriving older change is ignored
+        self._host_seq: dict[str, int] = {}
+        self.inventory["all"]["hosts"] = self._load_shared_hosts(self.inventory["all"]["hosts"])
+        _link_group(self.inventory)
+        # only the leader writes inventory.yml behind changes; see set_leader()
+        self.is_leader = True
+        self._snapshot = InventorySnapshot.build(self.inventory["all"]["hosts"])
+        # fleet totals for /device/stats, updated from each publish
+        self.fleet = FleetStats()
+        for name, rec in self._snapshot.hosts.items():
+            self.fleet.update_host(name, rec)
+        metrics.gauge("hosts", "Device hosts by status", ["status"],
+                      fn=lambda: {(k,): v for k, v in self.fleet.stats()["status_counts"].items()})
+        # free/reserved DUTs by type and host, kept in step with the host records
+        self.duts = DutAllocator()
+        for name, rec in self.inventory["all"]["hosts"].items():
+            self._index_host(name, rec)
+        self._store = InventoryStore(INVENTORY_PATH, self._render_inventory, on_write=self._inventory_written)
+        self.host_client = DeviceHostClient(HTTP_CONNECT_TIMEOUT_S, HTTP_TIMEOUT_S)
+        self.provisioner = ProvisionQueue(self._run_provision, on_start=self._provision_started,
+                                          on_finish=self._provision_finished,
+                                          parse_results=self._provision_results)
+        self._refresh_pool = ThreadPoolExecutor(max_workers=REFRESH_MAX_WORKERS,
+                                                thread_name_prefix="lnt-refresh")
+        self.changes.subscribe(self._apply_remote, kinds=("host", "_hosts_seen"))
+
+    def _inventory_mtime(self):
+        try:
+            return str(os.stat(INVENTORY_PATH).st_mtime_ns)
+        except OSError:
+            return None
+
+    def _load_shared_hosts(self, file_hosts):
+        """
+        Host records from the state backend, after importing inventory.yml into
+        it if the file changed since the backend last saw it (first start,
+        hand edits while the service was down).
+        """
+        hosts, head = self.state.items(HOSTS_NS)
+        mtime = self._inventory_mtime()
+        if mtime is not None and self.state.get_meta(INVENTORY_MTIME_META) != mtime:
+            writes, changes = [], []
+            for name, rec in file_hosts.items():
+                if _differs(hosts.get(name), rec):
+                    writes.append((HOSTS_NS, name, rec))
+                    changes.append(("host", name, "upsert", rec))
+            for name in hosts.keys() - file_hosts.keys():
+                writes.append((HOSTS_NS, name, None))
+                changes.append(("host", name, "remove", None))
+            seqs = self.changes.publish_batch(changes, writes)
+            self.state.set_meta(INVENTORY_MTIME_META, mtime)
+            head = max([head] + seqs)
+            hosts = file_hosts
+        self._host_seq = {name: head for name in hosts}
+        # copying every record is a good part of startup with a large inventory; skip it when we can
+        if self.state.owned_values:
+            return hosts
+        return {name: thaw(rec) for name, rec in hosts.items()}
+
+    def _inventory_written(self):
+        # our own export must not look like a hand edit at the next start,
+        # and shouldn't cost a YAML parse there either
+        mtime = self._inventory_mtime()
+        if mtime is not None:
+            self.state.set_meta(INVENTORY_MTIME_META, mtime)
+        self.inventory_cache.write(self._cache_entry)
+
+    def set_leader(self, leader: bool):
+        """Leader writes inventory.yml behind changes; on election it exports the current records."""
+        self.is_leader = leader
+        if leader:
+            self._store.mark_dirty()
+
+    def _apply_remote(self, change):
+        """Apply a host change committed by another worker (change feed tailer thread)."""
+        seq = change["seq"]
+        with self._lock:
+            hosts = self.inventory["all"]["hosts"]
+            if change["kind"] == "_hosts_seen":
+                for name, epoch in change["data"].items():
+                    if name in hosts and seq > self._host_seq.get(name, 0):
+                        hosts[name]["last_seen_epoch"] = epoch
+                        self._host_seq[name] = seq
+                        self._touch(name)
+            else:
+                name = change["key"]
+                if seq <= self._host_seq.get(name, 0):
+                    return
+                self._host_seq[name] = seq
+                if change["op"] == "remove":
+                    if hosts.pop(name, None) is None:
+                        return
+                    self.duts.remove_host(name)
+                    self.host_client.forget(name)
+                else:
+                    hosts[name] = thaw(change["data"])
+                    self._index_host(name, hosts[name])
+                    self._touch(name)
+            self._publish(remote=True)
+            if self.is_leader:
+                self._store.mark_dirty()
 
     def load_inventory(self):
         """Load inventory from YAML file, creating default structure if missing."""
         if not os.path.exists(INVENTORY_PATH):
             return {"all": {"hosts": {}}}
-        with open(INVENTORY_PATH, "r") as f:
-            data = yaml.safe_load(f) or {}
+        with request_timing.phase(request_timing.YAML_LOAD):
+            data = self.inventory_cache.load(INVENTORY_PATH)
 
         # Normalize to ensure keys exist even if file was partially edited
         if "all" not in data:
@@ -43,23 +236,224 @@ class DeviceManager:
         
         return data
 
-    # writes current python object back to inventory.yml
+    def _index_host(self, hostname, host):
+        self.duts.update_host(hostname, host.get("status", "idle"),
+                              (host.get("duts") or {}).get("items", []))
+
+    def _render_inventory(self) -> str:
+        with self._lock:
+            _link_group(self.inventory)
+            content = yaml.safe_dump(self.inventory, sort_keys=False, default_flow_style=False)
+            # pickled under the same lock, so it matches the text exactly
+            self._cache_entry = self.inventory_cache.pack(self.inventory, content.encode())
+        return content
+
+    # publishes the current records to readers and schedules them to be written
+    # back to inventory.yml; many calls in quick succession turn into a single write
     def save_inventory(self):
-        os.makedirs(os.path.dirname(INVENTORY_PATH), exist_ok=True)
-        with open(INVENTORY_PATH, "w") as f:
-            yaml.safe_dump(self.inventory, f, sort_keys=False, default_flow_style=False)
+        with request_timing.phase(request_timing.INVENTORY_SAVE), PUBLISH_DURATION.time(), self._lock:
+            self._publish()
+            if self.is_leader:
+                self._store.mark_dirty()
+
+    # mark a host record as modified; it is re-copied on the next publish
+    def _touch(self, hostname):
+        self._changed.add(hostname)
+
+    def _publish(self, remote: bool = False):
+        # caller holds the lock; unchanged host records are shared with the previous snapshot.
+        # Local changes are committed to the state backend (records + change entries in one
+        # transaction); ones applied from another worker (remote) were committed there already.
+        previous = self._snapshot.hosts
+        self._snapshot = InventorySnapshot.build(self.inventory["all"]["hosts"], self._snapshot, self._changed)
+        hosts = self._snapshot.hosts
+        writes, changes, seen = [], [], {}
+        for name in self._changed | (hosts.keys() - previous.keys()):
+            if name in hosts:
+                self.fleet.update_host(name, hosts[name])
+                writes.append((HOSTS_NS, name, hosts[name]))
+                if _differs(previous.get(name), hosts[name]):
+                    changes.append(("host", name, "upsert", hosts[name]))
+                else:
+                    seen[name] = hosts[name].get("last_seen_epoch")
+        for name in previous.keys() - hosts.keys():
+            self.fleet.remove_host(name)
+            writes.append((HOSTS_NS, name, None))
+            changes.append(("host", name, "remove", None))
+        self._changed = set()
+        if remote or not writes:
+            return
+        if seen:
+            # volatile-only updates: one internal entry so other workers' ages stay right
+            changes.append(("_hosts_seen", None, "touch", seen))
+        seqs = self.changes.publish_batch(changes, writes)
+        for (kind, name, _, _), seq in zip(changes, seqs):
+            if kind == "host":
+                self._host_seq[name] = seq
+        for name in seen:
+            self._host_seq[name] = seqs[-1]
+
+    # current read-only, versioned view of every host record (never blocks)
+    def snapshot(self) -> InventorySnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    # writes pending changes to inventory.yml right away (e.g. before Ansible reads it)
+    def flush_inventory(self):
+        # forced: a worker that isn't the leader never marks the file dirty
+        with request_timing.phase(request_timing.INVENTORY_SAVE):
+            return self._store.flush(force=True)
+
+    # stop background work and persist anything still pending
+    def close(self):
+        self._refresh_pool.shutdown(wait=False, cancel_futures=True)
+        self.provisioner.shutdown()
+        self.host_client.close()
+        self._store.close()
 
     # QUERIES
     # returns a list of all hosts in inventory
     def list_hosts(self):
-        return list(self.inventory["all"]["hosts"].keys())
+        return list(self._snapshot.hosts)
 
-    # gets all device hosts (full records)
+    # gets all device hosts (full records, read-only)
     def get_hosts(self):
-        return self.inventory["all"]["hosts"]
+        return self._snapshot.hosts
 
-    # adds new device host (also provisions via Ansible)
+    # host records plus how old each one is, for serving cached state
+    def get_hosts_view(self):
+        now = time.time()
+        return {
+            name: {**rec, "age_s": round(now - rec.get("last_seen_epoch", 0), 1)}
+            for name, rec in self._snapshot.hosts.items()
+        }
+
+    # seconds since a host was last refreshed (None if unknown host)
+    def host_age(self, hostname: str):
+        host = self._snapshot.hosts.get(hostname)
+        if host is None:
+            return None
+        return time.time() - host.get("last_seen_epoch", 0)
+
+    # adds new device host and queues its Ansible provisioning;
+    # returns (host record, ProvisionJob) without waiting for the playbook
     def add_host(self, hostname, ip_address):
+        with self._lock:
+            self._add_host_record(hostname, ip_address)
+            self.save_inventory()
+            host = self._snapshot.hosts[hostname]
+
+        # Provision via Ansible (pending -> provisioning -> idle/error)
+        job = self.provisioner.submit([hostname])
+        return host, job
+
+    # --- provisioning job hooks (run on the provisioning worker threads) ---
+    def _run_provision(self, hostnames, on_output):
+        start = time.perf_counter()
+        rc = run_playbook(hostnames, INVENTORY_PATH, on_output=on_output)
+        PROVISION_DURATION.observe(time.perf_counter() - start)
+        PROVISION_RUNS.labels(rc).inc()
+        return rc
+
+    def _provision_started(self, job):
+        self._set_status(job.hostnames, "provisioning")
+        # ansible-playbook reads the inventory from disk
+        self.flush_inventory()
+
+    # per-host outcome of one (possibly multi-host) playbook run, from its PLAY RECAP;
+    # hosts missing from the recap follow the overall exit code
+    def _provision_results(self, job, returncode):
+        recap = parse_play_recap(job.output)
+        results = {}
+        for h in job.hostnames:
+            counts = recap.get(h)
+            if counts is None:
+                ok = returncode == 0
+            else:
+                ok = counts.get("failed", 0) == 0 and counts.get("unreachable", 0) == 0
+            results[h] = {"ok": ok, "recap": counts}
+        return results
+
+    def _provision_finished(self, job):
+        ok = [h for h in job.hostnames if job.results.get(h, {}).get("ok", job.state == "succeeded")]
+        self._set_status(ok, "idle")
+        self._set_status([h for h in job.hostnames if h not in ok], "error")
+
+    def _set_status(self, hostnames, status):
+        with self._lock:
+            hosts = self.inventory["all"]["hosts"]
+            for h in hostnames:
+                if h in hosts:
+                    hosts[h]["status"] = status
+                    self._touch(h)
+                    self.duts.set_host_status(h, status)
+            self.save_inventory()
+
+    # adds many device hosts at once: everything is validated before anything
+    # changes, the inventory is written once and the whole batch is provisioned
+    # by a single playbook run. returns (host records, ProvisionJob)
+    def bulk_add_hosts(self, hosts):
+        """
+        Args:
+            hosts: list of {"hostname": ..., "ip_address": ...}
+
+        Raises:
+            HostValidationError: nothing was added
+        """
+        errors = []
+        if not hosts:
+            errors.append("no hosts given")
+        if len(hosts) > BULK_MAX_HOSTS:
+            errors.append(f"at most {BULK_MAX_HOSTS} hosts per request")
+        seen = set()
+        with self._lock:
+            existing = self.inventory["all"]["hosts"]
+            for i, h in enumerate(hosts):
+                name = (h.get("hostname") or "").strip()
+                ip = (h.get("ip_address") or "").strip()
+                if not name or not ip:
+                    errors.append(f"entry {i + 1}: hostname and ip_address are required")
+                elif name in seen:
+                    errors.append(f"{name}: listed more than once")
+                elif name in existing:
+                    errors.append(f"{name}: already in inventory")
+                seen.add(name)
+            if errors:
+                raise HostValidationError(errors)
+
+            for h in hosts:
+                self._add_host_record(h["hostname"].strip(), h["ip_address"].strip())
+            self.save_inventory()
+            added = {h["hostname"].strip(): self._snapshot.hosts[h["hostname"].strip()] for h in hosts}
+
+        job = self.provisioner.submit(list(added))
+        return added, job
+
+    # removes many device hosts in one inventory change; all-or-nothing
+    def bulk_remove_hosts(self, hostnames):
+        """
+        Raises:
+            HostValidationError: a hostname is unknown (nothing was removed)
+        """
+        with self._lock:
+            hosts = self.inventory["all"]["hosts"]
+            errors = [f"{h}: not found" for h in hostnames if h not in hosts]
+            if not hostnames:
+                errors.append("no hosts given")
+            if errors:
+                raise HostValidationError(errors)
+            for h in hostnames:
+                hosts.pop(h, None)
+                self.duts.remove_host(h)
+                self.host_client.forget(h)
+            self.save_inventory()
+        self.flush_inventory()
+        return list(dict.fromkeys(hostnames))
+
+    def _add_host_record(self, hostname, ip_address):
         self.inventory["all"]["hosts"][hostname] = {
             "ansible_host": ip_address,
             "status": "pending",
@@ -71,122 +465,205 @@ class DeviceManager:
                 "status_counts": {"running": 0, "idle": 0, "offline": 0}
             }
         }
-        self.save_inventory()
-        
-        # Provision via Ansible
-        provision_host(hostname, INVENTORY_PATH)
-        
-        return self.inventory["all"]["hosts"][hostname]
+        self._touch(hostname)
+        self._index_host(hostname, self.inventory["all"]["hosts"][hostname])
 
     # removes device host
     def remove_host(self, hostname):
         """Remove a device host from the system. Returns True if removed, False if not found."""
-        if hostname in self.inventory["all"]["hosts"]:
-            del self.inventory["all"]["hosts"][hostname]
-            self.save_inventory()
-            return True
-        return False
+        with self._lock:
+            if hostname in self.inventory["all"]["hosts"]:
+                del self.inventory["all"]["hosts"][hostname]
+                self.duts.remove_host(hostname)
+                self.save_inventory()
+                self.host_client.forget(hostname)
+                return True
+            return False
 
-    # refresh a single host's status and DUT list by calling the Device Host REST API
+    # fetch both agent endpoints for one host concurrently on the refresh pool
     # expected endpoints on the device host:
     #   GET http://<ip>:<PORT>/api/health -> {"status":"idle"|"busy"}
     #   GET http://<ip>:<PORT>/api/duts   -> {"count":2,"types":["CC26x2","CC13x2"]}
-    def refresh_host_status(self, hostname: str):
-        host = self.inventory["all"]["hosts"][hostname]
-        ip = host["ansible_host"]
+    def _submit_host_fetch(self, hostname: str):
+        ip = self._snapshot.hosts[hostname]["ansible_host"]
         base = f"http://{ip}:{HOST_API_PORT}/api"
+        # bound to the caller's context so agent time shows up in its request's timing
+        get_health = request_timing.bind(self.host_client.get_json, hostname, f"{base}/health")
+        get_duts = request_timing.bind(self.host_client.get_json, hostname, f"{base}/duts")
+        health = self._refresh_pool.submit(get_health)
+        if not self.host_client.is_open(hostname):
+            return health, self._refresh_pool.submit(get_duts)
 
-        try:
-            # Pull host health (busy/idle) and DUT details from the agent.
-            health = requests.get(f"{base}/health", timeout=HTTP_TIMEOUT_S).json()
-            duts_resp = requests.get(f"{base}/duts", timeout=HTTP_TIMEOUT_S).json()
-
-            # update host status
-            host["status"] = health.get("status", "idle")
-            host["last_seen_epoch"] = int(time.time())
-
-            items = duts_resp.get("items")
-
-            if isinstance(items, list):
-                # normalize each item and attach color
-                normalized = []
-                status_counts = {"running": 0, "idle": 0, "offline": 0}
-                types = []
-
-                # Try several common keys to derive a unique DUT identifier; fallback to auto-number.
-                for it in items:
-                    dut_id = str(it.get("id") or it.get("serial") or it.get("name") or f"dut-{len(normalized) + 1}")
-                    dut_type = str(it.get("type") or "")
-                    status = str(it.get("status") or "idle").lower()
-                    if status not in ("running", "idle", "offline"):
-                        status = "idle"
-                    color = DUT_STATUS_COLOR[status]
-                    normalized.append({
-                        "id": dut_id,
-                        "type": dut_type,
-                        "status": status,
-                        "color": color,
-                    })
-                    if dut_type:
-                        types.append(dut_type)
-                    status_counts[status] += 1
-
-                # Persist a full DUT block the GUI can render without more processing.
-                host["duts"] = {
-                    "count": len(normalized),
-                    "types": sorted(set(types)),
-                    "items": normalized,
-                    "status_counts": status_counts,
-                }
+        # an open circuit admits a single probe, so a /duts sent alongside it would be
+        # rejected and a recovered host marked disconnected; /health is the probe and
+        # /duts only goes out once it got an answer
+        duts = Future()
 
-            else:
-                # Legacy/simple shape: {"count": 2, "types": ["CC26x2","CC13x2"]}
-                count = int(duts_resp.get("count", 0))
-                types = list(duts_resp.get("types", []))
-
-                # Without per-DUT info, assume all idle so GUI shows yellow
-                items = [{
-                    "id": f"dut-{i + 1}",
-                    "type": (types[i] if i < len(types) else ""),
-                    "status": "idle",
-                    "color": DUT_STATUS_COLOR["idle"],
-                } for i in range(count)]
-
-                host["duts"] = {
-                    "count": count,
-                    "types": types,
-                    "items": items,
-                    "status_counts": {
-                        "running": 0,
-                        "idle": count,
-                        "offline": 0
-                    },
-                }
+        def after_probe(probe):
+            if not duts.set_running_or_notify_cancel():
+                return   # the sweep has given up on this host
+            error = CancelledError() if probe.cancelled() else probe.exception()
+            if error is None:
+                try:
+                    self._refresh_pool.submit(get_duts).add_done_callback(lambda f: _relay(f, duts))
+                    return
+                except RuntimeError as e:   # pool shut down
+                    error = e
+            duts.set_exception(error)
 
-            self.save_inventory()
-            return host
-        except requests.exceptions.RequestException as e:
-            # Mark host as disconnected if API call fails
-            host["status"] = "disconnected"
-            host["last_seen_epoch"] = int(time.time())
-            self.save_inventory()
+        health.add_done_callback(after_probe)
+        return health, duts
+
+    # write an agent response (or a failure) into the host record;
+    # last_seen_epoch only moves when the agent actually answered
+    def _apply_host_state(self, hostname: str, health=None, duts_resp=None, error=None):
+        host = self.inventory["all"]["hosts"][hostname]
+
+        if error is not None:
+            # Mark host as disconnected if API call fails; an already disconnected
+            # host's record doesn't change, so there is nothing to republish
+            if host.get("status") != "disconnected":
+                host["status"] = "disconnected"
+                self._touch(hostname)
+            self.duts.set_host_status(hostname, "disconnected")
             return host
 
-    # refresh every host, return a dict of hostname -> record
-    def refresh_all_statuses(self):
-        return {h: self.refresh_host_status(h) for h in self.list_hosts()}
+        self._touch(hostname)
+
+        # update host status
+        host["status"] = health.get("status", "idle")
+
+        items = duts_resp.get("items")
 
-    # tiny stats block GUI/CLI can show
-    def inventory_stats(self):
+        if isinstance(items, list):
+            # normalize each item and attach color
+            normalized = []
+            status_counts = {"running": 0, "idle": 0, "offline": 0}
+            types = []
+
+            # Try several common keys to derive a unique DUT identifier; fallback to auto-number.
+            for it in items:
+                dut_id = str(it.get("id") or it.get("serial") or it.get("name") or f"dut-{len(normalized) + 1}")
+                dut_type = str(it.get("type") or "")
+                status = str(it.get("status") or "idle").lower()
+                if status not in ("running", "idle", "offline"):
+                    status = "idle"
+                color = DUT_STATUS_COLOR[status]
+                normalized.append({
+                    "id": dut_id,
+                    "type": dut_type,
+                    "status": status,
+                    "color": color,
+                })
+                if dut_type:
+                    types.append(dut_type)
+                status_counts[status] += 1
+
+            # Persist a full DUT block the GUI can render without more processing.
+            host["duts"] = {
+                "count": len(normalized),
+                "types": sorted(set(types)),
+                "items": normalized,
+                "status_counts": status_counts,
+            }
+
+        else:
+            # Legacy/simple shape: {"count": 2, "types": ["CC26x2","CC13x2"]}
+            count = int(duts_resp.get("count", 0))
+            types = list(duts_resp.get("types", []))
+
+            # Without per-DUT info, assume all idle so GUI shows yellow
+            items = [{
+                "id": f"dut-{i + 1}",
+                "type": (types[i] if i < len(types) else ""),
+                "status": "idle",
+                "color": DUT_STATUS_COLOR["idle"],
+            } for i in range(count)]
+
+            host["duts"] = {
+                "count": count,
+                "types": types,
+                "items": items,
+                "status_counts": {
+                    "running": 0,
+                    "idle": count,
+                    "offline": 0
+                },
+            }
+
+        host["last_seen_epoch"] = int(time.time())
+        self._index_host(hostname, host)
+        return host
+
+    # refresh a single host's status and DUT list by calling the Device Host REST API;
+    # None if the host isn't in the inventory (or was removed while it was being refreshed)
+    def refresh_host_status(self, hostname: str):
+        results, _ = self.refresh_hosts([hostname], deadline_s=HTTP_CONNECT_TIMEOUT_S + HTTP_TIMEOUT_S + 1)
+        return results.get(hostname)
+
+    def refresh_hosts(self, hostnames, deadline_s: float = REFRESH_DEADLINE_S):
+        """
+        Refresh several hosts concurrently, bounded by the refresh pool size.
+
+        Every host's health and DUT calls are in flight at the same time, so the
+        sweep takes about as long as the slowest host (a host whose circuit is open
+        gets /duts only after its /health probe answered). Hosts that have not answered
+        when ``deadline_s`` runs out keep their last known record.
+
+        Returns:
+            (results, timed_out): hostname -> record for every requested host, and
+            the list of hostnames that missed the deadline
+        """
+        hosts = self._snapshot.hosts
+        pending = {h: self._submit_host_fetch(h) for h in hostnames if h in hosts}
+        futures = [f for pair in pending.values() for f in pair]
+        wait(futures, timeout=deadline_s)
+
+        with self._lock:
+            return self._collect_refresh(pending)
+
+    def _collect_refresh(self, pending):
         hosts = self.inventory["all"]["hosts"]
-        status_counts = {"idle": 0, "busy": 0, "disconnected": 0, "pending": 0, "provisioning": 0, "error": 0}
-        total_duts = 0
-        for h in hosts.values():
-            s = h.get("status", "idle")
-            status_counts[s] = status_counts.get(s, 0) + 1
-            total_duts += int(h.get("duts", {}).get("count", 0))
-        return {
-            "host_count": len(hosts),
-            "status_counts": status_counts,
-            "total_duts": total_duts,
-        }
+        results = {}
+        timed_out = []
+        try:
+            for hostname, (health_f, duts_f) in pending.items():
+                if hostname not in hosts:
+                    # removed while the sweep was in flight
+                    continue
+                if not (health_f.done() and duts_f.done()):
+                    # don't let stragglers hold pool slots if they haven't started yet
+                    health_f.cancel()
+                    duts_f.cancel()
+                    timed_out.append(hostname)
+                    results[hostname] = hosts[hostname]
+                    continue
+                error = health_f.exception() or duts_f.exception()
+                if error is None:
+                    try:
+                        results[hostname] = self._apply_host_state(hostname, health_f.result(), duts_f.result())
+                        continue
+                    except Exception as e:
+                        # the agent answered, but not with the JSON we expect; only this host fails
+                        AGENT_ERRORS.labels(hostname, "bad_response").inc()
+                        error = e
+                results[hostname] = self._apply_host_state(hostname, error=error)
+        finally:
+            # one publish + write for the whole sweep instead of one per host; a sweep
+            # that changed nothing (only failures on disconnected hosts) keeps the version
+            if self._changed:
+                self.save_inventory()
+        # hand back the published (read-only) records, not the live ones
+        return {h: self._snapshot.hosts[h] for h in results}, timed_out
+
+    # refresh every host, return a dict of hostname -> record
+    def refresh_all_statuses(self, deadline_s: float = REFRESH_DEADLINE_S):
+        results, _ = self.refresh_hosts(self.list_hosts(), deadline_s=deadline_s)
+        return results
+
+    # stats block GUI/CLI/wallboard can show; read from running totals, optionally
+    # broken down by host variables (e.g. group_by=["rack"])
+    def inventory_stats(self, group_by=None):
+        stats = self.fleet.stats(group_by)
+        stats["version"] = self._snapshot.version
+        return stats
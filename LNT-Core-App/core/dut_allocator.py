@@ -0,0 +1,198 @@
+# index of DUTs across device hosts, and atomic reservation of them for tests
+
+import threading
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# hosts in these states can't take new work, so their DUTs are never handed out
+UNUSABLE_HOST_STATUSES = ("disconnected", "pending", "provisioning", "error")
+
+DutKey = Tuple[str, str]   # (host, dut id)
+
+
+class ReservationError(Exception):
+    """Not enough free DUTs for a reservation; nothing was reserved."""
+
+
+class DutAllocator:
+    """
+    Keeps every known DUT indexed by type, host and status, and hands out free
+    ones to tests.
+
+    Free DUTs are kept as type -> host -> {dut ids}, with hosts that run out
+    dropped from the map, so finding a free DUT never scans busy hosts or
+    DUTs of other types: each DUT handed out is O(1) (O(allowed hosts) when a
+    request is pinned to particular hosts). Reservations are made under one
+    lock and either fully succeed or leave nothing reserved, so concurrent
+    starts can never get the same DUT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._duts: Dict[DutKey, Dict[str, Any]] = {}           # key -> {"host", "id", "type", "status"}
+        self._by_host: Dict[str, set] = {}                      # host -> {dut keys}
+        self._host_status: Dict[str, str] = {}
+        self._free: Dict[str, Dict[str, Dict[str, None]]] = {}  # type -> host -> ordered {dut id}
+        self._owner: Dict[DutKey, Hashable] = {}                # reserved dut -> owner (test id)
+        self._held: Dict[Hashable, List[DutKey]] = {}           # owner -> reserved duts
+
+    # --- index maintenance (called by DeviceManager as host records change) ---
+    def update_host(self, host: str, host_status: str, items: Iterable[Dict[str, Any]]):
+        """Replace what is known about one host's DUTs (items as in host["duts"]["items"])."""
+        with self._lock:
+            for key in self._by_host.pop(host, set()):
+                self._unfree(key)
+                del self._duts[key]
+            self._host_status[host] = host_status
+            keys = set()
+            for it in items or ():
+                key = (host, str(it.get("id")))
+                self._duts[key] = {"host": host, "id": key[1], "type": str(it.get("type") or ""),
+                                   "status": str(it.get("status") or "idle")}
+                keys.add(key)
+                self._maybe_free(key)
+            self._by_host[host] = keys
+
+    def set_host_status(self, host: str, host_status: str):
+        with self._lock:
+            keys = self._by_host.get(host, set())
+            for key in keys:
+                self._unfree(key)
+            self._host_status[host] = host_status
+            for key in keys:
+                self._maybe_free(key)
+
+    def remove_host(self, host: str):
+        with self._lock:
+            for key in self._by_host.pop(host, set()):
+                self._unfree(key)
+                del self._duts[key]
+            self._host_status.pop(host, None)
+
+    def _maybe_free(self, key: DutKey):
+        dut = self._duts.get(key)
+        if (dut is None or key in self._owner or dut["status"] != "idle"
+                or self._host_status.get(key[0]) in UNUSABLE_HOST_STATUSES):
+            return
+        self._free.setdefault(dut["type"], {}).setdefault(key[0], {})[key[1]] = None
+
+    def _unfree(self, key: DutKey):
+        dut = self._duts.get(key)
+        if dut is None:
+            return
+        hosts = self._free.get(dut["type"])
+        if not hosts or key[0] not in hosts:
+            return
+        hosts[key[0]].pop(key[1], None)
+        if not hosts[key[0]]:
+            del hosts[key[0]]
+            if not hosts:
+                del self._free[dut["type"]]
+
+    # --- reservations ---
+    def reserve(self, owner: Hashable, dut_type: str, count: int = 1,
+                constraints: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Reserve ``count`` free DUTs of ``dut_type`` for ``owner`` (normally a test id).
+
+        Args:
+            constraints: optional {"hosts": [...]} (only these hosts),
+                {"exclude_hosts": [...]}, {"same_host": True} (all on one host)
+
+        Raises:
+            ReservationError: not enough matching free DUTs (nothing reserved)
+        """
+        return self.reserve_many(owner, [{"type": dut_type, "count": count, **(constraints or {})}])
+
+    def reserve_many(self, owner: Hashable, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """All-or-nothing reservation of several {"type", "count", <constraints>} requests."""
+        with self._lock:
+            taken: List[DutKey] = []
+            try:
+                for req in requests:
+                    taken += self._take(req)
+            except ReservationError:
+                for key in taken:
+                    self._maybe_free(key)
+                raise
+            for key in taken:
+                self._owner[key] = owner
+            self._held.setdefault(owner, []).extend(taken)
+            return [self._public(key) for key in taken]
+
+    def _take(self, req: Dict[str, Any]) -> List[DutKey]:
+        # caller holds the lock; removes the chosen DUTs from the free index
+        dut_type = str(req.get("type") or "")
+        count = int(req.get("count", 1))
+        free = self._free.get(dut_type, {})
+        allowed = req.get("hosts")
+        excluded = set(req.get("exclude_hosts") or ())
+        candidates = [h for h in allowed if h in free] if allowed else list(free)
+        candidates = [h for h in candidates if h not in excluded]
+
+        if req.get("same_host"):
+            host = next((h for h in candidates if len(free[h]) >= count), None)
+            if host is None:
+                raise ReservationError(f"no single host has {count} free '{dut_type}' DUTs")
+            candidates = [host]
+
+        picked: List[DutKey] = []
+        for host in candidates:
+            for dut_id in islice(free.get(host, {}), count - len(picked)):
+                picked.append((host, dut_id))
+            if len(picked) == count:
+                break
+        if len(picked) < count:
+            raise ReservationError(f"{count} '{dut_type}' DUTs requested, {len(picked)} free")
+        for key in picked:
+            self._unfree(key)
+        return picked
+
+    def release(self, owner: Hashable) -> int:
+        """Free everything ``owner`` holds; returns how many DUTs were released."""
+        with self._lock:
+            keys = self._held.pop(owner, [])
+            for key in keys:
+                self._owner.pop(key, None)
+                self._maybe_free(key)
+            return len(keys)
+
+    def transfer(self, owner: Hashable, new_owner: Hashable):
+        """Move a reservation to another owner (e.g. once the test id is known)."""
+        with self._lock:
+            keys = self._held.pop(owner, [])
+            for key in keys:
+                self._owner[key] = new_owner
+            self._held.setdefault(new_owner, []).extend(keys)
+
+    def restore(self, owner: Hashable, duts: Iterable[Dict[str, Any]]):
+        """Re-take a reservation recorded before a restart (DUTs held by someone else are skipped)."""
+        with self._lock:
+            for d in duts:
+                key = (d["host"], str(d["id"]))
+                if key in self._owner:
+                    continue
+                self._unfree(key)
+                self._owner[key] = owner
+                self._held.setdefault(owner, []).append(key)
+
+    def held_by(self, owner: Hashable) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [self._public(key) for key in self._held.get(owner, [])]
+
+    def _public(self, key: DutKey) -> Dict[str, Any]:
+        dut = self._duts.get(key)
+        return {"host": key[0], "id": key[1], "type": dut["type"] if dut else None}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_type: Dict[str, Dict[str, int]] = {}
+            for key, dut in self._duts.items():
+                t = by_type.setdefault(dut["type"], {"total": 0, "free": 0, "reserved": 0})
+                t["total"] += 1
+                if key in self._owner:
+                    t["reserved"] += 1
+            for dut_type, hosts in self._free.items():
+                by_type.setdefault(dut_type, {"total": 0, "free": 0, "reserved": 0})["free"] = \
+                    sum(len(ids) for ids in hosts.values())
+            return {"types": by_type, "reservations": len(self._held)}
@@ -0,0 +1,150 @@
+# fleet-wide counters for /device/stats, maintained per host change instead of rescanned
+
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+# host variables grouped from the start; others are indexed on first request
+STATS_GROUP_BY = [v for v in os.environ.get("LNT_STATS_GROUP_BY", "rack").split(",") if v]
+HOST_STATUSES = ("idle", "busy", "disconnected", "pending", "provisioning", "error")
+DUT_STATUSES = ("running", "idle", "offline")
+UNGROUPED = "unassigned"   # group value for hosts without the variable
+MAX_GROUP_BYS = 16         # distinct host variables that can be indexed
+
+
+def _contribution(rec: Mapping[str, Any]) -> Dict[str, Any]:
+    """What one host record adds to the fleet totals."""
+    duts = rec.get("duts") or {}
+    items = duts.get("items")
+    by_type: Counter = Counter()
+    by_status: Counter = Counter()
+    if items:
+        for it in items:
+            by_type[(it.get("type") or "", it.get("status") or "idle")] += 1
+            by_status[it.get("status") or "idle"] += 1
+        total = len(items)
+    else:
+        total = duts.get("count") or 0
+        for status, n in (duts.get("status_counts") or {}).items():
+            by_status[status] += n
+    return {"status": rec.get("status", "idle"), "duts": total, "by_type": by_type, "by_status": by_status}
+
+
+class _Bucket:
+    """Host and DUT counters for the whole fleet or one group."""
+
+    __slots__ = ("hosts", "host_status", "duts", "dut_status", "by_type")
+
+    def __init__(self):
+        self.hosts = 0
+        self.host_status: Counter = Counter()
+        self.duts = 0
+        self.dut_status: Counter = Counter()
+        self.by_type: Counter = Counter()   # (type, status) -> n
+
+    def apply(self, c: Dict[str, Any], sign: int):
+        self.hosts += sign
+        self.host_status[c["status"]] += sign
+        self.duts += sign * c["duts"]
+        for k, n in c["by_status"].items():
+            self.dut_status[k] += sign * n
+        for k, n in c["by_type"].items():
+            self.by_type[k] += sign * n
+
+    @property
+    def empty(self) -> bool:
+        return self.hosts == 0
+
+    def render(self) -> Dict[str, Any]:
+        status_counts = {s: 0 for s in HOST_STATUSES}
+        status_counts.update({s: n for s, n in self.host_status.items() if n})
+        dut_status = {s: 0 for s in DUT_STATUSES}
+        dut_status.update({s: n for s, n in self.dut_status.items() if n})
+        by_type: Dict[str, Dict[str, int]] = {}
+        for (dut_type, status), n in self.by_type.items():
+            if n:
+                t = by_type.setdefault(dut_type, {"total": 0, **{s: 0 for s in DUT_STATUSES}})
+                t["total"] += n
+                t[status] = t.get(status, 0) + n
+        return {
+            "host_count": self.hosts,
+            "status_counts": status_counts,
+            "total_duts": self.duts,
+            "dut_status_counts": dut_status,
+            "duts_by_type": by_type,
+            "utilization": round(dut_status["running"] / self.duts, 3) if self.duts else 0.0,
+        }
+
+
+class FleetStats:
+    """
+    Running totals over every host record: host statuses, DUTs per type and
+    status, and the same broken down by host variables (e.g. rack).
+
+    DeviceManager feeds it each changed record; the host's previous
+    contribution is subtracted and the new one added, so an update costs
+    O(DUTs on that host) and reading the stats never touches the hosts at all.
+    """
+
+    def __init__(self, group_by: Iterable[str] = STATS_GROUP_BY):
+        self._lock = threading.Lock()
+        self._total = _Bucket()
+        self._hosts: Dict[str, Dict[str, Any]] = {}        # host -> last contribution
+        self._records: Dict[str, Mapping[str, Any]] = {}   # host -> last record (for new group-bys)
+        self._groups: Dict[str, Dict[Any, _Bucket]] = {v: {} for v in group_by}
+
+    def update_host(self, name: str, rec: Mapping[str, Any]):
+        c = _contribution(rec)
+        with self._lock:
+            old = self._hosts.get(name)
+            if old is not None:
+                self._apply(name, self._records[name], old, -1)
+            self._hosts[name] = c
+            self._records[name] = rec
+            self._apply(name, rec, c, +1)
+
+    def remove_host(self, name: str):
+        with self._lock:
+            old = self._hosts.pop(name, None)
+            if old is not None:
+                self._apply(name, self._records.pop(name), old, -1)
+
+    def _apply(self, name: str, rec: Mapping[str, Any], c: Dict[str, Any], sign: int):
+        self._total.apply(c, sign)
+        for var, buckets in self._groups.items():
+            self._apply_group(buckets, rec, var, c, sign)
+
+    @staticmethod
+    def _apply_group(buckets: Dict[Any, _Bucket], rec: Mapping[str, Any], var: str,
+                     c: Dict[str, Any], sign: int):
+        value = rec.get(var, UNGROUPED)
+        if not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        bucket = buckets.get(value)
+        if bucket is None:
+            bucket = buckets[value] = _Bucket()
+        bucket.apply(c, sign)
+        if bucket.empty:
+            del buckets[value]
+
+    def _ensure_group(self, var: str):
+        # caller holds the lock; one scan the first time a variable is asked for
+        if var in self._groups:
+            return
+        if len(self._groups) >= MAX_GROUP_BYS:
+            raise ValueError(f"at most {MAX_GROUP_BYS} group-by variables can be tracked")
+        buckets: Dict[Any, _Bucket] = {}
+        for name, c in self._hosts.items():
+            self._apply_group(buckets, self._records[name], var, c, +1)
+        self._groups[var] = buckets
+
+    def stats(self, group_by: Optional[List[str]] = None) -> Dict[str, Any]:
+        with self._lock:
+            out = self._total.render()
+            if group_by:
+                out["groups"] = {}
+                for var in group_by:
+                    self._ensure_group(var)
+                    out["groups"][var] = {str(k): b.render() for k, b in self._groups[var].items()}
+            return out
@@ -0,0 +1,194 @@
+# pooled HTTP client for device host agents
+
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from core import metrics, request_timing
+
+POOL_MAXSIZE = 4                 # keep-alive connections kept per host (health + duts + spare)
+BREAKER_FAILURE_THRESHOLD = 3    # consecutive failures before a host's circuit opens
+BREAKER_BASE_BACKOFF_S = 10      # first open period; doubles each time a probe fails
+BREAKER_MAX_BACKOFF_S = 300
+LATENCY_EWMA_ALPHA = 0.2
+
+AGENT_LATENCY = metrics.histogram("agent_request_duration_seconds", "Device host agent call latency",
+                                  ["host", "endpoint"])
+AGENT_ERRORS = metrics.counter("agent_request_errors", "Failed device host agent calls", ["host", "kind"])
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+def _round(ms: float | None):
+    return None if ms is None else round(ms, 1)
+
+
+class _HostState:
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+
+        # circuit breaker
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.backoff_s = 0.0
+        self.probe_in_flight = False
+
+        # counters
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_latency_ms: float | None = None
+        self.ewma_latency_ms: float | None = None
+        self.last_error: str | None = None
+        self.last_error_epoch: int | None = None
+
+
+def _error_kind(e: Exception) -> str:
+    if isinstance(e, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(e, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return "connect"
+    if isinstance(e, requests.exceptions.HTTPError):
+        return "http"
+    if isinstance(e, ValueError):
+        return "bad_response"
+    return "other"
+
+
+class DeviceHostClient:
+    """
+    Talks to the REST agent on each device host.
+
+    Each host gets its own keep-alive session so polls reuse connections. After
+    ``BREAKER_FAILURE_THRESHOLD`` consecutive failures the host's circuit opens
+    and calls fail fast with CircuitOpenError; once the backoff expires a single
+    probe is let through, and each failed probe doubles the backoff up to
+    ``BREAKER_MAX_BACKOFF_S``.
+    """
+
+    def __init__(self, connect_timeout_s: float, read_timeout_s: float):
+        self.timeout = (connect_timeout_s, read_timeout_s)
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, hostname: str) -> _HostState:
+        state = self._hosts.get(hostname)
+        if state is None:
+            with self._lock:
+                state = self._hosts.setdefault(hostname, _HostState())
+        return state
+
+    def _admit(self, state: _HostState) -> str | None:
+        """Return "closed" or "probe" if a call may go out, None if the circuit rejects it."""
+        with state.lock:
+            if state.consecutive_failures < BREAKER_FAILURE_THRESHOLD:
+                return "closed"
+            if time.time() < state.open_until or state.probe_in_flight:
+                state.rejected += 1
+                return None
+            state.probe_in_flight = True
+            return "probe"
+
+    def _record(self, state: _HostState, latency_ms: float, error: Exception | None, probe: bool):
+        with state.lock:
+            state.requests += 1
+            if probe:
+                state.probe_in_flight = False
+            state.last_latency_ms = latency_ms
+            if state.ewma_latency_ms is None:
+                state.ewma_latency_ms = latency_ms
+            else:
+                state.ewma_latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - state.ewma_latency_ms)
+
+            if error is None:
+                state.consecutive_failures = 0
+                state.backoff_s = 0.0
+                state.open_until = 0.0
+                return
+
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = f"{type(error).__name__}: {error}"
+            state.last_error_epoch = int(time.time())
+            if probe:
+                state.backoff_s = min(state.backoff_s * 2, BREAKER_MAX_BACKOFF_S)
+                state.open_until = time.time() + state.backoff_s
+            elif state.consecutive_failures == BREAKER_FAILURE_THRESHOLD:
+                # just tripped; calls that were already in flight don't extend it
+                state.backoff_s = BREAKER_BASE_BACKOFF_S
+                state.open_until = time.time() + state.backoff_s
+
+    def get_json(self, hostname: str, url: str):
+        """GET ``url`` on behalf of ``hostname`` and decode the JSON body."""
+        state = self._state(hostname)
+        admitted = self._admit(state)
+        if admitted is None:
+            AGENT_ERRORS.labels(hostname, "circuit_open").inc()
+            raise CircuitOpenError(f"circuit open for {hostname}")
+        probe = admitted == "probe"
+
+        start = time.perf_counter()
+        try:
+            with request_timing.phase(request_timing.AGENT_HTTP):
+                resp = state.session.get(url, timeout=self.timeout)
+                resp.raise_for_status()
+                data = resp.json()
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            self._record(state, elapsed * 1000, e, probe)
+            AGENT_LATENCY.labels(hostname, url.rsplit("/", 1)[-1]).observe(elapsed)
+            AGENT_ERRORS.labels(hostname, _error_kind(e)).inc()
+            raise
+        elapsed = time.perf_counter() - start
+        self._record(state, elapsed * 1000, None, probe)
+        AGENT_LATENCY.labels(hostname, url.rsplit("/", 1)[-1]).observe(elapsed)
+        return data
+
+    def is_open(self, hostname: str) -> bool:
+        state = self._hosts.get(hostname)
+        return bool(state and state.consecutive_failures >= BREAKER_FAILURE_THRESHOLD)
+
+    def forget(self, hostname: str):
+        """Drop a host's session and counters (e.g. after it is removed from inventory)."""
+        with self._lock:
+            state = self._hosts.pop(hostname, None)
+        if state:
+            state.session.close()
+        AGENT_LATENCY.remove(host=hostname)
+        AGENT_ERRORS.remove(host=hostname)
+
+    def stats(self) -> dict:
+        """Per-host latency, failure and circuit breaker counters."""
+        now = time.time()
+        out = {}
+        for hostname, state in list(self._hosts.items()):
+            with state.lock:
+                is_open = state.consecutive_failures >= BREAKER_FAILURE_THRESHOLD
+                out[hostname] = {
+                    "circuit": ("half-open" if state.probe_in_flight else "open") if is_open else "closed",
+                    "retry_in_s": round(max(0.0, state.open_until - now), 1) if is_open else 0,
+                    "requests": state.requests,
+                    "failures": state.failures,
+                    "rejected": state.rejected,
+                    "consecutive_failures": state.consecutive_failures,
+                    "last_latency_ms": _round(state.last_latency_ms),
+                    "ewma_latency_ms": _round(state.ewma_latency_ms),
+                    "last_error": state.last_error,
+                    "last_error_epoch": state.last_error_epoch,
+                }
+        return out
+
+    def close(self):
+        with self._lock:
+            states = list(self._hosts.values())
+            self._hosts.clear()
+        for state in states:
+            state.session.close()
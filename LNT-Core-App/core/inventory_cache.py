@@ -0,0 +1,131 @@
+# binary snapshot of the parsed inventory.yml, so a restart can skip the YAML parse
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+import yaml
+
+log = logging.getLogger(__name__)
+
+INVENTORY_CACHE_PATH = os.environ.get("LNT_INVENTORY_CACHE", "data/inventory.cache")   # "" turns it off
+
+# libyaml when PyYAML was built with it (same results, several times faster)
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_MAGIC = b"LNTINV1\n"
+_CHECKSUM_SIZE = 16
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=_CHECKSUM_SIZE).digest()
+
+
+def parse_yaml(content) -> dict:
+    """Parse inventory YAML (text or bytes) with the fastest safe loader available."""
+    return yaml.load(content, Loader=_Loader) or {}
+
+
+class InventoryCache:
+    """
+    The parsed inventory, pickled under data/ next to the other runtime state.
+
+    An entry is keyed by the source file's (mtime_ns, size) and a hash of its
+    bytes. A matching mtime/size is trusted without reading the file; otherwise
+    the file is read and hashed, and the entry is still used if the content is
+    unchanged (a touch, a copy, our own export). Entries carry a checksum, so a
+    truncated or corrupt cache is only a miss. The file is unpickled, so it must
+    be as trusted as the rest of data/.
+    """
+
+    def __init__(self, path: str = INVENTORY_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.last_load: dict = {}
+
+    def load(self, source: str) -> dict:
+        """
+        Parsed contents of ``source``, from the cache when it is current.
+
+        Raises:
+            OSError: ``source`` can't be read
+            yaml.YAMLError: ``source`` isn't valid YAML
+        """
+        start = time.perf_counter()
+        entry = self._read()
+        st = os.stat(source)
+        how = "cache"
+        if entry is not None and entry["stat"] == (st.st_mtime_ns, st.st_size):
+            data = entry["data"]
+        else:
+            with open(source, "rb") as f:
+                content = f.read()
+                # the stat of what we read (an atomic rename can't slip in between)
+                st = os.fstat(f.fileno())
+            digest = _digest(content)
+            if entry is not None and entry["digest"] == digest:
+                data = entry["data"]
+            else:
+                how = "yaml"
+                data = parse_yaml(content)
+            # new key either way, so the next start takes the fast path
+            self.write(self.pack(data, content, stat=(st.st_mtime_ns, st.st_size)))
+        if how == "cache":
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.last_load = {"source": how, "ms": round((time.perf_counter() - start) * 1000, 1),
+                          "bytes": st.st_size}
+        return data
+
+    def pack(self, data: dict, content: bytes, stat=None) -> bytes:
+        """
+        Serialized cache entry for ``data``, the parse of ``content``. Without
+        ``stat`` the next load hashes the file before trusting the entry.
+        """
+        if not self.path:
+            return b""
+        payload = pickle.dumps({"stat": stat, "digest": _digest(content), "data": data},
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        return _MAGIC + _digest(payload) + payload
+
+    def write(self, blob: bytes):
+        """Atomically replace the cache file with ``blob`` (from pack()); failures are only logged."""
+        if not self.path or not blob:
+            return
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".inventory.", suffix=".cache.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(blob)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            log.warning("Writing inventory cache failed: %s", e)
+
+    def _read(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                blob = f.read()
+        except OSError:
+            return None
+        head = len(_MAGIC) + _CHECKSUM_SIZE
+        if blob[:len(_MAGIC)] != _MAGIC or _digest(blob[head:]) != blob[len(_MAGIC):head]:
+            return None
+        try:
+            entry = pickle.loads(blob[head:])
+        except Exception:
+            return None
+        return entry if isinstance(entry, dict) and isinstance(entry.get("data"), dict) else None
+
+    def stats(self) -> dict:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "last_load": self.last_load}
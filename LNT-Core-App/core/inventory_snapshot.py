@@ -0,0 +1,74 @@
+# immutable, versioned views of the device inventory for lock-free readers
+
+import copy
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+
+class FrozenDict(dict):
+    """
+    dict that refuses to be modified. Still a dict, so it serializes (JSON,
+    FastAPI) like the host records it replaces; copies come back as plain dicts.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("inventory snapshots are read-only; change hosts through DeviceManager")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {k: copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def freeze(obj: Any) -> Any:
+    """Deep, read-only copy of a host record (dicts -> FrozenDict, lists -> tuples)."""
+    if isinstance(obj, dict):
+        return FrozenDict({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Plain, mutable deep copy (the inverse of freeze; also for records from the state backend)."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+class InventorySnapshot:
+    """
+    One published version of every host record. Never changes once built;
+    DeviceManager swaps in a new one after each mutation, re-freezing only
+    the hosts that changed and sharing the rest with the previous version.
+    """
+
+    __slots__ = ("version", "hosts", "created_at")
+
+    def __init__(self, version: int, hosts: Mapping[str, FrozenDict]):
+        self.version = version
+        self.hosts = MappingProxyType(hosts)
+        self.created_at = time.time()
+
+    @classmethod
+    def build(cls, live_hosts: Dict[str, Dict[str, Any]], previous: Optional["InventorySnapshot"] = None,
+              changed: Iterable[str] = ()) -> "InventorySnapshot":
+        """Next snapshot from the live records; only ``changed`` (and new) hosts are copied."""
+        if previous is None:
+            return cls(1, {name: freeze(rec) for name, rec in live_hosts.items()})
+        changed = set(changed)
+        old = previous.hosts
+        hosts = {}
+        for name, rec in live_hosts.items():
+            hosts[name] = freeze(rec) if name in changed or name not in old else old[name]
+        return cls(previous.version + 1, hosts)
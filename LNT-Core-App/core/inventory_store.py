@@ -0,0 +1,151 @@
+# write-behind persistence for ansible/inventory.yml
+
+import os
+import tempfile
+import threading
+import time
+from core import metrics
+
+FLUSH_DEBOUNCE_S = 2.0     # quiet period before a dirty inventory is written
+FLUSH_MAX_DELAY_S = 10.0   # never hold a dirty inventory longer than this under constant churn
+
+WRITE_DURATION = metrics.histogram("inventory_write_duration_seconds",
+                                   "Rendering and atomically writing inventory.yml")
+WRITE_BYTES = metrics.histogram("inventory_write_bytes", "Size of each inventory.yml write",
+                                buckets=metrics.SIZE_BUCKETS)
+
+
+class InventoryStore:
+    """
+    Coalesces inventory mutations into debounced, atomic file writes.
+
+    Callers mark the inventory dirty after each mutation; one background timer
+    writes it once things go quiet for ``debounce_s`` (or ``max_delay_s`` after
+    the first unsaved change). Writes go to a temp file in the same directory,
+    are fsynced and then renamed over the target so a crash never leaves a
+    truncated inventory behind.
+    """
+
+    def __init__(self, path: str, render, debounce_s: float = FLUSH_DEBOUNCE_S,
+                 max_delay_s: float = FLUSH_MAX_DELAY_S, on_write=None):
+        """
+        Args:
+            path: File to persist to
+            render: Callable returning the full file contents as a string; called
+                    from whichever thread flushes, so it must do its own locking
+            debounce_s: Quiet period before flushing
+            max_delay_s: Upper bound on how long a change can stay unwritten
+            on_write: Called with no arguments after each successful write
+        """
+        self.path = path
+        self.render = render
+        self.on_write = on_write
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()   # one writer at a time (timer vs explicit flush)
+        self._generation = 0                  # bumped on every mark_dirty
+        self._flushed_generation = 0
+        self._first_dirty_at: float | None = None
+        self._timer: threading.Timer | None = None
+        self._closed = False
+
+    @property
+    def dirty(self) -> bool:
+        return self._generation != self._flushed_generation
+
+    def mark_dirty(self):
+        with self._lock:
+            self._generation += 1
+            now = time.monotonic()
+            if self._first_dirty_at is None:
+                self._first_dirty_at = now
+            self._schedule_locked(now)
+
+    def _schedule_locked(self, now: float):
+        if self._closed:
+            return
+        # restart the quiet period, but never push past max_delay_s
+        delay = min(self.debounce_s, self._first_dirty_at + self.max_delay_s - now)
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(0.0, delay), self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self, force: bool = False) -> bool:
+        """
+        Write the inventory now if it has unsaved changes (or regardless, with
+        ``force``). Returns True if a write happened.
+        """
+        with self._flush_lock:
+            with self._lock:
+                generation = self._generation
+                if generation == self._flushed_generation and not force:
+                    return False
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                self._first_dirty_at = None
+
+            start = time.perf_counter()
+            try:
+                content = self.render()
+                written = self._write_atomic(content)
+            except Exception:
+                # keep the changes pending and retry after another quiet period
+                with self._lock:
+                    now = time.monotonic()
+                    if self._first_dirty_at is None:
+                        self._first_dirty_at = now
+                    self._schedule_locked(now)
+                raise
+
+            WRITE_DURATION.observe(time.perf_counter() - start)
+            WRITE_BYTES.observe(written)
+            with self._lock:
+                self._flushed_generation = generation
+            if self.on_write is not None:
+                self.on_write()
+            return True
+
+    def close(self):
+        """Stop the timer and write any pending changes."""
+        with self._lock:
+            self._closed = True
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        self.flush()
+
+    def _write_atomic(self, content: str) -> int:
+        """Returns the number of bytes written."""
+        data = content.encode()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".inventory.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # make the rename itself durable
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return len(data)
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+        return len(data)
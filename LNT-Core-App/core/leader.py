@@ -0,0 +1,93 @@
+# leader election over a StateBackend lease: one worker runs the pollers and timers
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, List, Optional
+from core.state_backend import StateBackend
+
+log = logging.getLogger(__name__)
+
+LEADER_LEASE = "lnt-leader"
+LEADER_TTL_S = float(os.environ.get("LNT_LEADER_TTL_S", "10"))   # a dead leader is replaced after this
+
+
+def process_id() -> str:
+    """Identifies this worker in leases, claims and change origins."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaderElector:
+    """
+    Holds the leader lease while this process is alive. The lease is renewed
+    every ttl/3; if that fails (another worker holds it, or the backend is
+    unreachable) the process steps down and retries. A leader that stalls for
+    longer than the ttl finds out at its next renewal.
+
+    on_elected / on_demoted run on the elector thread (the first decision,
+    either way, inline in start()).
+    """
+
+    def __init__(self, backend: StateBackend, holder: Optional[str] = None, name: str = LEADER_LEASE,
+                 ttl_s: float = LEADER_TTL_S):
+        self.backend = backend
+        self.holder = holder or process_id()
+        self.name = name
+        self.ttl_s = ttl_s
+        self.is_leader: Optional[bool] = None   # undecided until the first attempt
+        self._on_elected: List[Callable[[], None]] = []
+        self._on_demoted: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def on_elected(self, fn: Callable[[], None]):
+        self._on_elected.append(fn)
+
+    def on_demoted(self, fn: Callable[[], None]):
+        self._on_demoted.append(fn)
+
+    def start(self):
+        self._stop.clear()
+        # first attempt inline, so a lone worker leads as soon as startup finishes
+        self._tick()
+        self._thread = threading.Thread(target=self._run, name="lnt-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        if self.is_leader:
+            self._set(False)
+            try:
+                self.backend.release_lease(self.name, self.holder)
+            except Exception as e:
+                log.warning("Releasing leader lease failed: %s", e)
+
+    def _tick(self):
+        try:
+            held = self.backend.acquire_lease(self.name, self.holder, self.ttl_s)
+        except Exception as e:
+            log.warning("Leader lease renewal failed: %s", e)
+            held = False
+        if held != self.is_leader:
+            self._set(held)
+
+    def _set(self, leader: bool):
+        self.is_leader = leader
+        for fn in (self._on_elected if leader else self._on_demoted):
+            try:
+                fn()
+            except Exception:
+                log.exception("Leader %s hook failed", "election" if leader else "demotion")
+
+    def _run(self):
+        while not self._stop.wait(self.ttl_s / 3):
+            self._tick()
+
+    def stats(self) -> dict:
+        return {"holder": self.holder, "is_leader": bool(self.is_leader),
+                "leader": self.backend.lease_holder(self.name), "ttl_s": self.ttl_s}
@@ -0,0 +1,359 @@
+# full-text search over test event logs and serial log files
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from core.serial_log_reader import parse_line_ts
+
+log = logging.getLogger(__name__)
+
+SEARCH_DB_PATH = os.environ.get("LNT_SEARCH_DB", "data/search.db")
+INGEST_BATCH_MAX = 2000          # lines written per transaction
+INGEST_FLUSH_S = 0.5             # how long queued event lines may wait before being indexed
+SERIAL_SCAN_INTERVAL_S = 10      # how often registered serial log files are checked for growth
+SERIAL_READ_CHUNK = 4 * 1024 * 1024
+SERIAL_MAX_LINE = 64 * 1024      # a line with no newline in a whole read chunk is indexed cut to this
+
+
+def to_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every whitespace-separated term must match."""
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+class LogSearchIndex:
+    """
+    Incremental SQLite FTS5 index of every log line the service sees.
+
+    Test event log entries are queued by TestManager and written in batches by
+    a background thread. Serial log files are registered per (test, host, port)
+    and the same thread indexes whatever they have grown by since the last
+    scan, tracking a byte offset per file, so nothing is ever re-read. A
+    line longer than a read chunk is indexed truncated and the rest of it
+    skipped. Each batch commits only if the file's offset in the database is
+    still the one it was read from, so workers sharing search.db never index
+    the same bytes twice (only the leader scans in the background; any
+    worker may catch a test up before searching it). When a file is rotated (or the port is pointed at another file)
+    its rows are dropped and it is indexed from the start, so line numbers
+    and context always refer to the current file.
+    """
+
+    def __init__(self, path: str = SEARCH_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()   # one serial catch-up at a time in this process
+        # background scans of serial files; TestManager turns this off on workers that aren't the leader
+        self.scan_serial = True
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS log_lines (
+                    id INTEGER PRIMARY KEY,
+                    test_id INTEGER NOT NULL,
+                    source TEXT NOT NULL,          -- 'event' or 'serial'
+                    host TEXT NOT NULL DEFAULT '',
+                    port TEXT NOT NULL DEFAULT '',
+                    line_no INTEGER NOT NULL,      -- event seq, or 0-based line in the serial file
+                    ts TEXT,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_log_lines_loc
+                    ON log_lines(test_id, source, host, port, line_no);
+                CREATE INDEX IF NOT EXISTS idx_log_lines_seq ON log_lines(test_id, source, line_no);
+                CREATE INDEX IF NOT EXISTS idx_log_lines_ts ON log_lines(ts);
+
+                CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5(
+                    message, content='log_lines', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS log_lines_ai AFTER INSERT ON log_lines BEGIN
+                    INSERT INTO log_fts(rowid, message) VALUES (new.id, new.message);
+                END;
+                CREATE TRIGGER IF NOT EXISTS log_lines_ad AFTER DELETE ON log_lines BEGIN
+                    INSERT INTO log_fts(log_fts, rowid, message) VALUES ('delete', old.id, old.message);
+                END;
+
+                CREATE TABLE IF NOT EXISTS serial_files (
+                    test_id INTEGER NOT NULL,
+                    host TEXT NOT NULL,
+                    port TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    inode INTEGER,
+                    offset INTEGER NOT NULL DEFAULT 0,
+                    line_no INTEGER NOT NULL DEFAULT 0,
+                    last_ts TEXT,
+                    partial INTEGER NOT NULL DEFAULT 0,   -- offset is inside an oversized line
+                    PRIMARY KEY (test_id, host, port)
+                );
+            """)
+            # databases created before oversized lines were handled
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(serial_files)")}
+            if "partial" not in columns:
+                self._conn.execute("ALTER TABLE serial_files ADD COLUMN partial INTEGER NOT NULL DEFAULT 0")
+
+    # --- lifecycle ---
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lnt-log-search", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        self._drain()
+        with self._lock:
+            self._conn.close()
+
+    # --- ingestion ---
+    def add_event(self, test_id: int, entry: Dict[str, Any]):
+        """Queue a test event log entry (as produced by core.test_log) for indexing."""
+        self._queue.put((test_id, "event", entry.get("host") or "", "", entry["seq"],
+                         entry.get("ts"), entry["message"]))
+
+    def register_serial_file(self, test_id: int, host: str, port: str, path: str):
+        """Start (or keep) indexing a serial log file for a test's host/port."""
+        key = (test_id, host, port)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT path FROM serial_files WHERE test_id = ? AND host = ? AND port = ?",
+                                         key).fetchone()
+                if row is None:
+                    self._conn.execute("INSERT INTO serial_files (test_id, host, port, path) VALUES (?, ?, ?, ?)",
+                                       (*key, path))
+                elif row["path"] != path:
+                    # another file now: its line numbers would collide with the old file's rows
+                    self._clear_serial_rows(key)
+                    self._conn.execute(
+                        "UPDATE serial_files SET path = ?, inode = NULL, offset = 0, line_no = 0, last_ts = NULL, "
+                        "partial = 0 WHERE test_id = ? AND host = ? AND port = ?", (path, *key))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _clear_serial_rows(self, key):
+        # caller holds the lock inside a transaction
+        self._conn.execute("DELETE FROM log_lines WHERE test_id = ? AND source = 'serial' AND host = ? AND port = ?",
+                           key)
+
+    def _drain(self, first=None):
+        rows = [first] if first is not None else []
+        while len(rows) < INGEST_BATCH_MAX:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            self._insert(rows)
+        return len(rows)
+
+    def _insert(self, rows):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO log_lines (test_id, source, host, port, line_no, ts, message) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def sync_serial_files(self, test_id: Optional[int] = None):
+        """Index new complete lines of every registered serial file (or one test's files)."""
+        with self._sync_lock:
+            with self._lock:
+                sql = "SELECT * FROM serial_files"
+                params = ()
+                if test_id is not None:
+                    sql += " WHERE test_id = ?"
+                    params = (test_id,)
+                files = [dict(r) for r in self._conn.execute(sql, params)]
+            for f in files:
+                self._sync_file(f)
+
+    def _sync_file(self, f: Dict[str, Any]):
+        try:
+            st = os.stat(f["path"])
+        except OSError:
+            return
+        key = (f["test_id"], f["host"], f["port"])
+        # where the database had the file when we read it; see the check before each commit
+        claimed = (f["inode"], f["offset"])
+        offset, line_no, last_ts, partial = f["offset"], f["line_no"], f["last_ts"], f["partial"]
+        reset = False
+        if f["inode"] != st.st_ino or st.st_size < offset:
+            # new or rotated file; rows from a previous one would mix into line numbers and context
+            reset = f["inode"] is not None
+            offset, line_no, last_ts, partial = 0, 0, None, 0
+        if st.st_size == offset:
+            return
+
+        rows = []
+
+        def add(raw: bytes):
+            nonlocal last_ts
+            ts = parse_line_ts(raw)
+            if ts is not None:
+                last_ts = ts.isoformat()
+            text = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if text:
+                rows.append((f["test_id"], "serial", f["host"], f["port"], line_no, last_ts, text))
+
+        with open(f["path"], "rb") as fh:
+            while True:
+                fh.seek(offset)
+                chunk = fh.read(SERIAL_READ_CHUNK)
+                rows.clear()
+                consumed = 0
+                if partial:
+                    # skip the rest of an oversized line whose head is already indexed
+                    eol = chunk.find(b"\n")
+                    if eol < 0:
+                        consumed = len(chunk)
+                    else:
+                        consumed, partial = eol + 1, 0
+                        line_no += 1
+                if not partial:
+                    end = chunk.rfind(b"\n") + 1     # only complete lines
+                    if end > consumed:
+                        for raw in chunk[consumed:end].split(b"\n")[:-1]:
+                            add(raw)
+                            line_no += 1
+                        consumed = end
+                    elif consumed == 0 and len(chunk) == SERIAL_READ_CHUNK:
+                        # no newline in a whole chunk: index the head so the file keeps moving
+                        add(chunk[:SERIAL_MAX_LINE])
+                        consumed, partial = len(chunk), 1
+                if consumed == 0:
+                    break
+                offset += consumed
+                with self._lock:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        current = self._conn.execute(
+                            "SELECT inode, offset FROM serial_files WHERE test_id = ? AND host = ? AND port = ?",
+                            key).fetchone()
+                        if current is None or (current["inode"], current["offset"]) != claimed:
+                            # another worker (or a re-registration) got there first; it owns these lines
+                            self._conn.execute("ROLLBACK")
+                            return
+                        if reset:
+                            self._clear_serial_rows(key)
+                            reset = False
+                        self._conn.executemany(
+                            "INSERT INTO log_lines (test_id, source, host, port, line_no, ts, message) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                        self._conn.execute(
+                            "UPDATE serial_files SET inode = ?, offset = ?, line_no = ?, last_ts = ?, partial = ? "
+                            "WHERE test_id = ? AND host = ? AND port = ?",
+                            (st.st_ino, offset, line_no, last_ts, partial, *key))
+                        self._conn.execute("COMMIT")
+                    except Exception:
+                        self._conn.execute("ROLLBACK")
+                        raise
+                claimed = (st.st_ino, offset)
+                if len(chunk) < SERIAL_READ_CHUNK:
+                    break
+
+    def _run(self):
+        next_scan = 0.0
+        while not self._stop.is_set():
+            try:
+                # block briefly for the first line, then take whatever else is queued
+                try:
+                    first = self._queue.get(timeout=INGEST_FLUSH_S)
+                except queue.Empty:
+                    first = None
+                if first is not None and self._drain(first) == INGEST_BATCH_MAX:
+                    while self._drain() == INGEST_BATCH_MAX:
+                        pass
+                now = time.monotonic()
+                if self.scan_serial and now >= next_scan:
+                    self.sync_serial_files()
+                    next_scan = now + SERIAL_SCAN_INTERVAL_S
+            except Exception:
+                log.exception("Log search indexer error")
+
+    # --- queries ---
+    def search(self, q: str, test_id: Optional[int] = None, host: Optional[str] = None,
+               port: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+               limit: int = 50, context: int = 0, raw_query: bool = False) -> List[Dict[str, Any]]:
+        """
+        Ranked (BM25) hits for ``q``.
+
+        Args:
+            q: Free text (all terms must match) or, with raw_query, FTS5 syntax
+            test_id, host, port: Narrow to one test / device host / serial port
+            since, until: ISO-8601 bounds on the line timestamp
+            limit: Max hits
+            context: Lines of surrounding context to attach to each hit
+
+        Raises:
+            ValueError: malformed raw FTS5 query
+        """
+        match = q if raw_query else to_match_query(q)
+        if not match:
+            return []
+        sql = ("SELECT l.*, bm25(log_fts) AS score FROM log_fts "
+               "JOIN log_lines l ON l.id = log_fts.rowid WHERE log_fts MATCH ?")
+        params: List[Any] = [match]
+        for column, value in (("test_id", test_id), ("host", host), ("port", port)):
+            if value is not None:
+                sql += f" AND l.{column} = ?"
+                params.append(value)
+        if since:
+            sql += " AND l.ts >= ?"
+            params.append(since)
+        if until:
+            sql += " AND l.ts <= ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            try:
+                rows = [dict(r) for r in self._conn.execute(sql, params)]
+            except sqlite3.OperationalError as e:
+                raise ValueError(str(e))
+            hits = []
+            for r in rows:
+                hit = {
+                    "test_id": r["test_id"],
+                    "source": r["source"],
+                    "host": r["host"] or None,
+                    "port": r["port"] or None,
+                    "line_no": r["line_no"],
+                    "ts": r["ts"],
+                    "message": r["message"],
+                    "score": round(-r["score"], 3),
+                }
+                if context:
+                    # event logs are one sequence per test; serial logs one per file
+                    ctx_sql = ("SELECT line_no, message FROM log_lines WHERE test_id = ? AND source = ? "
+                               "AND line_no BETWEEN ? AND ?")
+                    ctx_params = [r["test_id"], r["source"], r["line_no"] - context, r["line_no"] + context]
+                    if r["source"] == "serial":
+                        ctx_sql += " AND host = ? AND port = ?"
+                        ctx_params += [r["host"], r["port"]]
+                    ctx = self._conn.execute(ctx_sql + " ORDER BY line_no", ctx_params).fetchall()
+                    hit["before"] = [c["message"] for c in ctx if c["line_no"] < r["line_no"]]
+                    hit["after"] = [c["message"] for c in ctx if c["line_no"] > r["line_no"]]
+                hits.append(hit)
+        return hits
@@ -0,0 +1,302 @@
+# in-process metrics with a Prometheus text exposition (see /metrics)
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# latency buckets in seconds: sub-ms cache hits up to multi-second agent timeouts
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# slow operations (playbook runs)
+DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Sharded:
+    """
+    Per-thread shards for one label set. Each thread only ever writes its own
+    shard (a plain list), so the hot path takes no lock; a scrape sums over
+    all shards. A shard is registered once per thread under a lock, and the
+    shards of threads that have exited (timers, finished pools) are folded
+    into one total now and then so they don't pile up.
+    """
+
+    __slots__ = ("_local", "_shards", "_retired", "_compact_at", "_lock", "_width")
+
+    def __init__(self, width: int):
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0.0] * width
+        self._compact_at = 16
+        self._lock = threading.Lock()
+        self._width = width
+
+    def shard(self) -> List[float]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0.0] * self._width
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) > self._compact_at:
+                    self._compact()
+            return shard
+
+    def _compact(self):
+        # caller holds the lock; a dead thread's shard has no writer left
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for i, v in enumerate(shard):
+                    self._retired[i] += v
+        self._shards = live
+        self._compact_at = 2 * len(live) + 16
+
+    def total(self) -> List[float]:
+        with self._lock:
+            out = list(self._retired)
+            shards = [s for _, s in self._shards]
+        for s in shards:
+            for i, v in enumerate(s):
+                out[i] += v
+        return out
+
+
+class _CounterChild:
+    __slots__ = ("_s",)
+
+    def __init__(self):
+        self._s = _Sharded(1)
+
+    def inc(self, n: float = 1):
+        self._s.shard()[0] += n
+
+    def value(self) -> float:
+        return self._s.total()[0]
+
+
+class _HistogramChild:
+    __slots__ = ("_s", "_bounds")
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        # one slot per bucket, +Inf, then sum and count
+        self._s = _Sharded(len(bounds) + 3)
+
+    def observe(self, value: float):
+        shard = self._s.shard()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts incl. +Inf, sum, count)."""
+        t = self._s.total()
+        cumulative, running = [], 0.0
+        for n in t[:-2]:
+            running += n
+            cumulative.append(running)
+        return cumulative, t[-2], t[-1]
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self._default = self._child(())
+
+    @abstractmethod
+    def _new_child(self):
+        """State for one label set (None if the metric keeps its values itself)."""
+
+    @abstractmethod
+    def collect(self) -> Iterable[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        """(sample name, label values, extra label, value) for every sample to expose."""
+
+    def _child(self, values: LabelValues):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def labels(self, *values: str, **kv: str):
+        """The child for one label set, e.g. ``m.labels(route="/device/list", status="200")``."""
+        if kv:
+            values = tuple(str(kv[n]) for n in self.label_names)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}")
+        return self._child(values)
+
+    def remove(self, **match: str):
+        """Drop every label set matching ``match``, e.g. remove(host=h) once a host leaves the inventory."""
+        idx = [(self.label_names.index(k), str(v)) for k, v in match.items()]
+        with self._lock:
+            for values in [v for v in self._children if all(v[i] == want for i, want in idx)]:
+                del self._children[values]
+
+    def children(self) -> List[Tuple[LabelValues, object]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, n: float = 1):
+        self._default.inc(n)
+
+    def collect(self) -> Iterable[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        for values, child in self.children():
+            yield self.name + "_total", values, (), child.value()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def collect(self):
+        for values, child in self.children():
+            cumulative, total, count = child.snapshot()
+            for bound, n in zip(self.buckets + (math.inf,), cumulative):
+                yield self.name + "_bucket", values, ("le", _fmt(bound)), n
+            yield self.name + "_sum", values, (), total
+            yield self.name + "_count", values, (), count
+
+
+class Gauge(_Metric):
+    """
+    Either set directly (``g.set(3)``) or computed at scrape time from
+    ``fn``, which returns a number, or {label values tuple: number} for a
+    labelled gauge. Scrape-time gauges cost nothing on the hot path.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 fn: Optional[Callable[[], Union[float, Dict[LabelValues, float]]]] = None):
+        self.fn = fn
+        self._values: Dict[LabelValues, float] = {}
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return None
+
+    def set(self, value: float, *labels: str):
+        self._values[tuple(str(v) for v in labels)] = value
+
+    def collect(self):
+        if self.fn is not None:
+            try:
+                v = self.fn()
+            except Exception:
+                return   # a broken gauge shouldn't take the whole scrape down
+            items = v.items() if isinstance(v, dict) else [((), v)]
+        else:
+            items = list(self._values.items())
+        for values, value in items:
+            yield self.name, tuple(str(x) for x in values), (), value
+
+
+class Registry:
+    def __init__(self, prefix: str = "lnt_"):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # re-registering (module reloads, several managers) returns the first instance,
+                # except scrape-time gauges, where the newest callback wins
+                if isinstance(metric, Gauge) and metric.fn is not None:
+                    existing.fn = metric.fn
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), fn=None) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help, labels, fn))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        out: List[str] = []
+        for m in metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            for sample, values, extra, value in m.collect():
+                pairs = list(zip(m.label_names, values))
+                if extra:
+                    pairs.append(extra)
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+                out.append(f"{sample}{{{labels}}} {_fmt(value)}" if labels else f"{sample} {_fmt(value)}")
+        out.append("")
+        return "\n".join(out)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# process-wide registry; modules declare their metrics against it at import time
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
+gauge = registry.gauge
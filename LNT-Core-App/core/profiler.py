@@ -0,0 +1,178 @@
+# on-demand sampling profiler (all threads of this process) for /admin/profile
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+PROFILE_INTERVAL_MS = 10     # default sampling period
+PROFILE_MAX_SECONDS = 300
+PROFILES_KEPT = 4            # finished profiles kept for download
+MAX_STACK_DEPTH = 128
+# leaf frames of threads parked waiting for work (pool workers, the event loop's select);
+# left out unless a profile asks for idle stacks
+IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"),
+    ("selectors.py", "select"), ("socket.py", "accept"), ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]   # (function, file, first line)
+
+
+class Profile:
+    def __init__(self, seconds: float, interval_s: float, include_idle: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.seconds = seconds
+        self.interval_s = interval_s
+        self.include_idle = include_idle
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.samples = 0
+        self.overhead_s = 0.0   # time spent taking samples
+        self.stacks: Counter = Counter()   # (thread name, frames root->leaf) -> samples
+        self.done = threading.Event()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "seconds": self.seconds,
+            "interval_ms": self.interval_s * 1000,
+            "include_idle": self.include_idle,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "running": not self.done.is_set(),
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "overhead_pct": round(self.overhead_s / max(1e-9, (self.finished_at or time.time()) - self.started_at)
+                                  * 100, 2),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: ``thread;frame;frame count`` per line (flamegraph.pl, speedscope)."""
+        lines = []
+        for (thread, frames), n in self.stacks.most_common():
+            names = [thread] + [f"{fn} ({os.path.basename(file)}:{line})" for fn, file, line in frames]
+            lines.append(";".join(n_.replace(";", ":") for n_ in names) + f" {n}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """speedscope.app file format: one sampled profile per thread, frames shared."""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        per_thread: Dict[str, Tuple[list, list]] = {}
+        weight = self.interval_s * 1000
+        for (thread, stack), n in self.stacks.items():
+            idx = []
+            for fr in stack:
+                i = frame_index.get(fr)
+                if i is None:
+                    i = frame_index[fr] = len(frames)
+                    frames.append({"name": fr[0], "file": fr[1], "line": fr[2]})
+                idx.append(i)
+            samples, weights = per_thread.setdefault(thread, ([], []))
+            samples.append(idx)
+            weights.append(n * weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"lnt-core {self.id}",
+            "exporter": "lnt-core",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": thread,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            } for thread, (samples, weights) in sorted(per_thread.items())],
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread with sys._current_frames() from
+    a background thread. Nothing is hooked into the profiled code, so the cost
+    is one stack walk per thread per interval and only while a profile runs
+    (``overhead_pct`` in the summary). One profile at a time per process.
+    """
+
+    def __init__(self, keep: int = PROFILES_KEPT):
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._active: Optional[Profile] = None
+        self._keep = keep
+
+    def start(self, seconds: float, interval_ms: float = PROFILE_INTERVAL_MS,
+              include_idle: bool = False) -> Profile:
+        """
+        Raises:
+            ValueError: bad duration/interval
+            RuntimeError: a profile is already running
+        """
+        if not 0 < seconds <= PROFILE_MAX_SECONDS:
+            raise ValueError(f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+        if not 1 <= interval_ms <= 1000:
+            raise ValueError("interval_ms must be in [1, 1000]")
+        with self._lock:
+            if self._active is not None:
+                raise RuntimeError(f"profile {self._active.id} is still running")
+            prof = self._active = Profile(seconds, interval_ms / 1000, include_idle)
+            self._profiles[prof.id] = prof
+            while len(self._profiles) > self._keep:
+                self._profiles.popitem(last=False)
+        threading.Thread(target=self._run, args=(prof,), name="lnt-profiler", daemon=True).start()
+        return prof
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [p.summary() for p in reversed(profiles)]
+
+    def _run(self, prof: Profile):
+        me = threading.get_ident()
+        names: Dict[int, str] = {}
+        names_at = 0.0
+        deadline = time.monotonic() + prof.seconds
+        next_at = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                t0 = time.perf_counter()
+                if now - names_at > 1.0:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                    names_at = now
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if not prof.include_idle and \
+                            (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        code = frame.f_code
+                        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                        frame = frame.f_back
+                    stack.reverse()
+                    prof.stacks[(names.get(ident, f"thread-{ident}"), tuple(stack))] += 1
+                prof.samples += 1
+                prof.overhead_s += time.perf_counter() - t0
+                next_at += prof.interval_s
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        finally:
+            prof.finished_at = time.time()
+            with self._lock:
+                self._active = None
+            prof.done.set()
+
+
+profiler = SamplingProfiler()
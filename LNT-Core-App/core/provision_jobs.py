@@ -0,0 +1,205 @@
+# background Ansible provisioning jobs
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+PROVISION_CONCURRENCY = int(os.environ.get("LNT_PROVISION_CONCURRENCY", "4"))
+JOB_OUTPUT_MAX_LINES = 10000   # older output lines are dropped past this
+JOB_RETENTION = 500            # finished jobs kept for status queries
+
+JOB_STATES = ("queued", "running", "succeeded", "failed")
+
+
+@dataclass
+class ProvisionJob:
+    job_id: str
+    hostnames: List[str]
+    state: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    returncode: Optional[int] = None
+    output: List[str] = field(default_factory=list)
+    output_dropped: int = 0    # lines trimmed from the front of `output`
+    results: Dict[str, dict] = field(default_factory=dict)   # per-host outcome, filled in when the run ends
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "hostnames": self.hostnames,
+            "state": self.state,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "returncode": self.returncode,
+            "output_lines": self.output_dropped + len(self.output),
+            "results": self.results,
+        }
+
+
+class ProvisionQueue:
+    """
+    Runs provisioning playbooks on a bounded worker pool so callers never wait
+    for Ansible. Output is captured line by line and can be read incrementally
+    while the job runs; async readers long-poll with wait(), parking on a
+    future that the job's thread resolves through call_soon_threadsafe, so a
+    waiting client costs no thread.
+
+    Jobs live in the memory of the worker process that submitted them: the
+    playbook runs there and only that worker can report its output. With
+    several uvicorn workers, follow a job through the same worker (sticky
+    sessions, or a single worker for provisioning); the hosts' own status
+    (pending -> provisioning -> idle/error) is shared through the state
+    backend and visible from every worker.
+    """
+
+    def __init__(self, runner: Callable, on_start: Optional[Callable] = None,
+                 on_finish: Optional[Callable] = None, parse_results: Optional[Callable] = None,
+                 max_workers: int = PROVISION_CONCURRENCY):
+        """
+        Args:
+            runner: runner(hostnames, on_output) -> exit code; see utils.ansible_runner.run_playbook
+            on_start: Called with the job right before the runner starts
+            on_finish: Called with the job once it has succeeded or failed
+            parse_results: parse_results(job, returncode) -> {hostname: result}, run before the job is marked done
+            max_workers: Playbooks allowed to run at the same time
+        """
+        self.runner = runner
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.parse_results = parse_results
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lnt-provision")
+        self._jobs: Dict[str, ProvisionJob] = {}
+        self._lock = threading.Lock()   # guards _jobs, job fields and _waiters
+        self._waiters: Dict[str, set] = {}   # job_id -> {(loop, future)}
+
+    def submit(self, hostnames: List[str]) -> ProvisionJob:
+        job = ProvisionJob(job_id=uuid.uuid4().hex[:12], hostnames=list(hostnames))
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._pool.submit(self._run, job)
+        return job
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.done]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - JOB_RETENTION)]:
+            del self._jobs[job.job_id]
+
+    def _notify(self, job: ProvisionJob):
+        # caller holds _lock
+        for loop, fut in self._waiters.pop(job.job_id, ()):
+            try:
+                loop.call_soon_threadsafe(_wake, fut)
+            except RuntimeError:
+                pass   # loop already closed
+
+    def _append_output(self, job: ProvisionJob, line: str):
+        with self._lock:
+            job.output.append(line)
+            overflow = len(job.output) - JOB_OUTPUT_MAX_LINES
+            if overflow > 0:
+                del job.output[:overflow]
+                job.output_dropped += overflow
+            self._notify(job)
+
+    def _set_state(self, job: ProvisionJob, state: str, returncode: Optional[int] = None):
+        with self._lock:
+            job.state = state
+            if state == "running":
+                job.started_at = time.time()
+            else:
+                job.finished_at = time.time()
+                job.returncode = returncode
+            self._notify(job)
+
+    def _run(self, job: ProvisionJob):
+        try:
+            if self.on_start:
+                self.on_start(job)
+            self._set_state(job, "running")
+            rc = self.runner(job.hostnames, lambda line: self._append_output(job, line))
+        except Exception as e:
+            self._append_output(job, f"Provisioning error: {e}")
+            rc = -1
+        if self.parse_results:
+            try:
+                results = self.parse_results(job, rc)
+                with self._lock:
+                    job.results = results
+            except Exception as e:
+                self._append_output(job, f"Could not parse per-host results: {e}")
+        self._set_state(job, "succeeded" if rc == 0 else "failed", rc)
+        if self.on_finish:
+            try:
+                self.on_finish(job)
+            except Exception:
+                log.exception("Provisioning finish hook failed for job %s", job.job_id)
+
+    def get(self, job_id: str) -> Optional[ProvisionJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [j.summary() for j in sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)]
+
+    def read(self, job_id: str, after: int = 0) -> Optional[dict]:
+        """Job status plus output lines numbered > ``after``; None for an unknown job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            start = max(after, job.output_dropped) - job.output_dropped
+            out = job.summary()
+            out["output"] = job.output[start:]
+            out["next"] = job.output_dropped + len(job.output)
+            return out
+
+    async def wait(self, job_id: str, after: int, timeout: float) -> bool:
+        """
+        Wait on the running loop until the job has output past ``after``, changes
+        state or is done; False on timeout (or for an unknown job).
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            if job.done or job.output_dropped + len(job.output) > after:
+                return True
+            entry = (loop, fut)
+            self._waiters.setdefault(job_id, set()).add(entry)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(entry)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
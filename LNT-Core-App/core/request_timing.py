@@ -0,0 +1,129 @@
+# per-request phase timing and the slow-request ring buffer behind /admin/slow-requests
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+SLOW_REQUEST_MS = float(os.environ.get("LNT_SLOW_REQUEST_MS", "500"))      # record requests slower than this
+SLOW_REQUEST_BUFFER = int(os.environ.get("LNT_SLOW_REQUEST_BUFFER", "200"))  # slow requests kept
+
+# phase names used across modules
+AUTH = "auth"
+YAML_LOAD = "yaml_load"
+AGENT_HTTP = "agent_http"
+INVENTORY_SAVE = "inventory_save"
+SERIALIZATION = "serialization"
+
+
+class RequestTiming:
+    """Phase totals for one request. Phases can be recorded from worker threads too."""
+
+    __slots__ = ("start", "phases", "_lock")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}   # name -> [seconds, count]
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            p = self.phases.get(name)
+            if p is None:
+                self.phases[name] = [seconds, 1]
+            else:
+                p[0] += seconds
+                p[1] += 1
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("lnt_request_timing",
+                                                                                 default=None)
+
+
+def begin() -> contextvars.Token:
+    """Start timing the current request (middleware)."""
+    return _current.set(RequestTiming())
+
+def current() -> Optional[RequestTiming]:
+    return _current.get()
+
+def end(token: contextvars.Token):
+    _current.reset(token)
+
+@contextmanager
+def phase(name: str):
+    """Attribute the enclosed time to ``name`` on the current request; a no-op outside requests."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+def bind(fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """
+    ``fn(*args, **kwargs)`` bound to a copy of the caller's context, for work
+    handed to a thread pool, so its phases still count towards the request.
+    """
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(fn, *args, **kwargs)
+
+
+class SlowRequestLog:
+    """
+    The last ``size`` requests that took at least ``threshold_ms``, each with
+    its phase breakdown. Phases recorded on several threads at once (agent
+    calls during a refresh sweep) are summed, so they can add up to more than
+    the wall time; ``other_ms`` is what the named phases don't account for.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_MS, size: int = SLOW_REQUEST_BUFFER):
+        self.threshold_ms = threshold_ms
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def observe(self, timing: RequestTiming, method: str, path: str, route: str, status: int):
+        total_ms = (time.perf_counter() - timing.start) * 1000
+        if total_ms < self.threshold_ms:
+            return
+        with timing._lock:
+            phases = {name: {"ms": round(s * 1000, 2), "count": int(n)} for name, (s, n) in timing.phases.items()}
+        named_ms = sum(p["ms"] for p in phases.values())
+        entry = {
+            "ts": time.time(),
+            "method": method,
+            "path": path,
+            "route": route,
+            "status": status,
+            "total_ms": round(total_ms, 2),
+            "phases": phases,
+            "other_ms": round(max(0.0, total_ms - named_ms), 2),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+
+    def entries(self, limit: Optional[int] = None, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest first."""
+        with self._lock:
+            out = [e for e in reversed(self._entries) if route is None or e["route"] == route]
+        return out[:limit] if limit else out
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"threshold_ms": self.threshold_ms, "held": len(self._entries),
+                    "capacity": self._entries.maxlen, "recorded": self.recorded}
+
+
+slow_requests = SlowRequestLog()
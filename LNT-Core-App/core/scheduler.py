@@ -0,0 +1,138 @@
+# one-thread deadline scheduler (test expiry and similar timers)
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class _Timer:
+    __slots__ = ("when", "seq", "key", "callback", "cancelled")
+
+    def __init__(self, when: float, seq: int, key: Hashable, callback: Callable[[], Any]):
+        self.when = when
+        self.seq = seq
+        self.key = key
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other: "_Timer") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class TimerScheduler:
+    """
+    Min-heap of deadlines served by a single background thread.
+
+    Timers are keyed (e.g. by test_id); scheduling a key again replaces its
+    timer. Scheduling is O(log n) and cancelling is O(1): a cancelled timer is
+    only marked and skipped when it reaches the top of the heap, and the heap
+    is rebuilt once cancelled entries outnumber live ones. The thread sleeps
+    until the earliest deadline (or until an earlier one is added), so idle
+    timers cost nothing no matter how many there are.
+    """
+
+    def __init__(self, name: str = "lnt-scheduler"):
+        self.name = name
+        self._heap: List[_Timer] = []
+        self._timers: Dict[Hashable, _Timer] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.fired = 0
+
+    # --- lifecycle ---
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- timers ---
+    def schedule(self, key: Hashable, when: float, callback: Callable[[], Any]):
+        """Run ``callback`` on the scheduler thread at epoch time ``when`` (replaces any timer for ``key``)."""
+        timer = _Timer(when, next(self._seq), key, callback)
+        with self._cond:
+            old = self._timers.get(key)
+            if old is not None:
+                old.cancelled = True
+            self._timers[key] = timer
+            heapq.heappush(self._heap, timer)
+            self._maybe_compact()
+            if self._heap[0] is timer:
+                # new earliest deadline: wake the thread so it re-arms
+                self._cond.notify_all()
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._cond:
+            timer = self._timers.pop(key, None)
+            if timer is None:
+                return False
+            timer.cancelled = True
+            self._maybe_compact()
+            return True
+
+    def deadline(self, key: Hashable) -> Optional[float]:
+        with self._cond:
+            timer = self._timers.get(key)
+            return timer.when if timer else None
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def _maybe_compact(self):
+        # caller holds the lock
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._heap = [t for t in self._heap if not t.cancelled]
+            heapq.heapify(self._heap)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+            return {
+                "timers": len(self._timers),
+                "heap_size": len(self._heap),
+                "next_deadline": self._heap[0].when if self._heap else None,
+                "fired": self.fired,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stop:
+                        return
+                    while self._heap and self._heap[0].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0].when - time.time()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                timer = heapq.heappop(self._heap)
+                if self._timers.get(timer.key) is timer:
+                    del self._timers[timer.key]
+                self.fired += 1
+            # run outside the lock so callbacks may schedule/cancel timers
+            try:
+                timer.callback()
+            except Exception:
+                log.exception("Scheduled callback for %r failed", timer.key)
@@ -0,0 +1,253 @@
+# random access into (possibly huge, still growing) serial log files
+
+import mmap
+import os
+import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+SERIAL_LOG_ROOT = os.environ.get("LNT_SERIAL_LOG_ROOT", "data/serial_logs")
+INDEX_BLOCK_BYTES = 64 * 1024      # one line-offset checkpoint per block of file
+MAX_READ_BYTES = 4 * 1024 * 1024   # cap for a single byte-range read
+MAX_OPEN_READERS = 64
+
+# serial lines are expected to start with a timestamp, optionally bracketed:
+#   [2025-01-31T10:00:00.123] ...   or   2025-01-31 10:00:00 ...
+_TS_RE = re.compile(rb"^\[?(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?)")
+
+
+def parse_line_ts(line: bytes) -> Optional[datetime]:
+    m = _TS_RE.match(line)
+    if not m:
+        return None
+    try:
+        return datetime.fromisoformat(m.group(1).decode())
+    except ValueError:
+        return None
+
+
+class SerialLogReader:
+    """
+    Reads a serial log through mmap without loading it into memory.
+
+    A sparse index keeps one (line_no, offset) checkpoint per INDEX_BLOCK_BYTES
+    of file. It is built lazily and extended as the file grows, so after the
+    first touch every query only scans at most one block from the nearest
+    checkpoint: paging through a multi-GB log costs the same per page at the
+    end as at the start. Only complete (newline-terminated) lines are served.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inode = None
+        self._reset()
+
+    def _reset(self):
+        self._checkpoints: List[Tuple[int, int]] = [(0, 0)]   # (line_no, byte offset of that line)
+        self._cp_lines: List[int] = [0]                       # line_no column, for bisect
+        self._indexed_to = 0      # offset just past the last indexed newline
+        self._line_count = 0      # complete lines up to _indexed_to
+
+    def _open(self) -> Optional[mmap.mmap]:
+        """Map the current file and bring the index up to date. Caller holds the lock."""
+        st = os.stat(self.path)
+        if st.st_ino != self._inode or st.st_size < self._indexed_to:
+            # rotated or truncated: start over
+            self._inode = st.st_ino
+            self._reset()
+        if st.st_size == 0:
+            return None
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), st.st_size, access=mmap.ACCESS_READ)
+        self._extend_index(mm)
+        return mm
+
+    def _extend_index(self, mm: mmap.mmap):
+        end = mm.rfind(b"\n") + 1      # ignore a partially written last line
+        pos = self._indexed_to          # always the start of a line
+        while pos < end:
+            next_cp = self._checkpoints[-1][1] + INDEX_BLOCK_BYTES
+            if next_cp >= end:
+                self._line_count += mm[pos:end].count(b"\n")
+                break
+            if pos < next_cp:
+                self._line_count += mm[pos:next_cp].count(b"\n")
+                pos = next_cp
+            # checkpoint at the first line starting at or after the block boundary
+            if mm[pos - 1:pos] != b"\n":
+                pos = mm.find(b"\n", pos, end) + 1
+                self._line_count += 1
+            if pos < end:
+                self._checkpoints.append((self._line_count, pos))
+                self._cp_lines.append(self._line_count)
+        self._indexed_to = end
+
+    def _offset_of_line(self, mm: mmap.mmap, line_no: int) -> int:
+        """Byte offset where ``line_no`` (0-based) starts; scans at most one block."""
+        i = bisect_right(self._cp_lines, line_no) - 1
+        cp_line, offset = self._checkpoints[i]
+        for _ in range(line_no - cp_line):
+            offset = mm.find(b"\n", offset, self._indexed_to) + 1
+        return offset
+
+    def _read_lines_from(self, mm: mmap.mmap, offset: int, count: int) -> List[str]:
+        lines = []
+        while len(lines) < count and offset < self._indexed_to:
+            nl = mm.find(b"\n", offset, self._indexed_to)
+            lines.append(mm[offset:nl].decode("utf-8", errors="replace").rstrip("\r"))
+            offset = nl + 1
+        return lines
+
+    def stats(self) -> dict:
+        with self._lock:
+            mm = self._open()
+            if mm:
+                mm.close()
+            return {
+                "path": self.path,
+                "size_bytes": self._indexed_to,
+                "line_count": self._line_count,
+                "checkpoints": len(self._checkpoints),
+            }
+
+    def lines(self, start: int, count: int) -> Tuple[List[str], int]:
+        """
+        Lines [start, start+count) (0-based).
+
+        Returns:
+            (lines, total_lines)
+        """
+        with self._lock:
+            mm = self._open()
+            if mm is None or start >= self._line_count:
+                if mm:
+                    mm.close()
+                return [], self._line_count
+            try:
+                offset = self._offset_of_line(mm, start)
+                return self._read_lines_from(mm, offset, count), self._line_count
+            finally:
+                mm.close()
+
+    def byte_range(self, offset: int, length: int) -> bytes:
+        length = min(length, MAX_READ_BYTES)
+        with self._lock:
+            mm = self._open()
+            if mm is None:
+                return b""
+            try:
+                return mm[offset:min(offset + length, len(mm))]
+            finally:
+                mm.close()
+
+    def tail(self, n: int) -> List[str]:
+        """The last ``n`` complete lines."""
+        with self._lock:
+            mm = self._open()
+            if mm is None:
+                return []
+            try:
+                end = self._indexed_to
+                pos = end - 1      # the final newline
+                for _ in range(n):
+                    prev = mm.rfind(b"\n", 0, pos)
+                    if prev == -1:
+                        pos = -1
+                        break
+                    pos = prev
+                return self._read_lines_from(mm, pos + 1, n)
+            finally:
+                mm.close()
+
+    def time_window(self, since: Optional[datetime], until: Optional[datetime],
+                    limit: int) -> List[str]:
+        """
+        Lines whose leading timestamp falls in [since, until]. Lines without a
+        timestamp belong to the nearest timestamped line above them.
+        Assumes timestamps are non-decreasing through the file.
+        """
+        with self._lock:
+            mm = self._open()
+            if mm is None:
+                return []
+            try:
+                offset = 0
+                if since is not None:
+                    # last checkpoint whose line is before `since`
+                    lo, hi = 0, len(self._checkpoints) - 1
+                    while lo < hi:
+                        mid = (lo + hi + 1) // 2
+                        ts = self._ts_near(mm, self._checkpoints[mid][1])
+                        if ts is not None and ts < since:
+                            lo = mid
+                        else:
+                            hi = mid - 1
+                    offset = self._checkpoints[lo][1]
+
+                out = []
+                current_ts = None
+                while offset < self._indexed_to and len(out) < limit:
+                    nl = mm.find(b"\n", offset, self._indexed_to)
+                    raw = mm[offset:nl]
+                    offset = nl + 1
+                    current_ts = parse_line_ts(raw) or current_ts
+                    if current_ts is None or (since is not None and current_ts < since):
+                        continue
+                    if until is not None and current_ts > until:
+                        break
+                    out.append(raw.decode("utf-8", errors="replace").rstrip("\r"))
+                return out
+            finally:
+                mm.close()
+
+    def _ts_near(self, mm: mmap.mmap, offset: int, max_lines: int = 16) -> Optional[datetime]:
+        """Timestamp of the first timestamped line at or shortly after ``offset``."""
+        for _ in range(max_lines):
+            if offset >= self._indexed_to:
+                return None
+            nl = mm.find(b"\n", offset, self._indexed_to)
+            ts = parse_line_ts(mm[offset:nl])
+            if ts is not None:
+                return ts
+            offset = nl + 1
+        return None
+
+
+class SerialLogReaders:
+    """Caches one SerialLogReader (and its index) per file, up to MAX_OPEN_READERS."""
+
+    def __init__(self, root: str = SERIAL_LOG_ROOT, max_open: int = MAX_OPEN_READERS):
+        self.root = root
+        self.max_open = max_open
+        self._readers: "OrderedDict[str, SerialLogReader]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, log_path: str) -> Optional[str]:
+        """
+        Map a serial_logs entry to a file under the log root. Relative paths are
+        taken relative to <root>/<host>/. Returns None if it escapes the root.
+        """
+        root = os.path.realpath(self.root)
+        if os.path.isabs(log_path):
+            full = os.path.realpath(log_path)
+        else:
+            full = os.path.realpath(os.path.join(root, host, log_path))
+        if os.path.commonpath([root, full]) != root:
+            return None
+        return full
+
+    def get(self, path: str) -> SerialLogReader:
+        with self._lock:
+            reader = self._readers.get(path)
+            if reader is None:
+                reader = SerialLogReader(path)
+                self._readers[path] = reader
+                while len(self._readers) > self.max_open:
+                    self._readers.popitem(last=False)
+            else:
+                self._readers.move_to_end(path)
+            return reader
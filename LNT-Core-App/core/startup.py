@@ -0,0 +1,77 @@
+# where a worker's startup time goes, from importing main to serving the first request
+
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Wall-clock time per named startup step (imports, inventory load, each
+    manager), plus the total until ready() is called.
+
+    Steps can carry details (e.g. whether the inventory came from the cache);
+    the whole breakdown is logged once at startup and served by /admin/startup.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.steps: Dict[str, float] = {}      # step -> seconds
+        self.details: Dict[str, dict] = {}
+        self.ready_s: Optional[float] = None
+        self.deferred: Dict[str, float] = {}   # module -> seconds, imported after ready
+
+    def record(self, name: str, seconds: float, **details):
+        self.steps[name] = self.steps.get(name, 0.0) + seconds
+        if details:
+            self.details.setdefault(name, {}).update(details)
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def ready(self):
+        self.ready_s = time.perf_counter() - self.started
+
+    def import_deferred(self, modules: Iterable[str]) -> threading.Thread:
+        """
+        Import modules that were kept off the startup path (see auth.jwt) on a
+        background thread once the worker is serving, so the first request
+        that needs them doesn't pay for the import either.
+        """
+        def run():
+            for name in modules:
+                start = time.perf_counter()
+                try:
+                    importlib.import_module(name)
+                except Exception as e:
+                    log.warning("Deferred import of %s failed: %s", name, e)
+                    continue
+                self.deferred[name] = time.perf_counter() - start
+
+        thread = threading.Thread(target=run, name="lnt-deferred-imports", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        ms = lambda s: round(s * 1000, 1)
+        return {
+            "ready_ms": ms(self.ready_s) if self.ready_s is not None else None,
+            "steps_ms": {name: ms(s) for name, s in self.steps.items()},
+            "details": self.details,
+            "deferred_imports_ms": {name: ms(s) for name, s in self.deferred.items()},
+        }
+
+    def summary(self) -> str:
+        steps = ", ".join(f"{name} {s * 1000:.0f}ms" for name, s in self.steps.items())
+        total = f"{self.ready_s * 1000:.0f}ms" if self.ready_s is not None else "?"
+        return f"Startup: ready in {total} ({steps})"
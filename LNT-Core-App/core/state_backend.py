@@ -0,0 +1,470 @@
+# state shared by every worker process: host records, the change log, DUT claims and leases
+
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# "sqlite:<path>" (one node, any number of workers), "memory" (this process only)
+# or "package.module:factory" for an external store implementing StateBackend
+STATE_BACKEND = os.environ.get("LNT_STATE_BACKEND", "sqlite:data/state.db")
+STATE_POLL_S = 0.05   # how often a sqlite reader checks for commits by other processes
+
+Write = Tuple[str, Any, Any]          # (namespace, key, value); value None deletes the key
+ChangeIn = Tuple[str, Any, str, Any]  # (kind, key, op, data)
+
+
+class StateBackend(ABC):
+    """
+    What DeviceManager, TestManager and the change feed keep outside the
+    process, so several uvicorn workers (or nodes, with an external store)
+    see the same fleet.
+
+    - documents: JSON values by (namespace, key), e.g. ("hosts", hostname)
+    - change log: every commit appends changes with consecutive seqs, visible
+      to readers strictly in seq order (no gaps, no late lower seqs)
+    - claims: all-or-nothing ownership of keys (DUTs held by a test)
+    - leases: named, expiring locks for leader election
+
+    Keys and values must be JSON-serializable. All methods are thread-safe.
+    """
+
+    # True when other processes may write too (readers then have to poll)
+    shared = False
+    # True when items() decodes fresh values on every call, so callers may keep and
+    # mutate them; otherwise they may be the backend's own objects and need copying
+    owned_values = False
+
+    # --- documents + change log ---
+    @abstractmethod
+    def commit(self, writes: Iterable[Write] = (), changes: Iterable[ChangeIn] = (),
+               origin: str = "") -> List[int]:
+        """Apply ``writes`` and append ``changes`` atomically; returns the new changes' seqs."""
+
+    @abstractmethod
+    def items(self, ns: str) -> Tuple[Dict[Any, Any], int]:
+        """(every key -> value in ``ns``, change head) read consistently."""
+
+    @abstractmethod
+    def changes_after(self, seq: int, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Changes with seq > ``seq``, oldest first: {seq, ts, kind, key, op, data, origin}."""
+
+    @abstractmethod
+    def head(self) -> int:
+        ...
+
+    @abstractmethod
+    def wait(self, seq: int, timeout: float) -> bool:
+        """Block until the head moves past ``seq``; False on timeout."""
+
+    @abstractmethod
+    def trim(self, keep: int):
+        """Forget all but the newest ``keep`` changes."""
+
+    # --- small values (settings shared by workers) ---
+    @abstractmethod
+    def get_meta(self, name: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set_meta(self, name: str, value: str, only_if_missing: bool = False) -> str:
+        """Returns the stored value (the existing one if ``only_if_missing`` and set)."""
+
+    # --- claims ---
+    @abstractmethod
+    def claim(self, ns: str, keys: Iterable[str], owner: str) -> Dict[str, str]:
+        """
+        Take every key for ``owner``, or none of them.
+
+        Returns:
+            {key: current owner} for keys someone else holds; empty on success
+        """
+
+    @abstractmethod
+    def transfer_claims(self, ns: str, owner: str, new_owner: str):
+        ...
+
+    @abstractmethod
+    def release_claims(self, ns: str, owner: str) -> int:
+        ...
+
+    @abstractmethod
+    def claims(self, ns: str) -> Dict[str, Tuple[str, float]]:
+        """key -> (owner, claimed at)."""
+
+    # --- leases ---
+    @abstractmethod
+    def acquire_lease(self, name: str, holder: str, ttl_s: float) -> bool:
+        """Take or renew ``name`` for ``ttl_s`` seconds; False while someone else holds it."""
+
+    @abstractmethod
+    def release_lease(self, name: str, holder: str):
+        ...
+
+    @abstractmethod
+    def lease_holder(self, name: str) -> Optional[str]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateBackend(StateBackend):
+    """
+    Dict-backed backend; only shared by objects in this process. The default
+    for single-process tools and the stand-in for a real store in tests (two
+    ChangeFeeds on one instance behave like two workers).
+    """
+
+    def __init__(self):
+        self._docs: Dict[str, Dict[Any, Any]] = {}
+        self._log: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._meta: Dict[str, str] = {}
+        self._claims: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._cond = threading.Condition()
+
+    def commit(self, writes=(), changes=(), origin=""):
+        with self._cond:
+            for ns, key, value in writes:
+                docs = self._docs.setdefault(ns, {})
+                if value is None:
+                    docs.pop(key, None)
+                else:
+                    docs[key] = value
+            seqs = []
+            now = time.time()
+            for kind, key, op, data in changes:
+                self._seq += 1
+                self._log.append({"seq": self._seq, "ts": now, "kind": kind, "key": key, "op": op,
+                                  "data": data, "origin": origin})
+                seqs.append(self._seq)
+            if seqs:
+                self._cond.notify_all()
+            return seqs
+
+    def items(self, ns):
+        with self._cond:
+            return dict(self._docs.get(ns, {})), self._seq
+
+    def changes_after(self, seq, limit=1000):
+        with self._cond:
+            if not self._log or seq >= self._seq:
+                return []
+            start = max(0, seq - self._log[0]["seq"] + 1)
+            return self._log[start:start + limit]
+
+    def head(self):
+        return self._seq
+
+    def wait(self, seq, timeout):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > seq, timeout)
+
+    def trim(self, keep):
+        with self._cond:
+            if len(self._log) > keep:
+                del self._log[:len(self._log) - keep]
+
+    def get_meta(self, name):
+        return self._meta.get(name)
+
+    def set_meta(self, name, value, only_if_missing=False):
+        with self._cond:
+            if only_if_missing and name in self._meta:
+                return self._meta[name]
+            self._meta[name] = value
+            return value
+
+    def claim(self, ns, keys, owner):
+        with self._cond:
+            held = self._claims.setdefault(ns, {})
+            keys = list(keys)
+            conflicts = {k: held[k][0] for k in keys if k in held and held[k][0] != owner}
+            if not conflicts:
+                now = time.time()
+                for k in keys:
+                    held[k] = (owner, now)
+            return conflicts
+
+    def transfer_claims(self, ns, owner, new_owner):
+        with self._cond:
+            held = self._claims.get(ns, {})
+            for k, (o, at) in list(held.items()):
+                if o == owner:
+                    held[k] = (new_owner, at)
+
+    def release_claims(self, ns, owner):
+        with self._cond:
+            held = self._claims.get(ns, {})
+            keys = [k for k, (o, _) in held.items() if o == owner]
+            for k in keys:
+                del held[k]
+            return len(keys)
+
+    def claims(self, ns):
+        with self._cond:
+            return dict(self._claims.get(ns, {}))
+
+    def acquire_lease(self, name, holder, ttl_s):
+        with self._cond:
+            now = time.time()
+            current = self._leases.get(name)
+            if current and current[0] != holder and current[1] > now:
+                return False
+            self._leases[name] = (holder, now + ttl_s)
+            return True
+
+    def release_lease(self, name, holder):
+        with self._cond:
+            if self._leases.get(name, ("",))[0] == holder:
+                del self._leases[name]
+
+    def lease_holder(self, name):
+        with self._cond:
+            current = self._leases.get(name)
+            return current[0] if current and current[1] > time.time() else None
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+class SqliteStateBackend(StateBackend):
+    """
+    SQLite in WAL mode: every worker on the node opens the same file. Commits
+    are serialized by SQLite's write lock, so seqs (INTEGER PRIMARY KEY
+    AUTOINCREMENT, assigned inside the write transaction) become visible in
+    order. Other processes' commits are noticed through PRAGMA data_version,
+    which costs no I/O while nothing changed.
+    """
+
+    shared = True
+    owned_values = True
+
+    def __init__(self, path: str, poll_s: float = STATE_POLL_S):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.poll_s = poll_s
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # separate connection for wait(): data_version only moves for commits made elsewhere
+        self._watch = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._watch_lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    ns TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (ns, key)
+                );
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    key TEXT,
+                    op TEXT NOT NULL,
+                    data TEXT,
+                    origin TEXT
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS claims (
+                    ns TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    claimed_at REAL NOT NULL,
+                    PRIMARY KEY (ns, key)
+                );
+                CREATE INDEX IF NOT EXISTS idx_claims_owner ON claims(ns, owner);
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+
+    def _write(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-then-write can't race another worker
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return out
+
+    def commit(self, writes=(), changes=(), origin=""):
+        writes, changes = list(writes), list(changes)
+        if not writes and not changes:
+            return []
+
+        def run(conn):
+            for ns, key, value in writes:
+                if value is None:
+                    conn.execute("DELETE FROM docs WHERE ns = ? AND key = ?", (ns, _dumps(key)))
+                else:
+                    conn.execute("INSERT OR REPLACE INTO docs (ns, key, value) VALUES (?, ?, ?)",
+                                 (ns, _dumps(key), _dumps(value)))
+            now = time.time()
+            seqs = []
+            for kind, key, op, data in changes:
+                cur = conn.execute("INSERT INTO changes (ts, kind, key, op, data, origin) VALUES (?, ?, ?, ?, ?, ?)",
+                                   (now, kind, _dumps(key), op, _dumps(data), origin))
+                seqs.append(cur.lastrowid)
+            return seqs
+
+        return self._write(run)
+
+    def items(self, ns):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                rows = self._conn.execute("SELECT key, value FROM docs WHERE ns = ?", (ns,)).fetchall()
+                head = self._head()
+            finally:
+                self._conn.execute("COMMIT")
+        return {json.loads(r["key"]): json.loads(r["value"]) for r in rows}, head
+
+    def _head(self) -> int:
+        # caller holds the lock; sqlite_sequence survives trimming the log
+        row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_after(self, seq, limit=1000):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                                      (seq, limit)).fetchall()
+        return [{"seq": r["seq"], "ts": r["ts"], "kind": r["kind"], "key": json.loads(r["key"]),
+                 "op": r["op"], "data": json.loads(r["data"]), "origin": r["origin"]} for r in rows]
+
+    def head(self):
+        with self._lock:
+            return self._head()
+
+    def wait(self, seq, timeout):
+        deadline = time.monotonic() + timeout
+        with self._watch_lock:
+            version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            while True:
+                if self.head() > seq:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # cheap check first; only re-read the head once something was committed
+                while remaining > 0:
+                    time.sleep(min(self.poll_s, remaining))
+                    current = self._watch.execute("PRAGMA data_version").fetchone()[0]
+                    if current != version:
+                        version = current
+                        break
+                    remaining = deadline - time.monotonic()
+
+    def trim(self, keep):
+        self._write(lambda conn: conn.execute(
+            "DELETE FROM changes WHERE seq <= (SELECT seq FROM sqlite_sequence WHERE name = 'changes') - ?",
+            (keep,)))
+
+    def get_meta(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value, only_if_missing=False):
+        def run(conn):
+            if only_if_missing:
+                conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES (?, ?)", (name, value))
+                return conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+            return value
+        return self._write(run)
+
+    def claim(self, ns, keys, owner):
+        keys = list(keys)
+
+        def run(conn):
+            conflicts = {}
+            for k in keys:
+                row = conn.execute("SELECT owner FROM claims WHERE ns = ? AND key = ?", (ns, k)).fetchone()
+                if row and row[0] != owner:
+                    conflicts[k] = row[0]
+            if not conflicts:
+                now = time.time()
+                conn.executemany("INSERT OR REPLACE INTO claims (ns, key, owner, claimed_at) VALUES (?, ?, ?, ?)",
+                                 [(ns, k, owner, now) for k in keys])
+            return conflicts
+
+        return self._write(run)
+
+    def transfer_claims(self, ns, owner, new_owner):
+        self._write(lambda conn: conn.execute("UPDATE claims SET owner = ? WHERE ns = ? AND owner = ?",
+                                              (new_owner, ns, owner)))
+
+    def release_claims(self, ns, owner):
+        return self._write(lambda conn: conn.execute("DELETE FROM claims WHERE ns = ? AND owner = ?",
+                                                     (ns, owner)).rowcount)
+
+    def claims(self, ns):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, owner, claimed_at FROM claims WHERE ns = ?", (ns,)).fetchall()
+        return {r["key"]: (r["owner"], r["claimed_at"]) for r in rows}
+
+    def acquire_lease(self, name, holder, ttl_s):
+        def run(conn):
+            now = time.time()
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row["holder"] != holder and row["expires_at"] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                         (name, holder, now + ttl_s))
+            return True
+        return self._write(run)
+
+    def release_lease(self, name, holder):
+        self._write(lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder)))
+
+    def lease_holder(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT holder FROM leases WHERE name = ? AND expires_at > ?",
+                                     (name, time.time())).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        with self._watch_lock:
+            self._watch.close()
+
+
+def open_backend(spec: str = STATE_BACKEND) -> StateBackend:
+    """
+    Args:
+        spec: "memory", "sqlite:<path>", or "package.module:factory" where
+              factory() returns a StateBackend (e.g. a client for a shared store)
+
+    Raises:
+        ValueError: unrecognized spec
+    """
+    if spec == "memory":
+        return MemoryStateBackend()
+    if spec.startswith("sqlite:"):
+        return SqliteStateBackend(spec[len("sqlite:"):])
+    module, sep, factory = spec.partition(":")
+    if sep and module and factory:
+        return getattr(importlib.import_module(module), factory)()
+    raise ValueError(f"unknown LNT_STATE_BACKEND {spec!r}")
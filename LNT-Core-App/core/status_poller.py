@@ -0,0 +1,138 @@
+# background refresh of device host status
+
+import logging
+import os
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+POLL_INTERVAL_S = float(os.environ.get("LNT_POLL_INTERVAL_S", "30"))
+POLL_JITTER = 0.1              # +/- fraction applied to every interval
+POLL_IDLE_FACTOR = 2           # idle hosts with no running DUTs are polled less often
+POLL_MAX_INTERVAL_S = 300      # cap for disconnected-host backoff
+POLL_TICK_S = 1.0              # longest the loop sleeps before re-checking due hosts
+SKIP_STATUSES = ("pending", "provisioning")   # agent isn't up yet; leave the status to the provisioner
+
+
+class StatusPoller:
+    """
+    Keeps DeviceManager's host records fresh so endpoints can serve the cached
+    inventory instead of calling device hosts inside the request.
+
+    Each host has its own due time. Busy hosts are polled every ``interval_s``,
+    idle hosts with nothing running every ``interval_s * POLL_IDLE_FACTOR``, and
+    disconnected hosts back off exponentially up to ``POLL_MAX_INTERVAL_S``.
+
+    Only the leader worker runs the poller. Refresh requests made on other
+    workers are forwarded to it through the change feed.
+    """
+
+    def __init__(self, device_manage, interval_s: float = POLL_INTERVAL_S):
+        self.dm = device_manage
+        self.interval_s = interval_s
+        self._due: dict[str, float] = {}        # hostname -> epoch when next refresh is due
+        self._failures: dict[str, int] = {}     # hostname -> consecutive failed refreshes
+        self._lock = threading.Lock()            # guards _due against request_refresh callers
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # set when polling is configured at all; the loop itself only runs in the leader
+        self.enabled = False
+        device_manage.changes.subscribe(self._forwarded_refresh, kinds=("_refresh",))
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    @property
+    def available(self) -> bool:
+        """True if refresh requests get served, here or by the leader's poller."""
+        return self.running or self.enabled
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lnt-status-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request_refresh(self, hostname: str | None = None):
+        """Revalidate one host (or every host) on the next loop iteration (the leader's, if not us)."""
+        self.request_refresh_many([hostname] if hostname else None)
+
+    def request_refresh_many(self, hostnames: list[str] | None):
+        if not self.running:
+            self.dm.changes.publish("_refresh", None, "request", hostnames)
+            return
+        now = time.time()
+        targets = hostnames if hostnames is not None else self.dm.list_hosts()
+        with self._lock:
+            for h in targets:
+                self._due[h] = now
+        self._wake.set()
+
+    def _forwarded_refresh(self, change):
+        if self.running:
+            self.request_refresh_many(change["data"])
+
+    def _next_interval(self, hostname: str, record: dict, timed_out: bool) -> float:
+        if timed_out or record.get("status") == "disconnected":
+            failures = self._failures.get(hostname, 0) + 1
+            self._failures[hostname] = failures
+            interval = min(self.interval_s * (2 ** failures), POLL_MAX_INTERVAL_S)
+        else:
+            self._failures.pop(hostname, None)
+            running = record.get("duts", {}).get("status_counts", {}).get("running", 0)
+            if record.get("status") == "idle" and not running:
+                interval = self.interval_s * POLL_IDLE_FACTOR
+            else:
+                interval = self.interval_s
+        return interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+    def _poll_once(self):
+        now = time.time()
+        records = self.dm.get_hosts()
+        hosts = [h for h, rec in list(records.items()) if rec.get("status") not in SKIP_STATUSES]
+        known = set(records)
+
+        # forget removed hosts; new hosts are due immediately
+        with self._lock:
+            for h in list(self._due):
+                if h not in known:
+                    self._due.pop(h, None)
+                    self._failures.pop(h, None)
+            due = [h for h in hosts if self._due.setdefault(h, now) <= now]
+        if not due:
+            return
+
+        results, timed_out = self.dm.refresh_hosts(due)
+        timed_out = set(timed_out)
+        done = time.time()
+        with self._lock:
+            for h, record in results.items():
+                self._due[h] = done + self._next_interval(h, record, h in timed_out)
+
+    def _seconds_until_next(self) -> float:
+        with self._lock:
+            if not self._due:
+                return POLL_TICK_S
+            next_due = min(self._due.values())
+        return max(0.0, min(next_due - time.time(), POLL_TICK_S))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._poll_once()
+            except Exception:
+                log.exception("Status poller error")
+            self._wake.wait(self._seconds_until_next())
+            self._wake.clear()
@@ -0,0 +1,130 @@
+# in-process pub/sub for live serial stream data
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+SUBSCRIBER_QUEUE_SIZE = 256    # chunks buffered per subscriber before the slow-consumer policy kicks in
+POLICIES = ("drop_oldest", "disconnect")
+
+Topic = Tuple[int, str, str]   # (test_id, host, port)
+
+
+class Subscription:
+    """
+    One viewer of one (test, host, port) stream. Lives on the event loop that
+    created it; publishers on other threads hand chunks over with
+    call_soon_threadsafe so ingestion never waits on a viewer.
+    """
+
+    def __init__(self, topic: Topic, loop: asyncio.AbstractEventLoop,
+                 maxsize: int = SUBSCRIBER_QUEUE_SIZE, policy: str = "drop_oldest"):
+        self.topic = topic
+        self.loop = loop
+        self.policy = policy if policy in POLICIES else "drop_oldest"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def _offer(self, chunk: Optional[Dict[str, Any]]):
+        # runs on self.loop
+        if self.closed:
+            return
+        if chunk is None:
+            self._close()
+            return
+        if self.queue.full():
+            if self.policy == "disconnect":
+                self._close()
+                return
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(chunk)
+
+    def _close(self):
+        self.closed = True
+        # make room for the end-of-stream marker
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Next chunk, or None once the stream is closed.
+
+        Raises:
+            asyncio.TimeoutError: nothing arrived within ``timeout`` seconds
+        """
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class StreamHub:
+    """Fans stream chunks out to every subscriber of a (test_id, host, port) topic."""
+
+    def __init__(self):
+        self._subs: Dict[Topic, set] = {}
+        self._seq: Dict[Topic, int] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, test_id: int, host: str, port: str, policy: str = "drop_oldest",
+                  maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> Subscription:
+        """Must be called from the event loop that will consume the subscription."""
+        topic = (test_id, host, port)
+        sub = Subscription(topic, asyncio.get_running_loop(), maxsize=maxsize, policy=policy)
+        with self._lock:
+            self._subs.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.topic]
+
+    def publish(self, test_id: int, host: str, port: str, data: Any) -> Dict[str, Any]:
+        """Hand a chunk to every subscriber of the topic. Safe to call from any thread."""
+        topic = (test_id, host, port)
+        with self._lock:
+            seq = self._seq.get(topic, 0) + 1
+            self._seq[topic] = seq
+            subs = list(self._subs.get(topic, ()))
+        chunk = {"seq": seq, "ts": time.time(), "data": data}
+        for sub in subs:
+            if sub.closed:
+                self.unsubscribe(sub)
+                continue
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, chunk)
+            except RuntimeError:
+                # the subscriber's loop has shut down
+                self.unsubscribe(sub)
+        return chunk
+
+    def close_test(self, test_id: int):
+        """End every stream of a test (subscribers receive end-of-stream)."""
+        with self._lock:
+            topics = [t for t in self._subs if t[0] == test_id]
+            subs = [s for t in topics for s in self._subs.pop(t)]
+            for t in [t for t in self._seq if t[0] == test_id]:
+                del self._seq[t]
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, None)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                f"{t[0]}/{t[1]}/{t[2]}": {
+                    "subscribers": len(subs),
+                    "last_seq": self._seq.get(t, 0),
+                    "dropped": sum(s.dropped for s in subs),
+                }
+                for t, subs in self._subs.items()
+            }
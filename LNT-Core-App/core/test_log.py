@@ -0,0 +1,279 @@
+# append-only, segmented event logs for tests
+
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:   # not on Windows; logs are then only safe with a single writer process
+    fcntl = None
+
+TEST_LOG_DIR = os.environ.get("LNT_TEST_LOG_DIR", "data/test_logs")
+SEGMENT_MAX_BYTES = 1024 * 1024   # roll to a new segment file past this size
+RING_SIZE = 256                   # recent entries kept in memory per open log
+MAX_OPEN_LOGS = 256               # open logs (file handle + ring) kept by TestLogManager
+LOG_LEVELS = ("debug", "info", "warning", "error")
+
+
+class TestEventLog:
+    """
+    Event log for a single test, stored as JSON-lines segment files named
+    after the first sequence number they hold::
+
+        <directory>/00000000000000000001.jsonl
+        <directory>/00000000000000004711.jsonl
+
+    Entries get consecutive sequence numbers starting at 1; a sequence number
+    doubles as the read cursor. Only the last RING_SIZE entries are kept in
+    memory, so tailing a live test is served without touching disk and memory
+    stays bounded however long the test runs.
+
+    Several worker processes may have the same log open: appends take an
+    flock on the directory's .lock file, and every append or read first picks
+    up lines other processes wrote (one stat() when there are none).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._ring: deque = deque(maxlen=RING_SIZE)
+        self._segments: List[int] = sorted(
+            int(name.split(".")[0]) for name in os.listdir(directory) if name.endswith(".jsonl")
+        )
+        self._last_seq = 0
+        self._file = None
+        self._file_size = 0   # bytes of the newest segment already in _ring/_last_seq
+        self._lock_fd: Optional[int] = None
+
+        # recover the tail of the newest segment (another process may be appending to it)
+        if self._segments:
+            path = self._segment_path(self._segments[-1])
+            with self._flocked():
+                self._drop_torn_line(path)
+                for entry in self._read_segment(self._segments[-1]):
+                    self._ring.append(entry)
+                    self._last_seq = entry["seq"]
+                self._file_size = os.path.getsize(path)
+            if self._last_seq == 0:
+                self._last_seq = self._segments[-1] - 1
+
+    @contextmanager
+    def _flocked(self):
+        """Exclusive across processes (the thread lock only covers this one)."""
+        if fcntl is None:
+            yield
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(os.path.join(self.directory, ".lock"), os.O_CREAT | os.O_RDWR, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _drop_torn_line(path: str):
+        """Cut a partially written last line (crash mid-append) so new entries start clean."""
+        with open(path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # walk back to the previous newline
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                nl = chunk.rfind(b"\n")
+                if nl != -1:
+                    f.truncate(pos - step + nl + 1)
+                    return
+                pos -= step
+            f.truncate(0)
+
+    def _list_segments(self) -> List[int]:
+        return sorted(int(name.split(".")[0]) for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+
+    def _sync(self):
+        """Pick up entries other processes appended since we last looked (caller holds the lock)."""
+        if not self._segments:
+            self._segments = self._list_segments()
+            if not self._segments:
+                return
+            self._file_size = 0
+        try:
+            size = os.path.getsize(self._segment_path(self._segments[-1]))
+        except OSError:
+            return
+        if size > self._file_size:
+            self._read_new(self._segments[-1])
+        if self._file_size >= SEGMENT_MAX_BYTES:
+            newer = [s for s in self._list_segments() if s > self._segments[-1]]
+            if newer and self._file is not None:
+                self._file.close()
+                self._file = None
+            for first_seq in newer:
+                self._segments.append(first_seq)
+                self._file_size = 0
+                self._read_new(first_seq)
+
+    def _read_new(self, first_seq: int):
+        with open(self._segment_path(first_seq), "rb") as f:
+            f.seek(self._file_size)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # a line still being written is picked up next time
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._ring.append(entry)
+                self._last_seq = entry["seq"]
+        self._file_size += end
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{first_seq:020d}.jsonl")
+
+    def _read_segment(self, first_seq: int):
+        with open(self._segment_path(first_seq), "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # an append still in progress
+                    return
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def append(self, message: str, level: str = "info", source_host: Optional[str] = None,
+               ts: Optional[str] = None) -> Dict[str, Any]:
+        entry = {
+            "seq": 0,
+            "ts": ts or datetime.utcnow().isoformat(),
+            "level": level if level in LOG_LEVELS else "info",
+            "host": source_host,
+            "message": message,
+        }
+        with self._lock, self._flocked():
+            self._sync()
+            entry["seq"] = self._last_seq + 1
+            if self._file is None or self._file_size >= SEGMENT_MAX_BYTES:
+                self._roll(entry["seq"])
+            data = json.dumps(entry, separators=(",", ":")) + "\n"
+            self._file.write(data)
+            self._file.flush()
+            self._file_size += len(data.encode())
+            self._last_seq = entry["seq"]
+            self._ring.append(entry)
+        return entry
+
+    def _roll(self, next_seq: int):
+        if self._file is not None:
+            self._file.close()
+        if not self._segments or self._file_size >= SEGMENT_MAX_BYTES:
+            self._segments.append(next_seq)
+            self._file_size = 0
+        self._file = open(self._segment_path(self._segments[-1]), "a")
+
+    def read(self, after: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Entries with seq > ``after``, oldest first, at most ``limit`` of them.
+
+        Returns:
+            (entries, next_cursor): pass next_cursor back as ``after`` to continue
+        """
+        with self._lock:
+            self._sync()
+            if after >= self._last_seq:
+                return [], self._last_seq
+            if self._ring and after >= self._ring[0]["seq"] - 1:
+                start = after - self._ring[0]["seq"] + 1
+                entries = [self._ring[i] for i in range(start, min(start + limit, len(self._ring)))]
+                return entries, (entries[-1]["seq"] if entries else after)
+            segments = list(self._segments)
+
+        # older than the ring: find the segment holding after+1 and scan forward
+        entries: List[Dict[str, Any]] = []
+        idx = max(0, bisect_right(segments, after + 1) - 1)
+        for first_seq in segments[idx:]:
+            for entry in self._read_segment(first_seq):
+                if entry["seq"] <= after:
+                    continue
+                entries.append(entry)
+                if len(entries) >= limit:
+                    return entries, entries[-1]["seq"]
+        return entries, (entries[-1]["seq"] if entries else after)
+
+    def tail(self, n: int = 100) -> List[Dict[str, Any]]:
+        """The last ``n`` entries."""
+        return self.read(after=max(0, self._last_seq - n), limit=n)[0]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+
+class TestLogManager:
+    """Owns the event logs of all tests, keeping at most MAX_OPEN_LOGS open at once."""
+
+    def __init__(self, root: str = TEST_LOG_DIR, max_open: int = MAX_OPEN_LOGS):
+        self.root = root
+        self.max_open = max_open
+        self._open: "OrderedDict[int, TestEventLog]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _log(self, test_id: int) -> TestEventLog:
+        with self._lock:
+            log = self._open.get(test_id)
+            if log is not None:
+                self._open.move_to_end(test_id)
+                return log
+            log = TestEventLog(os.path.join(self.root, str(test_id)))
+            self._open[test_id] = log
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                evicted.close()
+            return log
+
+    def append(self, test_id: int, message: str, level: str = "info",
+               source_host: Optional[str] = None, ts: Optional[str] = None) -> Dict[str, Any]:
+        return self._log(test_id).append(message, level=level, source_host=source_host, ts=ts)
+
+    def read(self, test_id: int, after: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+        return self._log(test_id).read(after=after, limit=limit)
+
+    def tail(self, test_id: int, n: int = 100) -> List[Dict[str, Any]]:
+        return self._log(test_id).tail(n)
+
+    def entries_in_memory(self) -> int:
+        """Total entries currently held in memory across open logs."""
+        with self._lock:
+            return sum(len(log._ring) for log in self._open.values())
+
+    def close(self):
+        with self._lock:
+            for log in self._open.values():
+                log.close()
+            self._open.clear()
+
+
+def format_entry(entry: Dict[str, Any]) -> str:
+    """Render an entry the way TestManager logs used to look: "[ts] message"."""
+    host = f" [{entry['host']}]" if entry.get("host") else ""
+    return f"[{entry['ts']}]{host} {entry['message']}"
@@ -1,11 +1,57 @@
 # logic for tests
 
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List, Any
-import re
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, List, Any
+import logging
+import os
+import threading
+import time
+import uuid
+from core import metrics
+from core.change_feed import ChangeFeed
+from core.dut_allocator import DutAllocator, ReservationError
+from core.log_search import LogSearchIndex
+from core.scheduler import TimerScheduler
+from core.serial_log_reader import SerialLogReader, SerialLogReaders
+from core.state_backend import MemoryStateBackend
+from core.stream_hub import StreamHub
+from core.test_log import TestLogManager
+from core.test_spec import TestSpec, compile_spec, load_spec, parse_duration
+from core.test_store import SUMMARY_FIELDS, TestStore, SqliteTestStore
+
+log = logging.getLogger(__name__)
+
+# a test in one of these states is finished and no longer holds device hosts
+TERMINAL_STATUSES = ("passed", "failed", "cancelled", "stopped", "expired")
+
+DUT_CLAIMS = "dut"           # backend claim namespace; keys are "host/dut id"
+RESERVE_ATTEMPTS = 3         # local picks retried when another worker claimed a DUT first
+PENDING_CLAIM_TTL_S = 60     # claims of starts that never finished (crashed worker) expire after this
+TEST_SEQS_KEPT = 4096        # recently changed tests whose last change seq is remembered
+
+LOG_LINES = metrics.counter("test_log_lines", "Test event log lines appended", ["level"])
+
+
+def _epoch(iso_utc: str) -> float:
+    return datetime.fromisoformat(iso_utc).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _finish(test: Dict[str, Any], status: str, now: str) -> bool:
+    """Move a running test to ``status``; False (record untouched) if it already finished."""
+    if test["status"] not in ("running", "pending"):
+        return False
+    test["status"] = status
+    test["finished_at"] = now
+    return True
+
 
 class TestManager:
-    def __init__(self):
+    def __init__(self, store: Optional[TestStore] = None, logs: Optional[TestLogManager] = None,
+                 hub: Optional[StreamHub] = None, search: Optional[LogSearchIndex] = None,
+                 scheduler: Optional[TimerScheduler] = None, allocator: Optional[DutAllocator] = None,
+                 changes: Optional[ChangeFeed] = None):
+        # records are kept in `store` (SQLite by default), keyed by test_id:
         # { test_id: { 
         #   "name": str, 
         #   "description": str,
@@ -15,109 +61,281 @@ class TestManager:
         #   "test_duration": str (e.g., "1d 2h 30m"),
         #   "expires_at": iso|None,
         #   "test_config": dict (parsed test.yaml),
-        #   "logs": [str],
         #   "serial_logs": dict,  # { "host": { "port": "log_file_path" } }
         #   "serial_streams": dict,  # { "host": { "port": stream_data } }
         #   "dut_images": dict,  # { "host": { "dut_name": "image_path" } }
         #   "device_hosts": List[str]  # List of device hosts involved
+        #   "duts": List[dict]  # reserved DUTs [{ "host", "id", "type" }]
         # } }
-        self.tests: Dict[int, Dict[str, Any]] = {}
-        self.next_id = 1
+        # event logs ({seq, ts, level, host, message} entries) live in `logs`
+        self.store = store or SqliteTestStore()
+        self.logs = logs or TestLogManager()
+        # live serial stream chunks fan out to viewers through `hub`
+        self.hub = hub or StreamHub()
+        self.serial_readers = SerialLogReaders()
+        # every event log line and serial log file is fed into the full-text index
+        self.search = search or LogSearchIndex()
+        # expires running tests at their expires_at
+        self.scheduler = scheduler or TimerScheduler()
+        # called as hook(test_id, test) once a test reaches a terminal status
+        self._completion_hooks: List[Callable[[int, Dict[str, Any]], Any]] = []
+        self.add_completion_hook(lambda test_id, test: self.hub.close_test(test_id))
+        # DUT placement (DeviceManager.duts); without one, spec `duts` requests are not enforced
+        self.allocator = allocator
+        if allocator is not None:
+            self.add_completion_hook(lambda test_id, test: allocator.release(test_id))
+        # test starts, updates and log lines for /changes; also how other workers learn about them
+        # (pass DeviceManager's feed so DUT claims go to the same backend)
+        self.changes = changes or ChangeFeed(MemoryStateBackend())
+        # DUTs are claimed in the shared backend too, so two workers can't hand out the same one
+        self.state = self.changes.backend
+        if allocator is not None:
+            self.add_completion_hook(lambda test_id, test: self.state.release_claims(DUT_CLAIMS, f"test:{test_id}"))
+        # only the leader fires expiry timers; see set_leader()
+        self.is_leader = True
+        # seq of the last change seen per recently changed test, so a remote change that
+        # arrives after a newer local one (start delivered after our stop) is ignored
+        self._test_seq: "OrderedDict[int, int]" = OrderedDict()
+        self._test_seq_lock = threading.Lock()
+        # bumped on every record write; list endpoints use it for ETags and response caching
+        self.version = 0
+        self._version_lock = threading.Lock()
+        # ids of tests that haven't reached a terminal status
+        self._live: set = set()
+        metrics.gauge("tests_live", "Tests currently running", fn=lambda: len(self._live))
+        metrics.gauge("test_log_lines_in_memory", "Event log lines held in memory (tail rings of open logs)",
+                      fn=self.logs.entries_in_memory)
+        self.changes.subscribe(self._apply_remote, kinds=("test",))
+
+    def start(self):
+        """Start background workers (search indexing, expiry timers) and re-arm expiry of running tests."""
+        self.search.start()
+        self.scheduler.start()
+        for test in self._running_tests():
+            self._live.add(test["test_id"])
+            self._schedule_expiry(test["test_id"], test.get("expires_at"))
+            if self.allocator is not None and test.get("duts"):
+                self.allocator.restore(test["test_id"], test["duts"])
+
+    def _running_tests(self):
+        cursor = None
+        while True:
+            page, cursor = self.store.list(status="running", cursor=cursor, limit=500)
+            yield from page
+            if cursor is None:
+                return
+
+    def set_leader(self, leader: bool):
+        """
+        Only the leader worker expires tests and scans serial log files for the
+        search index. On election, timers are armed for every running test and
+        DUT claims left behind by crashed workers are dropped.
+        """
+        self.is_leader = leader
+        self.search.scan_serial = leader
+        if not leader:
+            return
+        running = set()
+        for test in self._running_tests():
+            running.add(f"test:{test['test_id']}")
+            self._schedule_expiry(test["test_id"], test.get("expires_at"))
+        now = time.time()
+        for owner, claimed_at in set(self.state.claims(DUT_CLAIMS).values()):
+            if owner.startswith("test:") and owner not in running \
+                    or owner.startswith("pending:") and now - claimed_at > PENDING_CLAIM_TTL_S:
+                self.state.release_claims(DUT_CLAIMS, owner)
+
+    def _apply_remote(self, change):
+        """Track a test started, updated or finished by another worker (change feed tailer thread)."""
+        test_id, test = change["key"], change["data"] or {}
+        self._bump_version()
+        if not self._note_seq(test_id, change["seq"]):
+            return
+        status = test.get("status")
+        if status in TERMINAL_STATUSES:
+            if test_id in self._live:
+                self._finished(test_id, test)
+        elif status in ("running", "pending") and test_id not in self._live:
+            self._live.add(test_id)
+            if self.allocator is not None and test.get("duts"):
+                self.allocator.restore(test_id, test["duts"])
+            self._schedule_expiry(test_id, test.get("expires_at"))
+
+    def add_completion_hook(self, hook: Callable[[int, Dict[str, Any]], Any]):
+        """Register hook(test_id, test) to run when a test is stopped, finishes or expires."""
+        self._completion_hooks.append(hook)
+
+    def _finished(self, test_id: int, test: Dict[str, Any]):
+        self._live.discard(test_id)
+        self.scheduler.cancel(test_id)
+        for hook in self._completion_hooks:
+            try:
+                hook(test_id, test)
+            except Exception:
+                log.exception("Completion hook failed for test %s", test_id)
+
+    def _bump_version(self):
+        with self._version_lock:
+            self.version += 1
+
+    def _update(self, test_id: int, fn: Callable[[Dict[str, Any]], bool],
+                op: str = "update") -> tuple[Optional[Dict[str, Any]], bool]:
+        # read-modify-write in one store transaction (see TestStore.update), so concurrent
+        # updates don't overwrite each other and only one caller wins a status change
+        test, written = self.store.update(test_id, fn)
+        if written:
+            self._bump_version()
+            self._publish_change(test_id, test, op)
+        return test, written
+
+    def _publish_change(self, test_id: int, test: Dict[str, Any], op: str):
+        # summary fields only; clients fetch the config/port maps if they need them
+        data = {k: test.get(k) for k in SUMMARY_FIELDS}
+        data["duts"] = test.get("duts") or []
+        self._note_seq(test_id, self.changes.publish("test", test_id, op, data))
+
+    def _note_seq(self, test_id: int, seq: int) -> bool:
+        """Record ``seq`` as the test's latest change; False if a newer one was seen already."""
+        with self._test_seq_lock:
+            if seq <= self._test_seq.get(test_id, 0):
+                return False
+            self._test_seq[test_id] = seq
+            self._test_seq.move_to_end(test_id)
+            while len(self._test_seq) > TEST_SEQS_KEPT:
+                self._test_seq.popitem(last=False)
+            return True
+
+    def _schedule_expiry(self, test_id: int, expires_at: Optional[str]):
+        if expires_at and self.is_leader:
+            self.scheduler.schedule(test_id, _epoch(expires_at), lambda: self._expire(test_id))
+
+    def _expire(self, test_id: int):
+        # runs on the scheduler thread; a timer armed before losing leadership is dropped
+        if not self.is_leader:
+            return
+        now = datetime.utcnow().isoformat()
+        test, expired = self._update(test_id, lambda t: _finish(t, "expired", now))
+        if not expired:
+            return
+        self._log(test_id, f"Test expired after {test.get('test_duration')}", level="warning", ts=now)
+        self._finished(test_id, test)
+
+    def _log(self, test_id: int, message: str, **kwargs) -> Dict[str, Any]:
+        entry = self.logs.append(test_id, message, **kwargs)
+        self.search.add_event(test_id, entry)
+        self.changes.publish("test_log", test_id, "append", entry)
+        LOG_LINES.labels(entry.get("level", "info")).inc()
+        return entry
+
+    def _register_serial_logs(self, test_id: int, serial_logs: Dict[str, Dict[str, str]]):
+        for host, ports in serial_logs.items():
+            for port, log_path in (ports or {}).items():
+                path = self.serial_readers.resolve(host, str(log_path))
+                if path is not None:
+                    self.search.register_serial_file(test_id, host, port, path)
 
     def _parse_duration(self, duration_str: str) -> timedelta:
         """Parse duration string like '1d 2h 30m' into timedelta."""
-        days = 0
-        hours = 0
-        minutes = 0
-        
-        # Match patterns like "1d", "2h", "30m"
-        day_match = re.search(r'(\d+)d', duration_str)
-        hour_match = re.search(r'(\d+)h', duration_str)
-        min_match = re.search(r'(\d+)m', duration_str)
-        
-        if day_match:
-            days = int(day_match.group(1))
-        if hour_match:
-            hours = int(hour_match.group(1))
-        if min_match:
-            minutes = int(min_match.group(1))
-        
-        return timedelta(days=days, hours=hours, minutes=minutes)
+        return parse_duration(duration_str)
 
     def start_test(self, name: str, test_config: Optional[Dict[str, Any]] = None, 
-                   test_yaml_path: Optional[str] = None) -> int:
+                   test_yaml_path: Optional[str] = None, spec: Optional[TestSpec] = None) -> int:
         """
-        Start a new test. Can accept either a test_config dict (parsed YAML) or test_yaml_path.
+        Start a new test. Can accept a compiled spec, a test_config dict (parsed YAML) or test_yaml_path.
         
         Args:
             name: Test name
             test_config: Parsed test.yaml configuration dict
-            test_yaml_path: Path to test.yaml file (for future file parsing)
+            test_yaml_path: Path to test.yaml file (loaded through the spec cache if no spec/config is given)
+            spec: Already compiled spec (see core.test_spec.load_spec)
         
         Returns:
             test_id: Unique test identifier
+
+        Raises:
+            SpecError: the configuration is malformed
+            ReservationError: the DUTs the spec asks for aren't free
         """
-        test_id = self.next_id
         now = datetime.utcnow()
         
-        # Parse test configuration
-        description = ""
-        test_duration_str = None
-        expires_at = None
-        device_hosts = []
-        dut_images = {}
-        serial_streams = {}
-        serial_logs = {}
-        
-        if test_config:
-            description = test_config.get("Job", {}).get("description", "")
-            test_duration_str = test_config.get("test_duration")
-            
-            # Extract device hosts from firmware section
-            firmware = test_config.get("Firmwrare", {}) or test_config.get("Firmware", {})
-            for host_name in firmware.keys():
-                if host_name not in device_hosts:
-                    device_hosts.append(host_name)
-                dut_images[host_name] = firmware.get(host_name, {})
-            
-            # Extract serial streams configuration
-            serial_streams_config = test_config.get("serial_steams", {}) or test_config.get("serial_streams", {})
-            for host_name, streams in serial_streams_config.items():
-                if host_name not in device_hosts:
-                    device_hosts.append(host_name)
-                serial_streams[host_name] = streams
-            
-            # Extract serial logs configuration
-            serial_logs_config = test_config.get("serial_logs", {})
-            for host_name, logs in serial_logs_config.items():
-                if host_name not in device_hosts:
-                    device_hosts.append(host_name)
-                serial_logs[host_name] = logs
-            
-            # Calculate expiration time
-            if test_duration_str:
-                duration = self._parse_duration(test_duration_str)
-                expires_at = (now + duration).isoformat()
-        
-        self.tests[test_id] = {
+        if spec is None:
+            if test_config:
+                spec = compile_spec(test_config)
+            elif test_yaml_path:
+                spec = load_spec(test_yaml_path)
+            else:
+                spec = compile_spec({})
+        fields = spec.record_fields()
+        expires_at = (now + spec.duration).isoformat() if spec.duration is not None else None
+
+        # claim hardware before the record exists; the reservation moves to the test id below
+        duts = []
+        claim = f"pending:{uuid.uuid4().hex}"
+        if spec.dut_requests and self.allocator is not None:
+            duts = self._reserve(claim, list(spec.dut_requests))
+            for d in duts:
+                if d["host"] not in fields["device_hosts"]:
+                    fields["device_hosts"].append(d["host"])
+        
+        record = {
             "name": name,
-            "description": description,
+            "description": fields["description"],
             "status": "running",
             "started_at": now.isoformat(),
             "finished_at": None,
-            "test_duration": test_duration_str,
+            "test_duration": fields["test_duration"],
             "expires_at": expires_at,
-            "test_config": test_config or {},
+            "test_config": fields["test_config"],
             "test_yaml_path": test_yaml_path,
-            "logs": [f"[{now.isoformat()}] Started test '{name}'"],
-            "serial_logs": serial_logs,
-            "serial_streams": serial_streams,
-            "dut_images": dut_images,
-            "device_hosts": device_hosts
+            "serial_logs": fields["serial_logs"],
+            "serial_streams": fields["serial_streams"],
+            "dut_images": fields["dut_images"],
+            "device_hosts": fields["device_hosts"],
+            "duts": duts
         }
-        self.next_id += 1
+        try:
+            test_id = self.store.create(record)
+        except Exception:
+            if duts:
+                self.allocator.release(claim)
+                self.state.release_claims(DUT_CLAIMS, claim)
+            raise
+        self._live.add(test_id)
+        self._bump_version()
+        self._publish_change(test_id, record, "start")
+        self._log(test_id, f"Started test '{name}'", ts=now.isoformat())
+        if duts:
+            self.allocator.transfer(claim, test_id)
+            self.state.transfer_claims(DUT_CLAIMS, claim, f"test:{test_id}")
+            self._log(test_id, "Reserved DUTs: " + ", ".join(f"{d['host']}/{d['id']} ({d['type']})" for d in duts),
+                      ts=now.isoformat())
+        self._register_serial_logs(test_id, fields["serial_logs"])
+        self._schedule_expiry(test_id, expires_at)
         return test_id
 
+    def _reserve(self, claim: str, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Reserve DUTs locally, then claim them in the state backend. A DUT another
+        worker claimed first (its test start hasn't reached us yet) is held
+        aside for this call and the pick is retried.
+
+        Raises:
+            ReservationError: not enough free DUTs
+        """
+        taken_elsewhere = f"{claim}:conflicts"
+        try:
+            for _ in range(RESERVE_ATTEMPTS):
+                duts = self.allocator.reserve_many(claim, requests)
+                keys = {f"{d['host']}/{d['id']}": d for d in duts}
+                conflicts = self.state.claim(DUT_CLAIMS, keys, claim)
+                if not conflicts:
+                    return duts
+                self.allocator.release(claim)
+                self.allocator.restore(taken_elsewhere, [keys[k] for k in conflicts])
+            raise ReservationError("DUTs are being reserved by another worker; try again")
+        finally:
+            self.allocator.release(taken_elsewhere)
+
     def stop_test(self, test_id: int, reason: str = "stopped") -> bool:
         """
         Stop a running test.
@@ -129,31 +347,30 @@ class TestManager:
         Returns:
             True if test was stopped, False if test doesn't exist or already finished
         """
-        test = self.tests.get(test_id)
-        if not test:
-            return False
-        
-        if test["status"] not in ("running", "pending"):
-            return False
-        
         now = datetime.utcnow().isoformat()
-        test["status"] = "cancelled" if reason == "cancelled" else "stopped"
-        test["finished_at"] = now
-        test["logs"].append(f"[{now}] Test {reason} by user")
+        status = "cancelled" if reason == "cancelled" else "stopped"
+        test, stopped = self._update(test_id, lambda t: _finish(t, status, now))
+        if not stopped:
+            return False
+        self._log(test_id, f"Test {reason} by user", ts=now)
+        self._finished(test_id, test)
         return True
 
-    def get_test_logs(self, test_id: int, log_type: str = "all") -> Optional[Dict[str, Any]]:
+    def get_test_logs(self, test_id: int, log_type: str = "all", after: int = 0,
+                      limit: int = 500) -> Optional[Dict[str, Any]]:
         """
         Get logs for a specific test run.
         
         Args:
             test_id: Test identifier
             log_type: Type of logs to retrieve - "all", "text", "serial", "streams"
+            after: Only text log entries with seq > after (the previous next_cursor)
+            limit: Max text log entries to return
         
         Returns:
             Dict containing requested logs, or None if test doesn't exist
         """
-        test = self.tests.get(test_id)
+        test = self.store.get(test_id)
         if not test:
             return None
         
@@ -166,7 +383,7 @@ class TestManager:
         }
         
         if log_type in ("all", "text"):
-            result["text_logs"] = test["logs"]
+            result["text_logs"], result["next_cursor"] = self.logs.read(test_id, after=after, limit=limit)
         
         if log_type in ("all", "serial"):
             result["serial_logs"] = test["serial_logs"]
@@ -176,9 +393,29 @@ class TestManager:
         
         return result
 
+    def get_serial_log(self, test_id: int, host: str, port: str) -> Optional[SerialLogReader]:
+        """
+        Random-access reader for the serial log file a test maps to host/port
+        (see core.serial_log_reader for line, byte-range, tail and time-window reads).
+        
+        Returns:
+            SerialLogReader, or None if the test, mapping or file doesn't exist
+        """
+        test = self.store.get(test_id)
+        if not test:
+            return None
+        log_path = (test.get("serial_logs") or {}).get(host, {}).get(port)
+        if not log_path:
+            return None
+        path = self.serial_readers.resolve(host, log_path)
+        if path is None or not os.path.isfile(path):
+            return None
+        return self.serial_readers.get(path)
+
     def update_test(self, test_id: int, status: str | None = None, log: str | None = None,
                    serial_log: Optional[Dict[str, str]] = None,
-                   stream_update: Optional[Dict[str, Any]] = None) -> dict | None:
+                   stream_update: Optional[Dict[str, Any]] = None,
+                   level: str = "info", source_host: str | None = None) -> dict | None:
         """
         Update test status and/or add log entries.
         
@@ -186,53 +423,130 @@ class TestManager:
             test_id: Test identifier
             status: New status (e.g., "running", "passed", "failed", "cancelled")
             log: Text log entry to add
+            level: Level of the log entry ("debug", "info", "warning", "error")
+            source_host: Device host the log entry came from, if any
             serial_log: Dict with {"host": {"port": "log_file_path"}} for serial log updates
             stream_update: Dict with {"host": {"port": stream_data}} for stream data updates
         
         Returns:
             Updated test dict or None if test doesn't exist
         """
-        test = self.tests.get(test_id)
+        now = datetime.utcnow().isoformat()
+        finished = False
+
+        # merged into the stored record atomically, so concurrent updates for
+        # different hosts/ports don't drop each other
+        def apply(test):
+            nonlocal finished
+            for host, logs in (serial_log or {}).items():
+                test["serial_logs"].setdefault(host, {}).update(logs)
+            for host, streams in (stream_update or {}).items():
+                test["serial_streams"].setdefault(host, {}).update(streams)
+            if status:
+                test["status"] = status
+                # only the first terminal status counts as finishing the test
+                if status in TERMINAL_STATUSES and test["finished_at"] is None:
+                    test["finished_at"] = now
+                    finished = True
+            return bool(serial_log or stream_update or status)
+
+        if serial_log or stream_update or status:
+            test, _ = self._update(test_id, apply)
+        else:
+            test = self.store.get(test_id)
         if not test:
             return None
         
-        now = datetime.utcnow().isoformat()
-        
         if log:
-            test["logs"].append(f"[{now}] {log}")
+            self._log(test_id, log, level=level, source_host=source_host, ts=now)
         
         if serial_log:
-            for host, logs in serial_log.items():
-                if host not in test["serial_logs"]:
-                    test["serial_logs"][host] = {}
-                test["serial_logs"][host].update(logs)
-        
-        if stream_update:
-            for host, streams in stream_update.items():
-                if host not in test["serial_streams"]:
-                    test["serial_streams"][host] = {}
-                test["serial_streams"][host].update(streams)
-        
-        if status:
-            test["status"] = status
-            if status in ("passed", "failed", "cancelled", "stopped") and test["finished_at"] is None:
-                test["finished_at"] = now
-                test["logs"].append(f"[{now}] Test {status}")
+            self._register_serial_logs(test_id, serial_log)
+        
+        for host, streams in (stream_update or {}).items():
+            for port, data in streams.items():
+                self.hub.publish(test_id, host, port, data)
+        
+        if finished:
+            self._log(test_id, f"Test {status}", ts=now)
+            self._finished(test_id, test)
         
         return test
 
+    def ingest_stream(self, test_id: int, host: str, port: str, data: Any) -> Dict[str, Any]:
+        """
+        Push a live serial chunk to stream viewers without touching the stored
+        record (use update_test(stream_update=...) to also persist it).
+        
+        Returns:
+            The published chunk ({"seq", "ts", "data"})
+        """
+        return self.hub.publish(test_id, host, port, data)
+
     def get_tests(self) -> dict:
-        """Get all tests."""
-        return self.tests
+        """Get all tests (full records). Prefer list_tests for anything user-facing."""
+        tests = {}
+        cursor = None
+        while True:
+            page, cursor = self.store.list(cursor=cursor, limit=500)
+            for record in page:
+                tests[record.pop("test_id")] = record
+            if cursor is None:
+                return tests
+
+    def list_tests(self, status: Optional[str] = None, host: Optional[str] = None,
+                   cursor: Optional[int] = None, limit: int = 50,
+                   summary: bool = False) -> tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Page through tests, newest first.
+        
+        Args:
+            status: Only tests with this status
+            host: Only tests that involve this device host
+            cursor: next_cursor returned by the previous page
+            limit: Page size
+            summary: Skip test_config, logs and other heavy fields
+        
+        Returns:
+            (tests, next_cursor); next_cursor is None on the last page
+        """
+        return self.store.list(status=status, host=host, cursor=cursor, limit=limit, summary=summary)
 
     def get_test(self, test_id: int) -> dict | None:
         """Get a specific test by ID."""
-        return self.tests.get(test_id)
+        return self.store.get(test_id)
+    
+    def get_log_entries(self, test_id: int, after: int = 0, limit: int = 500):
+        """Text log entries with seq > after; returns (entries, next_cursor)."""
+        return self.logs.read(test_id, after=after, limit=limit)
+
+    def search_logs(self, q: str, test_id: Optional[int] = None, host: Optional[str] = None,
+                    port: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, limit: int = 50, context: int = 0,
+                    raw_query: bool = False) -> List[Dict[str, Any]]:
+        """
+        Full-text search across test event logs and serial logs (see LogSearchIndex.search).
+        When scoped to one test, that test's serial files are caught up first.
+        """
+        if test_id is not None:
+            self.search.sync_serial_files(test_id)
+        return self.search.search(q, test_id=test_id, host=host, port=port, since=since,
+                                  until=until, limit=limit, context=context, raw_query=raw_query)
+
+    def close(self):
+        self.scheduler.stop()
+        self.search.close()
+        self.logs.close()
+        self.store.close()
     
     def is_test_expired(self, test_id: int) -> bool:
         """Check if a test has expired based on its test_duration."""
-        test = self.tests.get(test_id)
-        if not test or not test.get("expires_at"):
+        test = self.store.get(test_id)
+        if not test:
+            return False
+        if test["status"] == "expired":
+            return True
+        if not test.get("expires_at"):
             return False
         
         expires_at = datetime.fromisoformat(test["expires_at"])
@@ -0,0 +1,300 @@
+# compiled test.yaml specs, cached by file identity and content hash
+
+import copy
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+from core import request_timing
+
+SPEC_CACHE_SIZE = 128   # compiled specs (and rejected files) kept in memory
+
+# libyaml when available; the pure-python loader otherwise
+_BaseLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# "1d 2h 30m", "45m", "2h30m" ...
+_DURATION_RE = re.compile(r"\s*(?:\d+\s*[dhm]\s*)+")
+_DURATION_PART_RE = re.compile(r"(\d+)\s*([dhm])")
+_DURATION_UNITS = {"d": "days", "h": "hours", "m": "minutes"}
+
+# accepted spellings of each section (older specs carry the typos)
+_FIRMWARE_KEYS = ("Firmware", "Firmwrare")
+_STREAM_KEYS = ("serial_streams", "serial_steams")
+_TEXT_STREAM_KEYS = ("text_stream", "text_steam")
+
+
+class SpecError(ValueError):
+    """A test spec could not be read or is malformed."""
+
+
+class _SpecLoader(_BaseLoader):
+    """Safe loader that refuses mappings with repeated keys instead of keeping the last one."""
+
+    def construct_mapping(self, node, deep=False):
+        if isinstance(node, yaml.MappingNode):
+            seen = {}
+            for key_node, _ in node.value:
+                key = self.construct_object(key_node, deep=deep)
+                if key in seen:
+                    raise SpecError(
+                        f"duplicate key '{key}' on line {key_node.start_mark.line + 1} "
+                        f"(first defined on line {seen[key] + 1})")
+                seen[key] = key_node.start_mark.line
+        return super().construct_mapping(node, deep=deep)
+
+
+def parse_duration(duration_str: str) -> timedelta:
+    """
+    Parse a duration like '1d 2h 30m' into a timedelta.
+
+    Raises:
+        SpecError: not made of <n>d / <n>h / <n>m parts
+    """
+    text = str(duration_str)
+    if not _DURATION_RE.fullmatch(text):
+        raise SpecError(f"invalid test_duration '{duration_str}' (expected e.g. '1d 2h 30m')")
+    parts = {"days": 0, "hours": 0, "minutes": 0}
+    for value, unit in _DURATION_PART_RE.findall(text):
+        parts[_DURATION_UNITS[unit]] += int(value)
+    return timedelta(**parts)
+
+
+@dataclass(frozen=True)
+class TestSpec:
+    """A validated test.yaml. Treat as read-only: compiled specs are shared between starts."""
+    name: str
+    description: str
+    dut_images: Dict[str, Dict[str, str]]            # host -> {dut or port: image path}
+    serial_streams: Dict[str, Dict[str, Dict]]       # host -> {port: {"text_stream": bool}}
+    serial_logs: Dict[str, Dict[str, str]]           # host -> {port: log file}
+    test_duration: Optional[str] = None
+    duration: Optional[timedelta] = None
+    device_hosts: Tuple[str, ...] = ()
+    dut_requests: Tuple[Dict[str, Any], ...] = ()     # [{"type", "count", "hosts"?, "same_host"?}]
+    raw: Dict[str, Any] = field(default_factory=dict)
+    source: Optional[str] = None
+    digest: Optional[str] = None
+
+    def record_fields(self) -> Dict[str, Any]:
+        """Fresh copies of the per-test fields, safe to store and mutate."""
+        return {
+            "description": self.description,
+            "test_duration": self.test_duration,
+            "test_config": copy.deepcopy(self.raw),
+            "dut_images": copy.deepcopy(self.dut_images),
+            "serial_streams": copy.deepcopy(self.serial_streams),
+            "serial_logs": copy.deepcopy(self.serial_logs),
+            "device_hosts": list(self.device_hosts),
+        }
+
+
+def _section(data: Dict[str, Any], keys: Tuple[str, ...]) -> Dict[str, Any]:
+    present = [k for k in keys if k in data]
+    if len(present) > 1:
+        raise SpecError(f"both '{present[0]}' and '{present[1]}' are given; use '{keys[0]}'")
+    value = data.get(present[0]) if present else None
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise SpecError(f"'{present[0]}' must map device hosts to settings")
+    return value
+
+
+def _port_map(section: str, host: str, value: Any) -> Dict[str, str]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise SpecError(f"{section}.{host} must map ports/DUTs to paths")
+    return {str(k): str(v) for k, v in value.items()}
+
+
+def _stream_map(host: str, value: Any) -> Dict[str, Dict]:
+    # one stream ({serial_port, text_stream}) or a list of them
+    if value is None:
+        return {}
+    entries = value if isinstance(value, list) else [value]
+    streams = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or "serial_port" not in entry:
+            raise SpecError(f"serial_streams.{host} entries need a serial_port")
+        port = str(entry["serial_port"])
+        if port in streams:
+            raise SpecError(f"serial_streams.{host}: port '{port}' listed more than once")
+        text = next((entry[k] for k in _TEXT_STREAM_KEYS if k in entry), True)
+        if not isinstance(text, bool):
+            raise SpecError(f"serial_streams.{host}.{port}: text_stream must be true or false")
+        streams[port] = {"text_stream": text}
+    return streams
+
+
+def _dut_requests(value: Any) -> Tuple[Dict[str, Any], ...]:
+    # duts: [{type: CC26x2, count: 2, hosts: [...], same_host: true}, ...]
+    if value is None:
+        return ()
+    if not isinstance(value, list):
+        raise SpecError("'duts' must be a list of {type, count} entries")
+    requests = []
+    for i, entry in enumerate(value):
+        if not isinstance(entry, dict) or not entry.get("type"):
+            raise SpecError(f"duts[{i}] needs a type")
+        count = entry.get("count", 1)
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            raise SpecError(f"duts[{i}].count must be a positive integer")
+        req = {"type": str(entry["type"]), "count": count}
+        if entry.get("hosts") is not None:
+            hosts = entry["hosts"]
+            if not isinstance(hosts, list):
+                raise SpecError(f"duts[{i}].hosts must be a list of device hosts")
+            req["hosts"] = [str(h) for h in hosts]
+        if entry.get("same_host"):
+            req["same_host"] = True
+        requests.append(req)
+    return tuple(requests)
+
+
+def compile_spec(data: Any, source: Optional[str] = None, digest: Optional[str] = None) -> TestSpec:
+    """
+    Validate a parsed test.yaml into a TestSpec.
+
+    Raises:
+        SpecError: the spec is malformed
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise SpecError("spec must be a mapping at the top level")
+    job = data.get("Job") or {}
+    if not isinstance(job, dict):
+        raise SpecError("'Job' must be a mapping")
+
+    hosts: List[str] = []
+    def _host(h):
+        h = str(h)
+        if h not in hosts:
+            hosts.append(h)
+        return h
+
+    dut_images = {_host(h): _port_map("Firmware", h, v) for h, v in _section(data, _FIRMWARE_KEYS).items()}
+    serial_streams = {_host(h): _stream_map(h, v) for h, v in _section(data, _STREAM_KEYS).items()}
+    serial_logs = {_host(h): _port_map("serial_logs", h, v)
+                   for h, v in _section(data, ("serial_logs",)).items()}
+
+    duration_str = data.get("test_duration")
+    duration = None
+    if duration_str is not None:
+        duration_str = str(duration_str)
+        duration = parse_duration(duration_str)
+
+    return TestSpec(
+        name=str(job.get("name", "")),
+        description=str(job.get("description", "")),
+        dut_images=dut_images,
+        serial_streams=serial_streams,
+        serial_logs=serial_logs,
+        test_duration=duration_str,
+        duration=duration,
+        device_hosts=tuple(hosts),
+        dut_requests=_dut_requests(data.get("duts")),
+        raw=data,
+        source=source,
+        digest=digest,
+    )
+
+
+class SpecCache:
+    """
+    Compiled specs by path. A path whose (mtime, size) hasn't changed is served
+    without touching the file; otherwise the file is read and hashed, and
+    unchanged content (e.g. a touched or copied spec) still skips parsing.
+    Rejected specs are cached too, so a bad file is only parsed once.
+    """
+
+    def __init__(self, max_size: int = SPEC_CACHE_SIZE):
+        self.max_size = max_size
+        self._by_path: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+        self._by_digest: "OrderedDict[str, Any]" = OrderedDict()   # digest -> TestSpec | SpecError
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str) -> TestSpec:
+        """
+        Raises:
+            SpecError: missing, unreadable or malformed spec
+        """
+        full = os.path.realpath(path)
+        try:
+            st = os.stat(full)
+        except OSError as e:
+            raise SpecError(f"cannot read spec {path}: {e.strerror}")
+        ident = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            known = self._by_path.get(full)
+            if known and known[0] == ident and known[1] in self._by_digest:
+                self.hits += 1
+                return self._result(known[1])
+
+        try:
+            with open(full, "rb") as f:
+                content = f.read()
+        except OSError as e:
+            raise SpecError(f"cannot read spec {path}: {e.strerror}")
+        digest = hashlib.sha256(content).hexdigest()
+
+        with self._lock:
+            result = self._by_digest.get(digest)
+        cached = result is not None
+        if not cached:
+            try:
+                with request_timing.phase(request_timing.YAML_LOAD):
+                    result = compile_spec(yaml.load(content, Loader=_SpecLoader), source=full, digest=digest)
+            except SpecError as e:
+                result = SpecError(f"{path}: {e}")
+            except yaml.YAMLError as e:
+                result = SpecError(f"{path}: invalid YAML: {e}")
+
+        with self._lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._by_digest[digest] = result
+            self._by_digest.move_to_end(digest)
+            self._by_path[full] = (ident, digest)
+            self._by_path.move_to_end(full)
+            while len(self._by_path) > self.max_size:
+                self._by_path.popitem(last=False)
+            while len(self._by_digest) > self.max_size:
+                self._by_digest.popitem(last=False)
+        return self._unwrap(result)
+
+    def _result(self, digest: str) -> TestSpec:
+        self._by_digest.move_to_end(digest)
+        return self._unwrap(self._by_digest[digest])
+
+    @staticmethod
+    def _unwrap(result) -> TestSpec:
+        if isinstance(result, SpecError):
+            raise result
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"specs": len(self._by_digest), "paths": len(self._by_path),
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache = SpecCache()
+
+
+def load_spec(path: str) -> TestSpec:
+    """Compiled spec for a test.yaml path (cached). Raises SpecError."""
+    return _cache.load(path)
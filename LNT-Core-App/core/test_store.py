@@ -0,0 +1,290 @@
+# storage backends for TestManager
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TEST_DB_PATH = os.environ.get("LNT_TEST_DB", "data/tests.db")
+
+# columns returned by the summary projection (no test config or port maps)
+SUMMARY_FIELDS = ("name", "description", "status", "started_at", "finished_at",
+                  "test_duration", "expires_at", "device_hosts")
+
+# record fields stored as JSON blobs
+_JSON_FIELDS = ("test_config", "serial_logs", "serial_streams", "dut_images", "device_hosts", "duts")
+
+
+class TestStore(ABC):
+    """
+    Interface TestManager persists test records through.
+
+    Records are plain dicts shaped like the ones TestManager builds in
+    start_test. Event logs are not part of the record; they live in
+    core.test_log.
+    """
+
+    @abstractmethod
+    def create(self, record: Dict[str, Any]) -> int:
+        """Insert a new record and return its test_id."""
+
+    @abstractmethod
+    def get(self, test_id: int) -> Optional[Dict[str, Any]]:
+        """Full record, or None."""
+
+    @abstractmethod
+    def update(self, test_id: int,
+               fn: Callable[[Dict[str, Any]], bool]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Atomic read-modify-write: ``fn`` gets the current record, changes it in
+        place and returns True to have it stored. Nothing else can write the
+        record in between (other threads, or other processes sharing the
+        store), so status transitions can be checked and made in one step.
+        ``fn`` must be quick and must not call back into the store.
+
+        Returns:
+            (record as fn left it, whether it was written); (None, False) if
+            there is no such test
+        """
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, host: Optional[str] = None,
+             cursor: Optional[int] = None, limit: int = 50,
+             summary: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Page through tests newest first.
+
+        Args:
+            status: Only tests in this status
+            host: Only tests involving this device host
+            cursor: next_cursor from the previous page
+            limit: Page size
+            summary: Return only SUMMARY_FIELDS (no config)
+
+        Returns:
+            (records, next_cursor): each record carries its "test_id"; next_cursor
+            is None on the last page
+        """
+
+    def close(self) -> None:
+        pass
+
+
+def _project(test_id: int, record: Dict[str, Any], summary: bool) -> Dict[str, Any]:
+    if summary:
+        out = {k: record.get(k) for k in SUMMARY_FIELDS}
+    else:
+        out = dict(record)
+    out["test_id"] = test_id
+    return out
+
+
+class MemoryTestStore(TestStore):
+    """Dict-backed store; nothing survives a restart. Handy for tests and scripts."""
+
+    def __init__(self):
+        self._tests: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def create(self, record):
+        with self._lock:
+            test_id = self._next_id
+            self._next_id += 1
+            self._tests[test_id] = dict(record)
+            return test_id
+
+    def get(self, test_id):
+        record = self._tests.get(test_id)
+        return dict(record) if record else None
+
+    def update(self, test_id, fn):
+        with self._lock:
+            if test_id not in self._tests:
+                return None, False
+            record = copy.deepcopy(self._tests[test_id])
+            if not fn(record):
+                return record, False
+            self._tests[test_id] = copy.deepcopy(record)
+            return record, True
+
+    def list(self, status=None, host=None, cursor=None, limit=50, summary=False):
+        with self._lock:
+            ids = sorted(self._tests, reverse=True)
+            page = []
+            for test_id in ids:
+                if cursor is not None and test_id >= cursor:
+                    continue
+                record = self._tests[test_id]
+                if status and record.get("status") != status:
+                    continue
+                if host and host not in record.get("device_hosts", []):
+                    continue
+                if len(page) == limit:
+                    return page, page[-1]["test_id"]
+                page.append(_project(test_id, record, summary))
+            return page, None
+
+
+class SqliteTestStore(TestStore):
+    """
+    SQLite (WAL mode) store. Status, name, start time and device host are
+    indexed, so filtered pages cost O(page size) regardless of history length.
+    """
+
+    def __init__(self, path: str = TEST_DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    status TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    test_duration TEXT,
+                    expires_at TEXT,
+                    test_yaml_path TEXT,
+                    test_config TEXT,
+                    serial_logs TEXT,
+                    serial_streams TEXT,
+                    dut_images TEXT,
+                    device_hosts TEXT,
+                    duts TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tests_status ON tests(status, id);
+                CREATE INDEX IF NOT EXISTS idx_tests_name ON tests(name);
+                CREATE INDEX IF NOT EXISTS idx_tests_started_at ON tests(started_at);
+
+                CREATE TABLE IF NOT EXISTS test_hosts (
+                    test_id INTEGER NOT NULL REFERENCES tests(id),
+                    host TEXT NOT NULL,
+                    PRIMARY KEY (test_id, host)
+                );
+                CREATE INDEX IF NOT EXISTS idx_test_hosts_host ON test_hosts(host, test_id);
+            """)
+            # databases created before DUT reservations existed
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(tests)")}
+            if "duts" not in columns:
+                self._conn.execute("ALTER TABLE tests ADD COLUMN duts TEXT")
+
+    @staticmethod
+    def _columns(record: Dict[str, Any]) -> Dict[str, Any]:
+        cols = {
+            "name": record.get("name"),
+            "description": record.get("description"),
+            "status": record.get("status"),
+            "started_at": record.get("started_at"),
+            "finished_at": record.get("finished_at"),
+            "test_duration": record.get("test_duration"),
+            "expires_at": record.get("expires_at"),
+            "test_yaml_path": record.get("test_yaml_path"),
+        }
+        for field in _JSON_FIELDS:
+            cols[field] = json.dumps(record.get(field))
+        return cols
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> Dict[str, Any]:
+        record = {}
+        for key in row.keys():
+            if key == "id":
+                continue
+            value = row[key]
+            record[key] = json.loads(value) if key in _JSON_FIELDS and value is not None else value
+        return record
+
+    def _set_hosts(self, test_id: int, hosts: List[str]):
+        self._conn.execute("DELETE FROM test_hosts WHERE test_id = ?", (test_id,))
+        self._conn.executemany("INSERT OR IGNORE INTO test_hosts (test_id, host) VALUES (?, ?)",
+                               [(test_id, h) for h in hosts])
+
+    def create(self, record):
+        cols = self._columns(record)
+        names = ", ".join(cols)
+        marks = ", ".join("?" for _ in cols)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cur = self._conn.execute(f"INSERT INTO tests ({names}) VALUES ({marks})", tuple(cols.values()))
+                test_id = cur.lastrowid
+                self._set_hosts(test_id, record.get("device_hosts") or [])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return test_id
+
+    def get(self, test_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tests WHERE id = ?", (test_id,)).fetchone()
+        return self._row_to_record(row) if row is not None else None
+
+    def update(self, test_id, fn):
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so workers sharing the file serialize here too
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT * FROM tests WHERE id = ?", (test_id,)).fetchone()
+                if row is None:
+                    self._conn.execute("ROLLBACK")
+                    return None, False
+                record = self._row_to_record(row)
+                if not fn(record):
+                    self._conn.execute("ROLLBACK")
+                    return record, False
+                cols = self._columns(record)
+                assignments = ", ".join(f"{k} = ?" for k in cols)
+                self._conn.execute(f"UPDATE tests SET {assignments} WHERE id = ?", (*cols.values(), test_id))
+                self._set_hosts(test_id, record.get("device_hosts") or [])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return record, True
+
+    def list(self, status=None, host=None, cursor=None, limit=50, summary=False):
+        if summary:
+            select = "t.id, " + ", ".join(f"t.{f}" for f in SUMMARY_FIELDS)
+        else:
+            select = "t.*"
+        sql = f"SELECT {select} FROM tests t"
+        where, params = [], []
+        if host:
+            sql += " JOIN test_hosts h ON h.test_id = t.id"
+            where.append("h.host = ?")
+            params.append(host)
+        if status:
+            where.append("t.status = ?")
+            params.append(status)
+        if cursor is not None:
+            where.append("t.id < ?")
+            params.append(cursor)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY t.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        has_more = len(rows) > limit
+        page = []
+        for row in rows[:limit]:
+            record = self._row_to_record(row)
+            record["test_id"] = row["id"]
+            page.append(record)
+        return page, (page[-1]["test_id"] if has_more else None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,47 +1,115 @@
-# logic for users (in-memory)
+# logic for users (SQLite-backed, bcrypt-hashed passwords)
 
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Optional, List
+from typing import Optional, List, Tuple
+from auth.jwt import hash_password, verify_password
+from config.settings import settings
 
 @dataclass
 class _User:
     username: str
-    password: str  # plain text for now to keep it simple (swap to hashed later)
+    password_hash: str
     roles: List[str]
 
 class UserManager:
-    def __init__(self):
+    def __init__(self, path: str = settings.USER_DB_PATH, hash_workers: int = settings.AUTH_HASH_WORKERS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # bcrypt is deliberately slow (~100 ms+); it gets its own bounded pool
+        self._hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="lnt-bcrypt")
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password_hash TEXT NOT NULL,
+                    roles TEXT NOT NULL,
+                    created_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS revoked_tokens (
+                    jti TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                );
+            """)
+            empty = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
         # seed one default user so /user/login works immediately
-        self._users: Dict[str, _User] = {
-            "admin": _User(username="admin", password="admin123", roles=["admin"])
-        }
+        if empty:
+            self.add_user("admin", "admin123", roles=["admin"])
+        # unknown users still pay for one bcrypt verify, so timing doesn't reveal who exists
+        self._dummy_hash = None
 
     # --- auth ---
-    def authenticate(self, username: str, password: str) -> bool:
-        u = self._users.get(username)
-        return bool(u and u.password == password)
+    def authenticate(self, username: str, password: str) -> Optional[_User]:
+        """The user if the password matches, else None. Blocks for a bcrypt verify."""
+        u = self.get_user(username)
+        if u is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = hash_password("lnt-no-such-user")
+            verify_password(password, self._dummy_hash)
+            return None
+        return u if verify_password(password, u.password_hash) else None
+
+    async def run_auth(self, fn, *args):
+        """fn(*args) on the auth pool: for login work too slow for the event loop (hashing, token signing)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._hash_pool, fn, *args)
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                               (jti, expires_at))
+            self._conn.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (time.time(),))
+
+    def revoked_tokens(self) -> List[Tuple[str, float]]:
+        """(jti, exp) of revoked tokens that haven't expired yet."""
+        with self._lock:
+            rows = self._conn.execute("SELECT jti, expires_at FROM revoked_tokens WHERE expires_at >= ?",
+                                      (time.time(),)).fetchall()
+        return [(r["jti"], r["expires_at"]) for r in rows]
 
     # --- queries ---
     def get_users(self) -> list[str]:
-        return list(self._users.keys())
+        with self._lock:
+            return [r["username"] for r in self._conn.execute("SELECT username FROM users ORDER BY username")]
 
     def get_user(self, username: str) -> Optional[_User]:
-        return self._users.get(username)
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        return _User(username=row["username"], password_hash=row["password_hash"], roles=json.loads(row["roles"]))
 
     # --- admin ops (optional, handy for tests) ---
     def add_user(self, username: str, password: str, roles: Optional[List[str]] = None) -> None:
-        self._users[username] = _User(username=username, password=password, roles=roles or ["user"])
+        hashed = hash_password(password)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO users (username, password_hash, roles, created_at) VALUES (?, ?, ?, ?)",
+                (username, hashed, json.dumps(roles or ["user"]), time.time()))
 
     def set_password(self, username: str, new_password: str) -> bool:
-        u = self._users.get(username)
-        if not u:
-            return False
-        u.password = new_password
-        return True
+        hashed = hash_password(new_password)
+        with self._lock:
+            cur = self._conn.execute("UPDATE users SET password_hash = ? WHERE username = ?", (hashed, username))
+        return cur.rowcount > 0
 
     def remove_user(self, username: str) -> bool:
         """Remove a user from the system. Returns True if user was removed, False if user doesn't exist."""
-        if username in self._users:
-            del self._users[username]
-            return True
-        return False
\ No newline at end of file
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM users WHERE username = ?", (username,))
+        return cur.rowcount > 0
+
+    def close(self):
+        self._hash_pool.shutdown(wait=False)
+        with self._lock:
+            self._conn.close()
@@ -1,12 +1,111 @@
-from fastapi import FastAPI
-from api import device_routes, test_routes, user_routes
+import time
+_IMPORT_STARTED = time.perf_counter()   # before anything heavy, for the startup breakdown
 
-app = FastAPI(title="LNT App Core Service")
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from api import admin_routes, change_routes, device_routes, metrics_routes, test_routes, user_routes
+from api.responses import TimedJSONResponse
+from auth.deps import require_admin, require_auth, token_cache
+from auth.jwt import DEFERRED_IMPORTS, use_state_backend
+from core import metrics
+from core.change_feed import ChangeFeed
+from core.device_manage import DeviceManager
+from core.leader import LeaderElector
+from core.startup import StartupTimer
+from core.state_backend import open_backend
+from core.status_poller import StatusPoller
+from core.test_manage import TestManager
+from core.user_manage import UserManager
+
+# set LNT_POLLER_ENABLED=0 to only refresh hosts on demand
+POLLER_ENABLED = os.environ.get("LNT_POLLER_ENABLED", "1") != "0"
+LOG_LEVEL = os.environ.get("LNT_LOG_LEVEL", "INFO")
+
+# the app's own loggers (core.*, utils.*); uvicorn keeps configuring its own
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger("lnt")
+
+startup = StartupTimer(_IMPORT_STARTED)
+startup.record("imports", time.perf_counter() - _IMPORT_STARTED)
+metrics.gauge("startup_step_seconds", "Time spent in each startup step", ["step"],
+              fn=lambda: {(k,): v for k, v in startup.steps.items()})
+
+# Any number of workers (uvicorn --workers N) share state through core.state_backend;
+# the one holding the leader lease runs the status poller, test expiry and inventory.yml writes.
+def _set_leader(app: FastAPI, leader: bool):
+    app.state.dm.set_leader(leader)
+    app.state.tm.set_leader(leader)
+    if leader and POLLER_ENABLED:
+        app.state.poller.start()
+    elif not leader:
+        app.state.poller.stop()
+
+# Managers are built here rather than when their route modules are imported, so
+# each step shows up in the startup breakdown (/admin/startup, lnt_startup_step_seconds)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup.step("state_backend"):
+        # opened here rather than on import, so importing the app touches no data/ files
+        app.state.changes = ChangeFeed(open_backend())
+        use_state_backend(app.state.changes.backend)
+    with startup.step("device_manager"):
+        app.state.dm = DeviceManager(changes=app.state.changes)
+    startup.record("device_manager", 0, hosts=len(app.state.dm.snapshot().hosts),
+                   inventory=app.state.dm.inventory_cache.last_load)
+    app.state.poller = StatusPoller(app.state.dm)
+    app.state.poller.enabled = POLLER_ENABLED
+    with startup.step("user_manager"):
+        app.state.um = UserManager()
+        # tokens revoked before a restart stay revoked
+        for jti, exp in app.state.um.revoked_tokens():
+            token_cache.revoke(jti, exp)
+        # logouts on other workers reach this one's cache through the change feed
+        app.state.changes.subscribe(lambda c: token_cache.revoke(c["key"], c["data"]["exp"]),
+                                    kinds=(user_routes.TOKEN_REVOKED,))
+    with startup.step("test_manager"):
+        app.state.tm = TestManager(allocator=app.state.dm.duts, changes=app.state.changes)
+        app.state.tm.start()
+    with startup.step("leader_election"):
+        app.state.changes.start()
+        app.state.leader = LeaderElector(app.state.changes.backend, holder=app.state.changes.origin)
+        app.state.leader.on_elected(lambda: _set_leader(app, True))
+        app.state.leader.on_demoted(lambda: _set_leader(app, False))
+        metrics.gauge("leader", "1 while this worker holds the leader lease",
+                      fn=lambda: int(bool(app.state.leader.is_leader)))
+        app.state.leader.start()
+    startup.ready()
+    app.state.startup = startup
+    log.info(startup.summary())
+    startup.import_deferred(DEFERRED_IMPORTS)
+    yield
+    app.state.leader.stop()
+    app.state.poller.stop()
+    app.state.changes.close()
+    app.state.dm.close()
+    app.state.tm.close()
+    app.state.um.close()
+    app.state.changes.backend.close()
+
+app = FastAPI(title="LNT App Core Service", lifespan=lifespan, default_response_class=TimedJSONResponse)
+app.add_middleware(admin_routes.RequestTimingMiddleware)
+app.add_middleware(metrics_routes.MetricsMiddleware)
 
 # include route modules
-app.include_router(device_routes.router, prefix="/device", tags=["Device"])
-app.include_router(test_routes.router, prefix="/test", tags=["Test"])
+# require_auth only enforces tokens when LNT_AUTH_REQUIRED is set
+app.include_router(device_routes.router, prefix="/device", tags=["Device"],
+                   dependencies=[Depends(require_auth)])
+app.include_router(test_routes.router, prefix="/test", tags=["Test"],
+                   dependencies=[Depends(require_auth)])
+app.include_router(change_routes.router, prefix="/changes", tags=["Changes"],
+                   dependencies=[Depends(require_auth)])
+app.include_router(metrics_routes.router, prefix="/metrics", tags=["Metrics"],
+                   dependencies=[Depends(require_auth)])
 app.include_router(user_routes.router, prefix="/user", tags=["User"])
+# profiler, slow-request log, startup breakdown: always needs an admin token, even with LNT_AUTH_REQUIRED off
+app.include_router(admin_routes.router, prefix="/admin", tags=["Admin"],
+                   dependencies=[Depends(require_admin)])
 
 @app.get("/")
 def root():
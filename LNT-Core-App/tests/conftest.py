@@ -0,0 +1,44 @@
+# run with `python -m pytest` from LNT-Core-App; modules import each other as core.*, api.*, ...
+
+import os
+import shutil
+import sys
+
+import pytest
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_ROOT)
+
+from core import device_manage  # noqa: E402
+from core.change_feed import ChangeFeed  # noqa: E402
+from core.device_manage import DeviceManager  # noqa: E402
+from core.state_backend import SqliteStateBackend  # noqa: E402
+
+
+@pytest.fixture
+def inventory(tmp_path, monkeypatch):
+    # everything under data/ (inventory cache) and the inventory itself lands in tmp_path
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "inventory.yml"
+    shutil.copy(os.path.join(APP_ROOT, "ansible", "inventory.yml"), path)
+    monkeypatch.setattr(device_manage, "INVENTORY_PATH", str(path))
+    return path
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    managers = []
+
+    def make(backend=None):
+        backend = backend or SqliteStateBackend(str(tmp_path / "state.db"))
+        dm = DeviceManager(changes=ChangeFeed(backend))
+        dm.provisioner.runner = lambda hostnames, on_output: 0   # no ansible-playbook in tests
+        managers.append(dm)
+        return dm
+
+    yield make
+    for dm in managers:
+        dm.provisioner.shutdown(wait=True)
+        dm.changes.close()
+        dm.close()
+
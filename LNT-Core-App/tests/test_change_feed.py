@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+from core import change_feed
+from core.change_feed import ChangeFeed
+from core.state_backend import MemoryStateBackend
+
+
+def _publish(feed, n, kind="host"):
+    return [feed.publish(kind, f"h{i}", "upsert", {"i": i}) for i in range(n)]
+
+
+def test_cursor_older_than_retention_gets_resync():
+    feed = ChangeFeed(MemoryStateBackend(), retention=5)
+    seqs = _publish(feed, 12)
+    head = seqs[-1]
+
+    out = feed.read(since=2)
+    assert out == {"changes": [], "next": head, "resync": True}
+    # carrying on from the returned next is a normal incremental read again
+    assert feed.read(since=out["next"]) == {"changes": [], "next": head, "resync": False}
+    _publish(feed, 1)
+    assert [c["seq"] for c in feed.read(since=out["next"])["changes"]] == [head + 1]
+
+    # the oldest retained change can still be reached, one before it cannot
+    oldest = head + 1 - 4
+    assert feed.read(since=oldest - 1)["resync"] is False
+    assert feed.read(since=oldest - 2)["resync"] is True
+
+
+def test_cursor_from_before_a_restart_gets_resync():
+    feed = ChangeFeed(MemoryStateBackend())
+    _publish(feed, 3)
+    assert feed.read(since=50)["resync"] is True
+    assert feed.read(since=-1)["resync"] is True
+
+
+def test_paging_skips_internal_and_filtered_kinds():
+    feed = ChangeFeed(MemoryStateBackend())
+    feed.publish("host", "h1", "upsert", {})
+    feed.publish("_refresh", None, "request", None)
+    feed.publish("test", 1, "start", {})
+    feed.publish("host", "h2", "upsert", {})
+
+    page = feed.read(since=0, limit=2)
+    assert [c["key"] for c in page["changes"]] == ["h1", 1]   # "_refresh" is never returned
+    assert page["next"] == 3
+    page = feed.read(since=page["next"], kinds=["host"])
+    assert [c["key"] for c in page["changes"]] == ["h2"]
+    assert page["next"] == 4
+    # next moves past changes of other kinds even when none match
+    assert feed.read(since=0, kinds=["test_log"]) == {"changes": [], "next": 4, "resync": False}
+
+
+def test_other_workers_changes_reach_subscribers(monkeypatch):
+    monkeypatch.setattr(change_feed, "CHANGE_TAIL_WAIT_S", 0.05)   # so close() doesn't wait out a full tick
+    backend = MemoryStateBackend()
+    a = ChangeFeed(backend, origin="a")
+    b = ChangeFeed(backend, origin="b")
+    got = []
+    seen = threading.Event()
+    b.subscribe(lambda c: (got.append(c["key"]), seen.set()), kinds=("host",))
+    a.subscribe(lambda c: got.append(("echo", c["key"])), kinds=("host",))
+    b.start()
+    a.start()
+    try:
+        a.publish("test", 1, "start", {})
+        a.publish("host", "h1", "upsert", {})
+        assert seen.wait(5)
+        assert got == ["h1"]   # b hears a's host change; a never hears its own
+        assert [c["key"] for c in b.read(since=0)["changes"]] == [1, "h1"]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_late_joiner_shares_the_cursor_space():
+    backend = MemoryStateBackend()
+    a = ChangeFeed(backend, retention=5)
+    _publish(a, 20)
+    b = ChangeFeed(backend, retention=5)
+    assert b.seq == a.seq
+    assert b.read(since=17) == a.read(since=17)
+    assert b.read(since=2)["resync"] is True
+
+
+def test_async_wait_is_woken_by_a_publish_from_another_thread():
+    feed = ChangeFeed(MemoryStateBackend())
+
+    async def main():
+        since = feed.seq
+        assert await feed.wait(since, 0.05) is False
+        threading.Timer(0.05, feed.publish, ("host", "h1", "upsert", {})).start()
+        start = time.monotonic()
+        assert await feed.wait(since, 5) is True
+        assert time.monotonic() - start < 2
+        assert feed.stats()["waiters"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+
+import pytest
+import requests
+import yaml
+
+from core import host_client
+from core.device_manage import PROVISION_GROUP
+from core.host_client import BREAKER_BASE_BACKOFF_S, BREAKER_FAILURE_THRESHOLD
+from core.state_backend import SqliteStateBackend
+from test_host_client import _Agent, _Clock
+
+
+def _written(path):
+    with open(path) as f:
+        top = yaml.safe_load(f)["all"]
+    return set(top["hosts"]), set(top["children"][PROVISION_GROUP]["hosts"])
+
+
+def test_added_and_removed_hosts_follow_the_provisioning_group(inventory, make_manager):
+    make_manager()       # first start imports inventory.yml into the backend
+    dm = make_manager()  # a restart or second worker loads the hosts from the backend instead
+    dm.add_host("NEW_HOST", "10.0.0.9")
+    dm.bulk_add_hosts([{"hostname": "BULK_1", "ip_address": "10.0.0.10"},
+                       {"hostname": "BULK_2", "ip_address": "10.0.0.11"}])
+    dm.remove_host("LNT_DEVICE_HOST_1")
+    dm.bulk_remove_hosts(["BULK_2"])
+    dm.flush_inventory()
+
+    hosts, group = _written(inventory)
+    assert hosts == group == {"LNT_DEVICE_HOST_2", "NEW_HOST", "BULK_1"}
+    # group vars from the hand-written file are kept
+    with open(inventory) as f:
+        assert yaml.safe_load(f)["all"]["children"][PROVISION_GROUP]["vars"]["usbip_enabled"] is True
+
+
+def test_group_is_created_when_there_is_no_inventory_yet(inventory, make_manager):
+    os.remove(inventory)
+    dm = make_manager()
+    dm.add_host("FIRST", "10.0.0.1")
+    dm.flush_inventory()
+    assert _written(inventory) == ({"FIRST"}, {"FIRST"})
+
+
+def _agent(dm, status="idle", count=1):
+    # every host answers like a healthy agent
+    def get_json(hostname, url):
+        if url.endswith("/health"):
+            return {"status": status}
+        return {"count": count, "types": ["CC26"]}
+    dm.host_client.get_json = get_json
+
+
+def _wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def _kinds(backend):
+    return [(c["kind"], c["key"]) for c in backend.changes_after(0)]
+
+
+def test_host_added_on_a_follower_is_exported_by_the_leader(inventory, make_manager, tmp_path):
+    backend = SqliteStateBackend(str(tmp_path / "state.db"))
+    leader = make_manager(backend)
+    follower = make_manager(SqliteStateBackend(str(tmp_path / "state.db")))
+    follower.set_leader(False)
+    leader.changes.start()
+    follower.changes.start()
+
+    follower._add_host_record("FROM_FOLLOWER", "10.0.0.5")
+    follower.save_inventory()
+    assert not follower._store.dirty   # only the leader writes inventory.yml behind changes
+    _wait_for(lambda: "FROM_FOLLOWER" in leader.get_hosts())
+    assert leader._store.dirty
+    leader._store.flush()
+
+    hosts, group = _written(inventory)
+    assert "FROM_FOLLOWER" in hosts and "FROM_FOLLOWER" in group
+    assert leader.get_hosts()["FROM_FOLLOWER"]["ansible_host"] == "10.0.0.5"
+
+
+def test_hand_edited_inventory_is_imported_at_the_next_start(inventory, make_manager, tmp_path):
+    first = make_manager()
+    first.changes.start()
+    with open(inventory) as f:
+        data = yaml.safe_load(f)
+    data["all"]["children"][PROVISION_GROUP]["hosts"]["HAND_ADDED"] = {"ansible_host": "10.0.0.7"}
+    del data["all"]["children"][PROVISION_GROUP]["hosts"]["LNT_DEVICE_HOST_2"]
+    with open(inventory, "w") as f:
+        yaml.safe_dump(data, f)
+    os.utime(inventory, ns=(time.time_ns(), time.time_ns() + 10**9))   # a different mtime for sure
+
+    second = make_manager()
+    assert set(second.get_hosts()) == {"LNT_DEVICE_HOST_1", "HAND_ADDED"}
+    # the import went through the change feed, so the running worker follows it
+    _wait_for(lambda: set(first.get_hosts()) == {"LNT_DEVICE_HOST_1", "HAND_ADDED"})
+
+    # our own export is not mistaken for a hand edit
+    second.flush_inventory()
+    seq = second.changes.seq
+    third = make_manager()
+    assert third.changes.seq == seq
+    assert set(third.get_hosts()) == {"LNT_DEVICE_HOST_1", "HAND_ADDED"}
+
+
+def test_refresh_that_only_moves_last_seen_publishes_a_touch(inventory, make_manager):
+    dm = make_manager()
+    backend = dm.state
+    _agent(dm)
+    dm.refresh_host_status("LNT_DEVICE_HOST_1")
+    assert _kinds(backend)[-1] == ("host", "LNT_DEVICE_HOST_1")   # status and DUTs changed
+
+    seq = dm.changes.seq
+    dm.refresh_host_status("LNT_DEVICE_HOST_1")
+    new = backend.changes_after(seq)
+    assert [c["kind"] for c in new] == ["_hosts_seen"]
+    assert set(new[0]["data"]) == {"LNT_DEVICE_HOST_1"}
+    assert dm.changes.read(since=seq)["changes"] == []   # not a client-visible change
+
+
+def test_older_remote_change_does_not_overwrite_a_newer_one(inventory, make_manager, tmp_path):
+    a = make_manager()
+    b = make_manager(SqliteStateBackend(str(tmp_path / "state.db")))
+    a._add_host_record("RACE", "10.0.0.1")
+    a.save_inventory()
+    first = a.changes.seq
+    with a._lock:
+        a.inventory["all"]["hosts"]["RACE"]["ansible_host"] = "10.0.0.2"
+        a._touch("RACE")
+        a.save_inventory()
+    changes = [c for c in a.state.changes_after(0) if c["key"] == "RACE"]
+    assert changes[0]["seq"] == first < changes[1]["seq"]
+
+    # delivered newest first: the stale upsert must be ignored
+    b._apply_remote(changes[1])
+    b._apply_remote(changes[0])
+    assert b.get_hosts()["RACE"]["ansible_host"] == "10.0.0.2"
+    # and a late touch doesn't resurrect an old last_seen either
+    b._apply_remote({"seq": first, "kind": "_hosts_seen", "key": None, "op": "touch",
+                     "data": {"RACE": 1}})
+    assert b.get_hosts()["RACE"]["last_seen_epoch"] != 1
+
+
+def test_recovered_host_is_not_marked_disconnected_by_its_own_probe(inventory, make_manager, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(host_client, "time", clock)
+    dm = make_manager()
+    agent = _Agent(delay_s=0.05)   # the probe is still out when /duts would be sent
+    dm.host_client._state("LNT_DEVICE_HOST_1").session = agent
+
+    agent.up = False
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        dm.refresh_host_status("LNT_DEVICE_HOST_1")
+    assert dm.host_client.is_open("LNT_DEVICE_HOST_1")
+    assert dm.get_hosts()["LNT_DEVICE_HOST_1"]["status"] == "disconnected"
+
+    clock.now += BREAKER_BASE_BACKOFF_S
+    agent.up = True
+    assert dm.refresh_host_status("LNT_DEVICE_HOST_1")["status"] == "idle"
+    assert [url.rsplit("/", 1)[-1] for url in agent.calls[-2:]] == ["health", "duts"]
+    assert dm.host_client.stats()["LNT_DEVICE_HOST_1"]["circuit"] == "closed"
+
+
+def test_slow_host_keeps_its_record_when_the_sweep_deadline_passes(inventory, make_manager):
+    dm = make_manager()
+    _agent(dm)
+    dm.refresh_hosts(["LNT_DEVICE_HOST_1", "LNT_DEVICE_HOST_2"])
+    before = dict(dm.get_hosts()["LNT_DEVICE_HOST_2"])
+
+    release = threading.Event()
+    answer = dm.host_client.get_json
+
+    def get_json(hostname, url):
+        if hostname == "LNT_DEVICE_HOST_2":
+            release.wait(5)
+            raise requests.exceptions.ConnectionError("too late to matter")
+        return answer(hostname, url)
+
+    dm.host_client.get_json = get_json
+    try:
+        results, timed_out = dm.refresh_hosts(["LNT_DEVICE_HOST_1", "LNT_DEVICE_HOST_2"], deadline_s=0.2)
+    finally:
+        release.set()
+    assert timed_out == ["LNT_DEVICE_HOST_2"]
+    assert results["LNT_DEVICE_HOST_2"] == before
+    assert results["LNT_DEVICE_HOST_1"]["status"] == "idle"
+
+
+def test_host_removed_while_it_is_being_refreshed(inventory, make_manager):
+    dm = make_manager()
+
+    def get_json(hostname, url):
+        if url.endswith("/health"):
+            dm.remove_host(hostname)
+        return {}
+
+    dm.host_client.get_json = get_json
+    assert dm.refresh_host_status("LNT_DEVICE_HOST_1") is None
+    assert dm.refresh_host_status("NO_SUCH_HOST") is None
+    assert "LNT_DEVICE_HOST_1" not in dm.get_hosts()
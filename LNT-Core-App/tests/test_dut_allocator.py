@@ -0,0 +1,75 @@
+import pytest
+
+from core.dut_allocator import DutAllocator, ReservationError
+
+
+def _items(*specs):
+    # ("id", "type") or ("id", "type", "status")
+    return [{"id": s[0], "type": s[1], "status": s[2] if len(s) > 2 else "idle"} for s in specs]
+
+
+@pytest.fixture
+def alloc():
+    a = DutAllocator()
+    a.update_host("h1", "idle", _items(("a1", "CC26"), ("a2", "CC26"), ("b1", "CC13")))
+    a.update_host("h2", "busy", _items(("a3", "CC26"), ("b2", "CC13", "running")))
+    return a
+
+
+def _free(alloc, dut_type):
+    return alloc.stats()["types"][dut_type]["free"]
+
+
+def test_reserve_many_takes_every_request(alloc):
+    got = alloc.reserve_many(1, [{"type": "CC26", "count": 2}, {"type": "CC13", "count": 1}])
+    assert sorted((d["host"], d["id"], d["type"]) for d in got) == \
+        [("h1", "a1", "CC26"), ("h1", "a2", "CC26"), ("h1", "b1", "CC13")]
+    assert _free(alloc, "CC26") == 1
+    assert _free(alloc, "CC13") == 0
+    assert len(alloc.held_by(1)) == 3
+
+
+def test_reserve_many_is_all_or_nothing(alloc):
+    # CC26 part fits, CC13 doesn't (b2 is running): nothing may stay reserved
+    with pytest.raises(ReservationError):
+        alloc.reserve_many(1, [{"type": "CC26", "count": 3}, {"type": "CC13", "count": 2}])
+    assert alloc.held_by(1) == []
+    assert _free(alloc, "CC26") == 3
+    assert _free(alloc, "CC13") == 1
+    assert alloc.stats()["reservations"] == 0
+
+
+def test_concurrent_owners_never_share_a_dut(alloc):
+    first = alloc.reserve(1, "CC26", 2)
+    second = alloc.reserve(2, "CC26", 1)
+    keys = [(d["host"], d["id"]) for d in first + second]
+    assert len(set(keys)) == 3
+    with pytest.raises(ReservationError):
+        alloc.reserve(3, "CC26", 1)
+
+
+def test_constraints(alloc):
+    with pytest.raises(ReservationError):
+        alloc.reserve(1, "CC26", 2, {"hosts": ["h2"]})
+    got = alloc.reserve(1, "CC26", 2, {"same_host": True})
+    assert {d["host"] for d in got} == {"h1"}
+    with pytest.raises(ReservationError):
+        alloc.reserve(2, "CC26", 1, {"exclude_hosts": ["h2"]})
+
+
+def test_release_frees_everything_the_owner_held(alloc):
+    alloc.reserve_many(1, [{"type": "CC26", "count": 3}, {"type": "CC13", "count": 1}])
+    assert _free(alloc, "CC26") == 0
+    assert alloc.release(1) == 4
+    assert _free(alloc, "CC26") == 3
+    assert _free(alloc, "CC13") == 1
+    assert alloc.release(1) == 0   # second release is a no-op
+
+
+def test_released_dut_on_unusable_host_stays_out(alloc):
+    alloc.reserve(1, "CC26", 3)
+    alloc.set_host_status("h2", "disconnected")
+    alloc.release(1)
+    assert _free(alloc, "CC26") == 2
+    alloc.set_host_status("h2", "idle")
+    assert _free(alloc, "CC26") == 3
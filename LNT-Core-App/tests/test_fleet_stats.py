@@ -0,0 +1,69 @@
+import random
+
+from core.fleet_stats import FleetStats
+
+
+def _host(status="idle", rack="r1", duts=()):
+    return {"status": status, "rack": rack,
+            "duts": {"count": len(duts), "items": [{"id": str(i), "type": t, "status": s}
+                                                   for i, (t, s) in enumerate(duts)]}}
+
+
+def test_update_replaces_the_previous_contribution():
+    fleet = FleetStats(group_by=["rack"])
+    fleet.update_host("h1", _host("busy", "r1", [("CC26", "running"), ("CC26", "idle")]))
+    fleet.update_host("h2", _host("idle", "r2", [("CC13", "idle")]))
+    fleet.update_host("h1", _host("idle", "r2", [("CC26", "idle")]))
+
+    stats = fleet.stats(group_by=["rack"])
+    assert stats["host_count"] == 2
+    assert stats["status_counts"]["idle"] == 2 and stats["status_counts"]["busy"] == 0
+    assert stats["total_duts"] == 2
+    assert stats["dut_status_counts"] == {"running": 0, "idle": 2, "offline": 0}
+    assert stats["duts_by_type"]["CC26"] == {"total": 1, "running": 0, "idle": 1, "offline": 0}
+    # h1 moved racks: r1 is empty and dropped
+    assert list(stats["groups"]["rack"]) == ["r2"]
+    assert stats["groups"]["rack"]["r2"]["host_count"] == 2
+
+
+def test_remove_host_subtracts_it():
+    fleet = FleetStats(group_by=[])
+    fleet.update_host("h1", _host("busy", duts=[("CC26", "running")]))
+    fleet.update_host("h2", _host("idle", duts=[("CC26", "idle")]))
+    fleet.remove_host("h1")
+    fleet.remove_host("missing")
+    stats = fleet.stats()
+    assert stats["host_count"] == 1
+    assert stats["duts_by_type"] == {"CC26": {"total": 1, "running": 0, "idle": 1, "offline": 0}}
+    assert stats["utilization"] == 0.0
+
+
+def test_running_totals_match_a_rebuild():
+    rng = random.Random(7)
+    fleet = FleetStats(group_by=["rack"])
+    live = {}
+    for _ in range(2000):
+        name = f"h{rng.randrange(30)}"
+        if rng.random() < 0.15:
+            fleet.remove_host(name)
+            live.pop(name, None)
+            continue
+        duts = [(rng.choice(["CC26", "CC13"]), rng.choice(["running", "idle", "offline"]))
+                for _ in range(rng.randrange(5))]
+        rec = _host(rng.choice(["idle", "busy", "disconnected"]), rng.choice(["r1", "r2", "r3"]), duts)
+        fleet.update_host(name, rec)
+        live[name] = rec
+
+    rebuilt = FleetStats(group_by=["rack"])
+    for name, rec in live.items():
+        rebuilt.update_host(name, rec)
+    assert fleet.stats(group_by=["rack"]) == rebuilt.stats(group_by=["rack"])
+
+
+def test_group_by_requested_later_is_built_from_current_records():
+    fleet = FleetStats(group_by=[])
+    fleet.update_host("h1", {**_host(duts=[("CC26", "idle")]), "lab": "east"})
+    fleet.update_host("h2", _host())
+    groups = fleet.stats(group_by=["lab"])["groups"]["lab"]
+    assert groups["east"]["total_duts"] == 1
+    assert groups["unassigned"]["host_count"] == 1
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+import requests
+
+from core import host_client
+from core.host_client import (BREAKER_BASE_BACKOFF_S, BREAKER_FAILURE_THRESHOLD, CircuitOpenError,
+                              DeviceHostClient)
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class _Agent:
+    """Stands in for a host's requests.Session; ``up`` decides whether it answers."""
+
+    def __init__(self, delay_s=0.0):
+        self.up = True
+        self.delay_s = delay_s
+        self.calls = []
+
+    def get(self, url, timeout):
+        self.calls.append(url)
+        time.sleep(self.delay_s)
+        if not self.up:
+            raise requests.exceptions.ConnectionError("connection refused")
+        return _Response({"url": url})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(host_client, "time", c)
+    return c
+
+
+@pytest.fixture
+def client(clock):
+    c = DeviceHostClient(connect_timeout_s=1, read_timeout_s=1)
+    agent = _Agent()
+    c._state("h1").session = agent
+    yield c, agent
+    c.close()
+
+
+def _circuit(c):
+    return c.stats()["h1"]["circuit"]
+
+
+def test_breaker_goes_open_then_half_open_then_closed(client, clock):
+    c, agent = client
+    agent.up = False
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            c.get_json("h1", "http://h1/api/health")
+    assert _circuit(c) == "open"
+
+    # fails fast without touching the network until the backoff runs out
+    with pytest.raises(CircuitOpenError):
+        c.get_json("h1", "http://h1/api/health")
+    assert len(agent.calls) == BREAKER_FAILURE_THRESHOLD
+
+    # a failed probe doubles the backoff
+    clock.now += BREAKER_BASE_BACKOFF_S
+    with pytest.raises(requests.exceptions.ConnectionError):
+        c.get_json("h1", "http://h1/api/health")
+    assert c.stats()["h1"]["retry_in_s"] == 2 * BREAKER_BASE_BACKOFF_S
+
+    # the next probe is let through alone; everything else is rejected meanwhile
+    clock.now += 2 * BREAKER_BASE_BACKOFF_S
+    agent.up = True
+    state = c._state("h1")
+    assert c._admit(state) == "probe"
+    assert _circuit(c) == "half-open"
+    assert c._admit(state) is None
+    c._record(state, 1.0, None, probe=True)
+
+    assert _circuit(c) == "closed"
+    assert c.get_json("h1", "http://h1/api/duts") == {"url": "http://h1/api/duts"}
+    assert c.stats()["h1"]["rejected"] == 2
@@ -0,0 +1,119 @@
+import os
+import time
+
+import pytest
+
+from core import inventory_store
+from core.inventory_store import InventoryStore
+
+
+class _Renderer:
+    """render callable that counts calls; ``fail`` makes the next ones raise."""
+
+    def __init__(self):
+        self.version = 0
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("render failed")
+        return f"version: {self.version}\n"
+
+
+@pytest.fixture
+def target(tmp_path):
+    path = tmp_path / "inventory.yml"
+    path.write_text("version: old\n")
+    return path
+
+
+def _read(path):
+    return path.read_text()
+
+
+def _leftovers(path):
+    return [n for n in os.listdir(path.parent) if n.startswith(".inventory.")]
+
+
+def _wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_burst_of_changes_is_written_once(target):
+    render = _Renderer()
+    store = InventoryStore(str(target), render, debounce_s=0.1, max_delay_s=5)
+    writes = []
+    store.on_write = lambda: writes.append(_read(target))
+    for i in range(20):
+        render.version = i
+        store.mark_dirty()
+    assert store.dirty
+    assert render.calls == 0
+
+    _wait_for(lambda: not store.dirty)
+    time.sleep(0.2)   # no second write trails the first
+    assert render.calls == 1
+    assert writes == ["version: 19\n"]
+    store.close()
+    assert render.calls == 1   # nothing left to write
+
+
+def test_constant_churn_is_still_written_by_max_delay(target):
+    render = _Renderer()
+    store = InventoryStore(str(target), render, debounce_s=0.2, max_delay_s=0.3)
+    stop = time.monotonic() + 1.0
+    while time.monotonic() < stop and render.calls == 0:
+        store.mark_dirty()   # never quiet for debounce_s
+        time.sleep(0.02)
+    assert render.calls == 1
+    store.close()
+
+
+def test_failed_write_leaves_the_old_file_and_no_temp_file(target, monkeypatch):
+    render = _Renderer()
+    store = InventoryStore(str(target), render, debounce_s=60)
+    render.version = 1
+    store.mark_dirty()
+
+    def replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(inventory_store.os, "replace", replace)
+    with pytest.raises(OSError, match="disk full"):
+        store.flush()
+    assert _read(target) == "version: old\n"
+    assert _leftovers(target) == []
+    assert store.dirty   # still pending; retried later
+
+    monkeypatch.undo()
+    render.fail = True
+    with pytest.raises(RuntimeError):
+        store.flush()
+    assert _read(target) == "version: old\n"
+    assert _leftovers(target) == []
+
+    render.fail = False
+    assert store.flush()
+    assert _read(target) == "version: 1\n"
+    assert not store.dirty
+    store.close()
+
+
+def test_close_writes_pending_changes(target):
+    render = _Renderer()
+    store = InventoryStore(str(target), render, debounce_s=60)
+    render.version = 7
+    store.mark_dirty()
+    store.close()
+    assert _read(target) == "version: 7\n"
+    assert not store.dirty
+
+    # a change after close doesn't start another timer
+    store.mark_dirty()
+    assert store._timer is None
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from core.scheduler import TimerScheduler
+
+
+@pytest.fixture
+def scheduler():
+    s = TimerScheduler()
+    s.start()
+    yield s
+    s.stop()
+
+
+def _recorder():
+    fired = []
+    done = threading.Event()
+
+    def cb(key):
+        def run():
+            fired.append(key)
+            done.set()
+        return run
+    return fired, done, cb
+
+
+def test_cancelled_timer_never_fires(scheduler):
+    fired, done, cb = _recorder()
+    now = time.time()
+    scheduler.schedule("a", now + 0.05, cb("a"))
+    scheduler.schedule("b", now + 0.1, cb("b"))
+    assert scheduler.cancel("a") is True
+    assert scheduler.cancel("a") is False
+    assert scheduler.deadline("a") is None
+    assert done.wait(2)
+    time.sleep(0.1)
+    assert fired == ["b"]
+    assert len(scheduler) == 0
+
+
+def test_rescheduling_a_key_replaces_its_timer(scheduler):
+    fired, done, cb = _recorder()
+    now = time.time()
+    scheduler.schedule("t", now + 0.05, cb("first"))
+    scheduler.schedule("t", now + 0.1, cb("second"))
+    assert scheduler.deadline("t") == pytest.approx(now + 0.1)
+    assert done.wait(2)
+    time.sleep(0.1)
+    assert fired == ["second"]
+
+
+def test_earlier_deadline_wakes_the_thread(scheduler):
+    fired, done, cb = _recorder()
+    scheduler.schedule("late", time.time() + 60, cb("late"))
+    time.sleep(0.05)   # the thread is now asleep until the late deadline
+    start = time.monotonic()
+    scheduler.schedule("soon", time.time() + 0.05, cb("soon"))
+    assert done.wait(2)
+    assert time.monotonic() - start < 1
+    assert fired == ["soon"]
+    assert scheduler.cancel("late") is True
+
+
+def test_cancelled_entries_are_compacted_away():
+    s = TimerScheduler()   # not started: nothing fires while the heap is inspected
+    far = time.time() + 3600
+    for i in range(200):
+        s.schedule(i, far + i, lambda: None)
+    for i in range(190):
+        s.cancel(i)
+    stats = s.stats()
+    assert stats["timers"] == 10
+    assert stats["heap_size"] <= 64
+    assert stats["next_deadline"] == far + 190
+
+
+def test_failing_callback_does_not_stop_the_thread(scheduler, caplog):
+    fired, done, cb = _recorder()
+    now = time.time()
+    scheduler.schedule("bad", now + 0.01, lambda: 1 / 0)
+    scheduler.schedule("good", now + 0.05, cb("good"))
+    assert done.wait(2)
+    assert fired == ["good"]
+    assert scheduler.stats()["fired"] == 2
+    assert "Scheduled callback for 'bad' failed" in caplog.text
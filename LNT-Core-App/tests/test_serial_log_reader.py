@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from core import serial_log_reader
+from core.serial_log_reader import SerialLogReader
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # a checkpoint every ~100 bytes, so a few hundred lines span many blocks
+    monkeypatch.setattr(serial_log_reader, "INDEX_BLOCK_BYTES", 100)
+
+
+def _lines(start, n):
+    return [f"[2025-01-31T10:{i // 60 % 60:02d}:{i % 60:02d}] line {i} " + "x" * (i % 13) for i in range(start, start + n)]
+
+
+def _write(path, lines, mode="a"):
+    with open(path, mode) as f:
+        f.write("".join(line + "\n" for line in lines))
+
+
+def test_random_access_matches_the_file(tmp_path):
+    path = tmp_path / "uart.log"
+    expected = _lines(0, 500)
+    _write(path, expected, "w")
+    reader = SerialLogReader(str(path))
+    stats = reader.stats()
+    assert stats["line_count"] == 500
+    assert stats["checkpoints"] > 50
+    for start in (0, 1, 99, 250, 497):
+        got, total = reader.lines(start, 5)
+        assert got == expected[start:start + 5]
+        assert total == 500
+    assert reader.lines(500, 5) == ([], 500)
+    assert reader.tail(3) == expected[-3:]
+
+
+def test_index_follows_growth_and_ignores_partial_lines(tmp_path):
+    path = tmp_path / "uart.log"
+    expected = _lines(0, 100)
+    _write(path, expected, "w")
+    reader = SerialLogReader(str(path))
+    assert reader.lines(98, 10)[0] == expected[98:]
+    checkpoints = reader.stats()["checkpoints"]
+
+    with open(path, "a") as f:
+        f.write("[2025-01-31T11:00:00] half a li")
+    assert reader.stats()["line_count"] == 100       # not served until its newline arrives
+    with open(path, "a") as f:
+        f.write("ne\n")
+    more = _lines(100, 200)
+    _write(path, more)
+    expected += ["[2025-01-31T11:00:00] half a line"] + more
+
+    got, total = reader.lines(95, 10)
+    assert total == 301
+    assert got == expected[95:105]
+    assert reader.lines(290, 20)[0] == expected[290:]
+    assert reader.stats()["checkpoints"] > checkpoints
+
+
+def test_rotated_file_is_reindexed(tmp_path):
+    path = tmp_path / "uart.log"
+    _write(path, _lines(0, 300), "w")
+    reader = SerialLogReader(str(path))
+    assert reader.stats()["line_count"] == 300
+    rotated = _lines(1000, 5)
+    tmp = tmp_path / "new.log"
+    _write(tmp, rotated, "w")
+    os.replace(tmp, path)
+    assert reader.lines(0, 10) == (rotated, 5)
+
+
+def test_time_window(tmp_path):
+    path = tmp_path / "uart.log"
+    expected = _lines(0, 300)
+    _write(path, expected, "w")
+    reader = SerialLogReader(str(path))
+    got = reader.time_window(datetime(2025, 1, 31, 10, 2, 0), datetime(2025, 1, 31, 10, 2, 4), limit=100)
+    assert got == expected[120:125]
@@ -0,0 +1,132 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from api.device_routes import refresh_host
+from core import device_manage, status_poller
+from core.status_poller import POLL_IDLE_FACTOR, POLL_MAX_INTERVAL_S, StatusPoller
+
+INTERVAL_S = 30
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(status_poller, "time", c)
+    monkeypatch.setattr(device_manage, "time", c)
+    monkeypatch.setattr(status_poller, "POLL_JITTER", 0)   # exact intervals
+    return c
+
+
+@pytest.fixture
+def fleet(inventory, make_manager, clock):
+    """A manager whose hosts answer (or not, per ``down``) with every agent call recorded."""
+    dm = make_manager()
+    calls = []
+    down = set()
+
+    def get_json(hostname, url):
+        calls.append(hostname)
+        if hostname in down:
+            raise requests.exceptions.ConnectionError("connection refused")
+        if url.endswith("/health"):
+            return {"status": "idle"}
+        return {"items": []}
+
+    dm.host_client.get_json = get_json
+    poller = StatusPoller(dm, interval_s=INTERVAL_S)
+    poller.enabled = True
+    return dm, poller, calls, down
+
+
+def _request(dm, poller):
+    return SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(dm=dm, poller=poller)))
+
+
+def _forwarded(dm, since):
+    return [c["data"] for c in dm.changes.backend.changes_after(since) if c["kind"] == "_refresh"]
+
+
+def test_fresh_record_is_served_from_the_cache(fleet, clock):
+    dm, poller, calls, _ = fleet
+    dm.refresh_host_status("LNT_DEVICE_HOST_1")
+    calls.clear()
+    seq = dm.changes.seq
+
+    clock.now += 5
+    out = refresh_host(_request(dm, poller), "LNT_DEVICE_HOST_1", max_age_s=INTERVAL_S)
+    assert out["stale"] is False
+    assert out["host"]["status"] == "idle"
+    assert out["host"]["age_s"] == 5
+    assert calls == []
+    assert _forwarded(dm, seq) == []
+
+
+def test_old_record_is_flagged_stale_and_revalidated_in_the_background(fleet, clock):
+    dm, poller, calls, _ = fleet
+    dm.refresh_host_status("LNT_DEVICE_HOST_1")
+    calls.clear()
+    seq = dm.changes.seq
+
+    clock.now += INTERVAL_S + 1
+    out = refresh_host(_request(dm, poller), "LNT_DEVICE_HOST_1", max_age_s=INTERVAL_S)
+    assert out["stale"] is True
+    assert out["host"]["age_s"] == INTERVAL_S + 1   # the cached record, as it was
+    assert calls == []                                # nobody waited on the agent
+    # not polling here, so the leader's poller is asked to do it
+    assert _forwarded(dm, seq) == [["LNT_DEVICE_HOST_1"]]
+
+    # wait=true is the one case that calls the agent inside the request
+    out = refresh_host(_request(dm, poller), "LNT_DEVICE_HOST_1", wait=True)
+    assert out["stale"] is False and out["host"]["age_s"] == 0
+    assert calls == ["LNT_DEVICE_HOST_1", "LNT_DEVICE_HOST_1"]
+
+
+def test_running_poller_queues_the_refresh_for_its_next_pass(fleet, clock):
+    dm, poller, calls, _ = fleet
+    poller._thread = SimpleNamespace(is_alive=lambda: True)   # as if start()ed, without the loop
+    poller._poll_once()
+    calls.clear()
+    assert poller._due["LNT_DEVICE_HOST_1"] == clock.now + INTERVAL_S * POLL_IDLE_FACTOR
+
+    clock.now += 1
+    poller.request_refresh("LNT_DEVICE_HOST_1")
+    assert poller._due["LNT_DEVICE_HOST_1"] == clock.now
+    assert poller._wake.is_set()
+    assert calls == []
+
+    poller._poll_once()
+    assert calls == ["LNT_DEVICE_HOST_1", "LNT_DEVICE_HOST_1"]   # only the requested host was due
+
+
+def test_disconnected_host_backs_off_exponentially(fleet, clock):
+    dm, poller, calls, down = fleet
+    down.add("LNT_DEVICE_HOST_2")
+
+    intervals = []
+    for _ in range(6):
+        poller._poll_once()
+        due = poller._due["LNT_DEVICE_HOST_2"]
+        intervals.append(due - clock.now)
+        clock.now = due
+    assert intervals == [INTERVAL_S * 2, INTERVAL_S * 4, INTERVAL_S * 8,
+                         POLL_MAX_INTERVAL_S, POLL_MAX_INTERVAL_S, POLL_MAX_INTERVAL_S]
+    assert dm.get_hosts()["LNT_DEVICE_HOST_2"]["status"] == "disconnected"
+
+    # back to the normal (idle) interval as soon as it answers again
+    down.clear()
+    poller._poll_once()
+    assert poller._due["LNT_DEVICE_HOST_2"] - clock.now == INTERVAL_S * POLL_IDLE_FACTOR
+    assert "LNT_DEVICE_HOST_2" not in poller._failures
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from core import test_log   # not importing TestEventLog by name: pytest would try to collect it
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    # a few entries per segment and a ring that only holds the newest ones
+    monkeypatch.setattr(test_log, "SEGMENT_MAX_BYTES", 400)
+    monkeypatch.setattr(test_log, "RING_SIZE", 8)
+
+
+def _fill(log, n, start=1):
+    for i in range(start, start + n):
+        log.append(f"line {i}")
+
+
+def _read_all(log, after=0, limit=7):
+    seqs = []
+    while True:
+        entries, after = log.read(after=after, limit=limit)
+        if not entries:
+            return seqs, after
+        seqs += [e["seq"] for e in entries]
+
+
+def test_cursor_walks_every_segment_in_order(tmp_path):
+    log = test_log.TestEventLog(str(tmp_path / "1"))
+    _fill(log, 100)
+    assert len([n for n in os.listdir(tmp_path / "1") if n.endswith(".jsonl")]) > 3
+    seqs, cursor = _read_all(log)
+    assert seqs == list(range(1, 101))
+    assert cursor == 100
+    # resuming mid-way (cursor inside an older segment) picks up right after it
+    entries, nxt = log.read(after=41, limit=3)
+    assert [e["seq"] for e in entries] == [42, 43, 44] and nxt == 44
+    assert [e["message"] for e in log.tail(3)] == ["line 98", "line 99", "line 100"]
+    log.close()
+
+
+def test_reopened_log_continues_numbering(tmp_path):
+    log = test_log.TestEventLog(str(tmp_path / "1"))
+    _fill(log, 30)
+    log.close()
+    log = test_log.TestEventLog(str(tmp_path / "1"))
+    assert log.last_seq == 30
+    assert log.append("after restart")["seq"] == 31
+    assert _read_all(log)[0] == list(range(1, 32))
+    log.close()
+
+
+def test_other_writer_appends_are_picked_up(tmp_path):
+    # two instances on one directory stand in for two worker processes
+    a = test_log.TestEventLog(str(tmp_path / "1"))
+    b = test_log.TestEventLog(str(tmp_path / "1"))
+    _fill(a, 20)
+    assert b.append("from b")["seq"] == 21
+    assert a.append("from a")["seq"] == 22
+    assert _read_all(b)[0] == list(range(1, 23))
+    a.close()
+    b.close()
+
+
+def test_torn_last_line_is_dropped_on_open(tmp_path):
+    log = test_log.TestEventLog(str(tmp_path / "1"))
+    _fill(log, 3)
+    log.close()
+    newest = sorted(n for n in os.listdir(tmp_path / "1") if n.endswith(".jsonl"))[-1]
+    with open(tmp_path / "1" / newest, "a") as f:
+        f.write('{"seq":4,"ts":"x","mess')
+    log = test_log.TestEventLog(str(tmp_path / "1"))
+    assert log.last_seq == 3
+    assert log.append("clean")["seq"] == 4
+    assert [e["message"] for e in log.read(after=2)[0]] == ["line 3", "clean"]
+    log.close()
@@ -0,0 +1,108 @@
+import threading
+
+import pytest
+
+# Test* classes are used through their modules so pytest doesn't try to collect them
+from core import test_log, test_manage
+from core.change_feed import ChangeFeed
+from core.dut_allocator import DutAllocator
+from core.log_search import LogSearchIndex
+from core.state_backend import MemoryStateBackend
+from core.test_store import SqliteTestStore
+
+
+@pytest.fixture
+def tm(tmp_path):
+    allocator = DutAllocator()
+    allocator.update_host("h1", "idle", [{"id": "d1", "type": "CC26"}, {"id": "d2", "type": "CC26"}])
+    manager = test_manage.TestManager(store=SqliteTestStore(str(tmp_path / "tests.db")),
+                                      logs=test_log.TestLogManager(str(tmp_path / "test_logs")),
+                                      search=LogSearchIndex(str(tmp_path / "search.db")),
+                                      allocator=allocator, changes=ChangeFeed(MemoryStateBackend()))
+    finished = []
+    manager.add_completion_hook(lambda test_id, test: finished.append((test_id, test["status"])))
+    manager.finished = finished
+    yield manager
+    manager.close()
+
+
+def _start(tm):
+    return tm.start_test("soak", test_config={"test_duration": "1h", "duts": [{"type": "CC26", "count": 2}]})
+
+
+def _messages(tm, test_id):
+    return [e["message"] for e in tm.get_log_entries(test_id, limit=100)[0]]
+
+
+def _test_changes(tm):
+    return [(c["key"], c["op"], c["data"]["status"]) for c in tm.changes.read(since=0, kinds=["test"])["changes"]]
+
+
+def test_stop_twice_finishes_once(tm):
+    test_id = _start(tm)
+    assert tm.allocator.stats()["types"]["CC26"]["free"] == 0
+
+    assert tm.stop_test(test_id) is True
+    assert tm.stop_test(test_id) is False
+    assert tm.stop_test(test_id, reason="cancelled") is False
+
+    assert tm.get_test(test_id)["status"] == "stopped"
+    assert tm.finished == [(test_id, "stopped")]
+    assert _messages(tm, test_id).count("Test stopped by user") == 1
+    assert _test_changes(tm) == [(test_id, "start", "running"), (test_id, "update", "stopped")]
+    assert tm.allocator.stats()["types"]["CC26"]["free"] == 2
+    assert tm.scheduler.deadline(test_id) is None
+
+
+def test_expire_after_stop_is_a_no_op(tm):
+    test_id = _start(tm)
+    tm.stop_test(test_id)
+    tm._expire(test_id)
+    assert tm.get_test(test_id)["status"] == "stopped"
+    assert tm.finished == [(test_id, "stopped")]
+
+
+def test_expire_twice_then_stop(tm):
+    test_id = _start(tm)
+    tm._expire(test_id)
+    tm._expire(test_id)
+    assert tm.stop_test(test_id) is False
+    test = tm.get_test(test_id)
+    assert test["status"] == "expired" and test["finished_at"]
+    assert tm.finished == [(test_id, "expired")]
+    assert sum(m.startswith("Test expired") for m in _messages(tm, test_id)) == 1
+
+
+def test_expire_is_skipped_off_the_leader(tm):
+    test_id = _start(tm)
+    tm.is_leader = False
+    tm._expire(test_id)
+    assert tm.get_test(test_id)["status"] == "running"
+    assert tm.finished == []
+
+
+def test_racing_stop_and_expire_finish_exactly_once(tm):
+    for _ in range(10):
+        tm.finished.clear()
+        test_id = tm.start_test("race")
+        barrier = threading.Barrier(4)
+
+        def run(fn):
+            barrier.wait()
+            fn()
+
+        threads = [threading.Thread(target=run, args=(fn,)) for fn in
+                   (lambda: tm.stop_test(test_id), lambda: tm.stop_test(test_id, "cancelled"),
+                    lambda: tm._expire(test_id), lambda: tm._expire(test_id))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(tm.finished) == 1
+        assert tm.get_test(test_id)["status"] == tm.finished[0][1]
+
+
+def test_unknown_test(tm):
+    assert tm.stop_test(12345) is False
+    tm._expire(12345)
+    assert tm.finished == []
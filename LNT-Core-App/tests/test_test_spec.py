@@ -0,0 +1,105 @@
+import os
+
+import pytest
+import yaml
+
+from core import test_spec
+from core.test_spec import SpecCache, SpecError
+
+SMOKE = "Job:\n  name: smoke\ntest_duration: 1h\n"
+SOAK = "Job:\n  name: soak1\ntest_duration: 2h\n"   # same size as SMOKE
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Counts real parses (compile_spec calls) behind the cache."""
+    calls = []
+    compile_spec = test_spec.compile_spec
+
+    def counting(data, source=None, digest=None):
+        calls.append(source)
+        return compile_spec(data, source=source, digest=digest)
+
+    monkeypatch.setattr(test_spec, "compile_spec", counting)
+    return calls
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_file_is_served_without_reading_it(tmp_path, compiles):
+    path = tmp_path / "test.yaml"
+    _write(path, SMOKE, 1_000_000_000)
+    cache = SpecCache()
+    spec = cache.load(str(path))
+    assert spec.name == "smoke"
+    assert cache.load(str(path)) is spec
+    assert cache.stats()["hits"] == 1 and len(compiles) == 1
+
+    # same (mtime_ns, size): the identity check alone decides, the content isn't looked at
+    _write(path, SOAK, 1_000_000_000)
+    assert cache.load(str(path)).name == "smoke"
+    assert len(compiles) == 1
+
+
+def test_changed_file_is_recompiled(tmp_path, compiles):
+    path = tmp_path / "test.yaml"
+    _write(path, SMOKE, 1_000_000_000)
+    cache = SpecCache()
+    assert cache.load(str(path)).name == "smoke"
+
+    _write(path, SOAK, 2_000_000_000)
+    spec = cache.load(str(path))
+    assert spec.name == "soak1"
+    assert spec.test_duration == "2h"
+    assert len(compiles) == 2
+
+    # touched or copied without changing the content: read and hashed, but not parsed again
+    _write(path, SOAK, 3_000_000_000)
+    copy = tmp_path / "copy.yaml"
+    _write(copy, SOAK, 4_000_000_000)
+    assert cache.load(str(path)) is spec
+    assert cache.load(str(copy)) is spec
+    assert len(compiles) == 2
+    assert cache.stats() == {"specs": 2, "paths": 2, "hits": 2, "misses": 2}
+
+
+def test_rejected_spec_is_cached_too(tmp_path, compiles):
+    path = tmp_path / "test.yaml"
+    _write(path, "Job:\n  name: bad\ntest_duration: soon\n", 1_000_000_000)
+    cache = SpecCache()
+    for _ in range(3):
+        with pytest.raises(SpecError, match="test.yaml"):
+            cache.load(str(path))
+    assert len(compiles) == 1
+
+    # fixed in place: the error goes away
+    _write(path, SMOKE, 2_000_000_000)
+    assert cache.load(str(path)).name == "smoke"
+
+
+def test_missing_or_invalid_files_raise_spec_error(tmp_path):
+    cache = SpecCache()
+    with pytest.raises(SpecError, match="cannot read spec"):
+        cache.load(str(tmp_path / "nope.yaml"))
+    path = tmp_path / "test.yaml"
+    path.write_text("Job: [unclosed\n")
+    with pytest.raises(SpecError, match="invalid YAML"):
+        cache.load(str(path))
+
+
+def test_duplicate_keys_are_rejected():
+    text = "Job:\n  name: a\n  description: x\n  name: b\n"
+    with pytest.raises(SpecError, match=r"duplicate key 'name' on line 4 \(first defined on line 2\)"):
+        yaml.load(text, Loader=test_spec._SpecLoader)
+    # the stock safe loader would have kept the last one silently
+    assert yaml.safe_load(text)["Job"]["name"] == "b"
+
+
+def test_duplicate_top_level_section_fails_the_load(tmp_path):
+    path = tmp_path / "test.yaml"
+    path.write_text("Job:\n  name: a\ntest_duration: 1h\ntest_duration: 2h\n")
+    with pytest.raises(SpecError, match="duplicate key 'test_duration'"):
+        SpecCache().load(str(path))
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from auth import token_cache
+from auth.jwt import TokenError
+from auth.token_cache import TokenCache
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(token_cache, "time", c)
+    return c
+
+
+@pytest.fixture
+def tokens(clock):
+    # token string -> claims; decode() plays the JWT library, counting real decodes
+    issued = {}
+    calls = []
+
+    def decode(token):
+        calls.append(token)
+        claims = issued.get(token)
+        if claims is None:
+            raise TokenError("Signature verification failed")
+        if claims["exp"] <= clock.now:
+            raise TokenError("Signature has expired")
+        return claims
+
+    def issue(name, jti, lifetime_s):
+        issued[name] = {"sub": "alice", "jti": jti, "exp": clock.now + lifetime_s}
+        return name
+
+    return issue, decode, calls
+
+
+def test_known_token_is_served_from_the_cache(tokens):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode, ttl_s=60)
+    t = issue("t1", "j1", 3600)
+    assert cache.verify(t)["jti"] == "j1"
+    assert cache.verify(t)["jti"] == "j1"
+    assert calls == ["t1"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_revoked_token_is_rejected_cached_or_not(tokens, clock):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode)
+    cached = issue("t1", "j1", 3600)
+    fresh = issue("t2", "j2", 3600)
+    cache.verify(cached)
+    cache.revoke("j1", clock.now + 3600)
+    cache.revoke("j2", clock.now + 3600)
+    with pytest.raises(TokenError):
+        cache.verify(cached)
+    with pytest.raises(TokenError):
+        cache.verify(fresh)
+    assert cache.stats()["cached"] == 0
+
+
+def test_cache_entry_never_outlives_the_token(tokens, clock):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode, ttl_s=60)
+    t = issue("t1", "j1", 10)
+    cache.verify(t)
+    clock.now += 11
+    with pytest.raises(TokenError, match="expired"):
+        cache.verify(t)
+    assert calls == ["t1", "t1"]
+
+
+def test_entries_are_redecoded_after_ttl(tokens, clock):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode, ttl_s=60)
+    t = issue("t1", "j1", 3600)
+    cache.verify(t)
+    clock.now += 61
+    cache.verify(t)
+    assert calls == ["t1", "t1"]
+
+
+def test_expired_revocations_are_forgotten(tokens, clock):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode)
+    for i in range(1025):
+        cache.revoke(f"old{i}", clock.now + 5)
+    clock.now += 10
+    cache.revoke("new", clock.now + 3600)
+    assert cache.stats()["revoked"] == 1
+
+
+def test_least_recently_used_entries_are_dropped(tokens):
+    issue, decode, calls = tokens
+    cache = TokenCache(decode, max_size=2)
+    a, b, c = (issue(f"t{i}", f"j{i}", 3600) for i in range(3))
+    cache.verify(a)
+    cache.verify(b)
+    cache.verify(a)   # b is now the oldest
+    cache.verify(c)
+    calls.clear()
+    cache.verify(a)
+    cache.verify(b)
+    assert calls == ["t1"]
+
+
+def test_auth_deps_leave_jose_to_the_deferred_import():
+    code = "import sys; import auth.deps; print(any(m.startswith('jose') for m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -1,7 +1,95 @@
 # Ansible runner utility for provisioning hosts
 
+import logging
 import subprocess
+import threading
 import os
+import re
+
+log = logging.getLogger(__name__)
+
+PLAYBOOK_TIMEOUT_S = 300
+ANSIBLE_FORKS = int(os.environ.get("LNT_ANSIBLE_FORKS", "25"))   # parallel hosts per playbook run
+
+# PLAY RECAP line, e.g.
+#   lnt-host-1   : ok=12   changed=3    unreachable=0    failed=0    skipped=1 ...
+_RECAP_RE = re.compile(r"^(\S+)\s+:\s+((?:\w+=\d+\s*)+)$")
+
+def run_playbook(hostnames, inventory_path: str = "ansible/inventory.yml",
+                 playbook_path: str = "ansible/provision_host.yml", on_output=None,
+                 timeout: int = PLAYBOOK_TIMEOUT_S, forks: int = None):
+    """
+    Run the provisioning playbook against some hosts, streaming its output.
+
+    Args:
+        hostnames: Host (str) or hosts (list) to pass to --limit
+        inventory_path: Path to Ansible inventory file
+        playbook_path: Path to Ansible playbook
+        on_output: Called with each line of combined stdout/stderr as it is produced
+        timeout: Seconds before the playbook is killed
+        forks: Ansible --forks; defaults to one per host, capped at ANSIBLE_FORKS
+
+    Returns:
+        Process exit code (-1 if it could not be started or was killed on timeout)
+    """
+    if isinstance(hostnames, str):
+        hostnames = [hostnames]
+    cmd = [
+        "ansible-playbook",
+        "-i", inventory_path,
+        playbook_path,
+        "--limit", ",".join(hostnames),
+        "--forks", str(forks or max(1, min(len(hostnames), ANSIBLE_FORKS)))
+    ]
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, bufsize=1)
+    except Exception as e:
+        if on_output:
+            on_output(f"Error starting ansible-playbook: {e}")
+        return -1
+
+    timed_out = threading.Event()
+    def _kill():
+        timed_out.set()
+        proc.kill()
+    watchdog = threading.Timer(timeout, _kill)
+    watchdog.start()
+    try:
+        for line in proc.stdout:
+            if on_output:
+                on_output(line.rstrip("\n"))
+        proc.wait()
+    finally:
+        watchdog.cancel()
+    if timed_out.is_set():
+        if on_output:
+            on_output(f"ansible-playbook killed after {timeout}s timeout")
+        return -1
+    return proc.returncode
+
+def parse_play_recap(lines):
+    """
+    Per-host counters from the PLAY RECAP section of ansible-playbook output.
+
+    Args:
+        lines: Output lines of one playbook run
+
+    Returns:
+        {hostname: {"ok": n, "changed": n, "unreachable": n, "failed": n, ...}}
+    """
+    results = {}
+    in_recap = False
+    for line in lines:
+        if line.startswith("PLAY RECAP"):
+            in_recap = True
+            continue
+        if not in_recap:
+            continue
+        m = _RECAP_RE.match(line.strip())
+        if m:
+            results[m.group(1)] = {k: int(v) for k, v in re.findall(r"(\w+)=(\d+)", m.group(2))}
+    return results
 
 def provision_host(hostname: str, inventory_path: str = "ansible/inventory.yml", playbook_path: str = "ansible/provision_host.yml"):
     """
@@ -23,9 +111,9 @@ def provision_host(hostname: str, inventory_path: str = "ansible/inventory.yml",
             playbook_path,
             "--limit", hostname
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PLAYBOOK_TIMEOUT_S)
         return result.returncode == 0
     except Exception as e:
-        print(f"Error provisioning host {hostname}: {e}")
+        log.warning("Error provisioning host %s: %s", hostname, e)
         return False
 